@@ -0,0 +1,283 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""
+Benchmark of the data layer service and the Python DataLayerClient with the local (in-memory) data layer.
+
+It starts (or connects to) a data layer server that serves only the local data layer,
+loads a set of keys, maps, sets and counters, and lets a number of client processes
+issue a weighted mix of operations with the locality 0 (i.e., LocalAccess) for a fixed duration.
+The throughput and the latency percentiles per operation type are written as a JSON object.
+
+Operation types: get, put, delete, map_put, map_get, set_add, set_contains, counter_increment, counter_get
+
+Usage examples:
+    python3 datalayer_benchmark.py --server-jar ../target/datalayerservice.jar --processes 8 --duration 30
+    python3 datalayer_benchmark.py --connect 127.0.0.1:4998 --mix get=90,put=10 --value-size 4096 --output result.json
+
+The thrift modules of the data layer have to be generated for the function worker
+(see FunctionWorker/Makefile), because the benchmark uses its DataLayerClient.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../FunctionWorker/python"))
+from DataLayerClient import DataLayerClient
+
+LOCAL_DATALAYER = 0
+
+DEFAULT_MIX = "get=50,put=30,map_put=4,map_get=4,set_add=3,set_contains=3,counter_increment=3,counter_get=3"
+
+# number of maps, sets and counters that the operations are spread over
+NUM_DATA_STRUCTURES = 16
+
+LOAD_BATCH_SIZE = 500
+
+def parse_mix(mix):
+    # "get=50,put=30" -> [("get", 50.0), ("put", 30.0)]
+    operations = []
+    for item in mix.split(","):
+        name, weight = item.split("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError("Unknown operation type: " + name + "; available: " + ", ".join(sorted(OPERATIONS)))
+        operations.append((name, float(weight)))
+    return operations
+
+def op_get(dlc, rng, args, value):
+    dlc.get(get_key(rng, args))
+
+def op_put(dlc, rng, args, value):
+    dlc.put(get_key(rng, args), value)
+
+def op_delete(dlc, rng, args, value):
+    dlc.delete(get_key(rng, args))
+
+def op_map_put(dlc, rng, args, value):
+    dlc.putMapEntry(get_data_structure_name("map", rng), get_key(rng, args), value)
+
+def op_map_get(dlc, rng, args, value):
+    dlc.getMapEntry(get_data_structure_name("map", rng), get_key(rng, args))
+
+def op_set_add(dlc, rng, args, value):
+    dlc.addSetEntry(get_data_structure_name("set", rng), get_key(rng, args))
+
+def op_set_contains(dlc, rng, args, value):
+    dlc.containsSetItem(get_data_structure_name("set", rng), get_key(rng, args))
+
+def op_counter_increment(dlc, rng, args, value):
+    dlc.incrementCounter(get_data_structure_name("counter", rng), 1)
+
+def op_counter_get(dlc, rng, args, value):
+    dlc.getCounter(get_data_structure_name("counter", rng))
+
+OPERATIONS = {
+    "get": op_get,
+    "put": op_put,
+    "delete": op_delete,
+    "map_put": op_map_put,
+    "map_get": op_map_get,
+    "set_add": op_set_add,
+    "set_contains": op_set_contains,
+    "counter_increment": op_counter_increment,
+    "counter_get": op_counter_get,
+}
+
+def get_key(rng, args):
+    return "bench_key_" + str(rng.randrange(args.keys))
+
+def get_data_structure_name(data_type, rng):
+    return "bench_" + data_type + "_" + str(rng.randrange(NUM_DATA_STRUCTURES))
+
+def wait_for_server(address, timeout):
+    host, port = address.split(":")
+    t_end = time.time() + timeout
+    while time.time() < t_end:
+        try:
+            sock = socket.create_connection((host, int(port)), 1.0)
+            sock.close()
+            return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+def start_server(args):
+    env = dict(os.environ)
+    env["DATALAYER_BIND"] = args.connect
+    env["DATALAYER_LOCAL_ONLY"] = "true"
+    cmd = ["java"] + args.java_opts.split() + ["-jar", args.server_jar]
+    server = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_server(args.connect, 60):
+        server.terminate()
+        raise RuntimeError("The data layer server did not start listening on " + args.connect)
+    return server
+
+def load_data(args):
+    # creates the local keyspace and tables, and the keys, maps, sets and counters used by the operations
+    dlc = DataLayerClient(locality=LOCAL_DATALAYER, suid=args.storage_id, connect=args.connect, init_tables=True)
+    value = "v" * args.value_size
+    batch = {}
+    for i in range(args.keys):
+        batch["bench_key_" + str(i)] = value
+        if len(batch) >= LOAD_BATCH_SIZE:
+            dlc.putMultiple(batch)
+            batch = {}
+    if batch:
+        dlc.putMultiple(batch)
+
+    for i in range(NUM_DATA_STRUCTURES):
+        dlc.createMap("bench_map_" + str(i))
+        dlc.createSet("bench_set_" + str(i))
+        dlc.createCounter("bench_counter_" + str(i), 0)
+    dlc.shutdown()
+
+def run_client(index, args, t_start, result_queue):
+    rng = random.Random(args.seed + index)
+    operations = parse_mix(args.mix)
+    names = [name for name, _ in operations]
+    weights = [weight for _, weight in operations]
+    value = "v" * args.value_size
+
+    latencies = {name: array("d") for name in names}
+    errors = {name: 0 for name in names}
+
+    dlc = DataLayerClient(locality=LOCAL_DATALAYER, suid=args.storage_id, connect=args.connect)
+
+    # all clients start together, and only the operations after the warm-up are recorded
+    time.sleep(max(0.0, t_start - time.time()))
+    t_record = t_start + args.warmup
+    t_end = t_record + args.duration
+    while True:
+        name = rng.choices(names, weights)[0]
+        t_op_start = time.time()
+        if t_op_start >= t_end:
+            break
+        try:
+            OPERATIONS[name](dlc, rng, args, value)
+        except Exception:
+            if t_op_start >= t_record:
+                errors[name] += 1
+            continue
+        if t_op_start >= t_record:
+            latencies[name].append((time.time() - t_op_start) * 1000.0)
+
+    dlc.shutdown()
+    result_queue.put((index, {name: latencies[name].tobytes() for name in names}, errors))
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100.0))
+    return sorted_values[index]
+
+def summarize(latencies, errors, duration):
+    sorted_latencies = sorted(latencies)
+    summary = {}
+    summary["operations"] = len(sorted_latencies)
+    summary["errors"] = errors
+    summary["throughput"] = len(sorted_latencies) / duration
+    summary["mean_ms"] = sum(sorted_latencies) / len(sorted_latencies) if sorted_latencies else None
+    summary["p50_ms"] = get_percentile(sorted_latencies, 50)
+    summary["p99_ms"] = get_percentile(sorted_latencies, 99)
+    summary["p999_ms"] = get_percentile(sorted_latencies, 99.9)
+    summary["max_ms"] = sorted_latencies[-1] if sorted_latencies else None
+    return summary
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark of the data layer service with the local (in-memory) data layer")
+    parser.add_argument("--connect", default="127.0.0.1:4998", help="address of the data layer server (default: %(default)s)")
+    parser.add_argument("--server-jar", default=None, help="start the data layer server from this jar with only the local data layer (default: use a running server)")
+    parser.add_argument("--java-opts", default="", help="options for the java command starting the server")
+    parser.add_argument("--processes", type=int, default=4, help="number of client processes (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of recorded operations (default: %(default)s)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of operations before recording (default: %(default)s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operation types (default: %(default)s)")
+    parser.add_argument("--keys", type=int, default=10000, help="number of distinct keys, map keys and set items (default: %(default)s)")
+    parser.add_argument("--value-size", type=int, default=1024, help="size of the values in bytes (default: %(default)s)")
+    parser.add_argument("--storage-id", default="datalayer_benchmark", help="storage id of the benchmark keyspace (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random operation and key choices (default: %(default)s)")
+    parser.add_argument("--output", default=None, help="file for the JSON result (default: stdout)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # fail early for an invalid mix
+    operations = parse_mix(args.mix)
+
+    # only the result goes to stdout; the messages of the clients (e.g., about failed requests) go to stderr
+    result_output = sys.stdout
+    sys.stdout = sys.stderr
+
+    server = None
+    if args.server_jar is not None:
+        server = start_server(args)
+    elif not wait_for_server(args.connect, 5):
+        print("No data layer server at " + args.connect + "; use --server-jar to start one", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        print("Loading " + str(args.keys) + " keys...", file=sys.stderr)
+        load_data(args)
+
+        print("Running " + str(args.processes) + " clients for " + str(args.warmup) + "s warm-up and " + str(args.duration) + "s...", file=sys.stderr)
+        result_queue = multiprocessing.Queue()
+        t_start = time.time() + 1.0
+        clients = []
+        for index in range(args.processes):
+            client = multiprocessing.Process(target=run_client, args=(index, args, t_start, result_queue))
+            client.start()
+            clients.append(client)
+
+        # collect before joining, so that the clients do not block on a full queue
+        latencies = {name: array("d") for name, _ in operations}
+        errors = {name: 0 for name, _ in operations}
+        for _ in clients:
+            _, client_latencies, client_errors = result_queue.get()
+            for name in client_latencies:
+                latencies[name].frombytes(client_latencies[name])
+                errors[name] += client_errors[name]
+        for client in clients:
+            client.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result = {}
+    result["config"] = {"processes": args.processes, "duration": args.duration, "warmup": args.warmup, "mix": dict(operations), "keys": args.keys, "value_size": args.value_size, "server_started": server is not None}
+    all_latencies = array("d")
+    for name in latencies:
+        all_latencies.extend(latencies[name])
+    result["total"] = summarize(all_latencies, sum(errors.values()), args.duration)
+    result["operations"] = {name: summarize(latencies[name], errors[name], args.duration) for name in latencies}
+
+    output = json.dumps(result, indent=4)
+    if args.output is None:
+        print(output, file=result_output)
+    else:
+        with open(args.output, "w") as outf:
+            outf.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -127,12 +127,24 @@ public class DataLayerServer implements Iface, Callable<Object> {
 	private static final int GET_SIZE_OF_MAP = 42;
 	private static final int DELETE_MAP = 43;
 	private static final int SELECT_MAPS = 44;
+	private static final int MULTI_SELECT_ROWS = 45;
+	private static final int MULTI_INSERT_ROWS = 46;
+	private static final int MULTI_DELETE_ROWS = 47;
+	private static final int MULTI_GET_ENTRIES_FROM_MAP = 48;
+	private static final int MULTI_PUT_ENTRIES_TO_MAP = 49;
+	private static final int MULTI_REMOVE_ENTRIES_FROM_MAP = 50;
+	private static final int MULTI_ADD_ITEMS_TO_SET = 51;
+	private static final int MULTI_REMOVE_ITEMS_FROM_SET = 52;
+	private static final int SCAN_KEYS = 53;
 	
 	public DataLayerServer(Map<String,Integer> riakNodes, Map<String,Integer> allDatalayerNodes) {
         this.isMainDataLayerServer = true;
         dbLocal = new LocalAccess();
         dbRiak = new RiakAccess(allDatalayerNodes);
-        dbRiak.connect(riakNodes);
+        // no riak nodes: only the local (in-memory) data layer is available (e.g., for benchmarks)
+        if (!riakNodes.isEmpty()) {
+            dbRiak.connect(riakNodes);
+        }
 		
 		executors = new ArrayList<ExecutorService>(THREAD_CONCURRENCY);
 		for (int i = 0; i < THREAD_CONCURRENCY; ++i) {
@@ -147,6 +159,7 @@ public class DataLayerServer implements Iface, Callable<Object> {
         this.parameters = parameters;
 	}
 
+	@SuppressWarnings("unchecked")
 	@Override
 	public Object call() throws Exception {
 		String keyspace = null;
@@ -166,6 +179,10 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		String setItem = null;
 		String mapName = null;
 		String entryKey = null;
+		List<String> keys = null;
+		List<KeyValuePair> keyValuePairs = null;
+		String prefix = null;
+		String cursor = null;
 		
 		switch (function) {
 		case CREATE_KEYSPACE:
@@ -435,6 +452,67 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			count = (Integer)(parameters.get(3));
 			locality = (Integer)(parameters.get(4));
 			return selectMaps(keyspace, table, start, count, locality);
+		case MULTI_SELECT_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keys = (List<String>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return multiSelectRows(keyspace, table, keys, locality);
+		case MULTI_INSERT_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keyValuePairs = (List<KeyValuePair>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return (Boolean)multiInsertRows(keyspace, table, keyValuePairs, locality);
+		case MULTI_DELETE_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keys = (List<String>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return (Boolean)multiDeleteRows(keyspace, table, keys, locality);
+		case MULTI_GET_ENTRIES_FROM_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return multiGetEntriesFromMap(keyspace, table, mapName, keys, locality);
+		case MULTI_PUT_ENTRIES_TO_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keyValuePairs = (List<KeyValuePair>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)multiPutEntriesToMap(keyspace, table, mapName, keyValuePairs, locality);
+		case MULTI_REMOVE_ENTRIES_FROM_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)multiRemoveEntriesFromMap(keyspace, table, mapName, keys, locality);
+		case MULTI_ADD_ITEMS_TO_SET:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			setName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)multiAddItemsToSet(keyspace, table, setName, keys, locality);
+		case MULTI_REMOVE_ITEMS_FROM_SET:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			setName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)multiRemoveItemsFromSet(keyspace, table, setName, keys, locality);
+		case SCAN_KEYS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			prefix = parameters.get(2).toString();
+			cursor = parameters.get(3).toString();
+			count = (Integer)(parameters.get(4));
+			locality = (Integer)(parameters.get(5));
+			return scanKeys(keyspace, table, prefix, cursor, count, locality);
 		}
 		
 		return null;
@@ -894,6 +972,57 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return keys;
 	}
 
+	/*
+	 * The keys are returned in order, starting after the given cursor (empty: from the beginning).
+	 * The returned cursor is empty when there are no more keys; it is opaque to the clients
+	 * (currently the last returned key), so that the listing does not depend on offsets.
+	 */
+	@Override
+	public KeyScanResult scanKeys(String keyspace, String table, String prefix, String cursor, int count, int locality) throws TException {
+		if (prefix == null) {
+			prefix = "";
+		}
+		if (cursor == null) {
+			cursor = "";
+		}
+		List<String> keys = NO_KEYS;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			keys = dbLocal.scanKeys(keyspace, table, prefix, cursor, count);
+			break;
+		case RIAK_DATALAYER:
+			keys = dbRiak.scanKeys(keyspace, table, prefix, cursor, count);
+			break;
+		case READ_RIAK_ASYNC:
+			try {
+				int function = SCAN_KEYS;
+				List<Object> parameters = new ArrayList<Object>(6);
+				parameters.add(keyspace);
+				parameters.add(table);
+				parameters.add(prefix);
+				parameters.add(cursor);
+				parameters.add((Integer)count);
+				parameters.add((Integer)RIAK_DATALAYER);
+				Future<Object> future = execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+				return (KeyScanResult)future.get();
+			} catch (Exception e) {
+			    LOGGER.error("scanKeys() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Prefix: " + prefix + "  Count: " + count + "  Locality: " + locality, e);
+				return new KeyScanResult(NO_KEYS, "");
+			}
+		case READ_LOCAL_THEN_RIAK:
+			keys = dbLocal.scanKeys(keyspace, table, prefix, cursor, count);
+			if (keys.size() <= 0) {
+				keys = dbRiak.scanKeys(keyspace, table, prefix, cursor, count);
+			}
+			break;
+		}
+		String nextCursor = "";
+		if (count > 0 && keys.size() >= count) {
+			nextCursor = keys.get(keys.size() - 1);
+		}
+		return new KeyScanResult(keys, nextCursor);
+	}
+
 	@Override
 	public boolean createCounter(String keyspace, String table, String counterName, long initialValue, int locality) throws TException {
 		switch (locality) {
@@ -1610,6 +1739,253 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return keys;
 	}
 	
+	@SuppressWarnings("unchecked")
+	@Override
+	public List<KeyValuePair> multiSelectRows(String keyspace, String table, List<String> keys, int locality) throws TException {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = null;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			rows = dbLocal.selectRows(keyspace, table, keys);
+			break;
+		case RIAK_DATALAYER:
+			rows = dbRiak.selectRows(keyspace, table, keys);
+			break;
+		case READ_RIAK_ASYNC:
+			try {
+				int function = MULTI_SELECT_ROWS;
+				List<Object> parameters = new ArrayList<Object>(4);
+				parameters.add(keyspace);
+				parameters.add(table);
+				parameters.add(keys);
+				parameters.add((Integer)RIAK_DATALAYER);
+				Future<Object> future = execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+				return (List<KeyValuePair>)future.get();
+			} catch (Exception e) {
+			    LOGGER.error("multiSelectRows() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Locality: " + locality, e);
+				rows = noRows(keys.size());
+			}
+			break;
+		case READ_LOCAL_THEN_RIAK:
+			rows = dbLocal.selectRows(keyspace, table, keys);
+			// fetch only the missing rows from riak
+			List<Integer> missingIndexes = new ArrayList<Integer>();
+			List<String> missingKeys = new ArrayList<String>();
+			for (int i = 0; i < keys.size(); ++i) {
+				if (rows.get(i).getKey().compareTo(keys.get(i)) != 0) {
+					missingIndexes.add(i);
+					missingKeys.add(keys.get(i));
+				}
+			}
+			if (missingKeys.size() > 0) {
+				List<AbstractMap.SimpleEntry<String, ByteBuffer>> riakRows = dbRiak.selectRows(keyspace, table, missingKeys);
+				for (int i = 0; i < missingIndexes.size(); ++i) {
+					rows.set(missingIndexes.get(i), riakRows.get(i));
+				}
+			}
+			break;
+		default:
+			rows = noRows(keys.size());
+		}
+		return toKeyValuePairs(rows);
+	}
+
+	@Override
+	public boolean multiInsertRows(String keyspace, String table, List<KeyValuePair> keyValuePairs, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.insertRows(keyspace, table, toEntries(keyValuePairs));
+		case RIAK_DATALAYER:
+			return dbRiak.insertRows(keyspace, table, toEntries(keyValuePairs));
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_INSERT_ROWS;
+			List<Object> parameters = new ArrayList<Object>(4);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(keyValuePairs);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.insertRows(keyspace, table, toEntries(keyValuePairs));
+		default:
+			return false;
+		}
+	}
+
+	@Override
+	public boolean multiDeleteRows(String keyspace, String table, List<String> keys, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.deleteRows(keyspace, table, keys);
+		case RIAK_DATALAYER:
+			return dbRiak.deleteRows(keyspace, table, keys);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_DELETE_ROWS;
+			List<Object> parameters = new ArrayList<Object>(4);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(keys);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.deleteRows(keyspace, table, keys);
+		default:
+			return false;
+		}
+	}
+
+	@SuppressWarnings("unchecked")
+	@Override
+	public List<KeyValuePair> multiGetEntriesFromMap(String keyspace, String table, String mapName, List<String> entryKeys, int locality) throws TException {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries = null;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			entries = dbLocal.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+			break;
+		case RIAK_DATALAYER:
+			entries = dbRiak.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+			break;
+		case READ_RIAK_ASYNC:
+			try {
+				int function = MULTI_GET_ENTRIES_FROM_MAP;
+				List<Object> parameters = new ArrayList<Object>(5);
+				parameters.add(keyspace);
+				parameters.add(table);
+				parameters.add(mapName);
+				parameters.add(entryKeys);
+				parameters.add((Integer)RIAK_DATALAYER);
+				Future<Object> future = execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+				return (List<KeyValuePair>)future.get();
+			} catch (Exception e) {
+			    LOGGER.error("multiGetEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Locality: " + locality, e);
+				entries = noRows(entryKeys.size());
+			}
+			break;
+		case READ_LOCAL_THEN_RIAK:
+			entries = dbLocal.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+			for (int i = 0; i < entryKeys.size(); ++i) {
+				if (entries.get(i).getKey().compareTo(entryKeys.get(i)) != 0) {
+					// the entries of a riak map are fetched together
+					entries = dbRiak.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+					break;
+				}
+			}
+			break;
+		default:
+			entries = noRows(entryKeys.size());
+		}
+		return toKeyValuePairs(entries);
+	}
+
+	@Override
+	public boolean multiPutEntriesToMap(String keyspace, String table, String mapName, List<KeyValuePair> keyValuePairs, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.putEntriesToMap(keyspace, table, mapName, toEntries(keyValuePairs));
+		case RIAK_DATALAYER:
+			return dbRiak.putEntriesToMap(keyspace, table, mapName, toEntries(keyValuePairs));
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_PUT_ENTRIES_TO_MAP;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(mapName);
+			parameters.add(keyValuePairs);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.putEntriesToMap(keyspace, table, mapName, toEntries(keyValuePairs));
+		default:
+			return false;
+		}
+	}
+
+	@Override
+	public boolean multiRemoveEntriesFromMap(String keyspace, String table, String mapName, List<String> entryKeys, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.removeEntriesFromMap(keyspace, table, mapName, entryKeys);
+		case RIAK_DATALAYER:
+			return dbRiak.removeEntriesFromMap(keyspace, table, mapName, entryKeys);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_REMOVE_ENTRIES_FROM_MAP;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(mapName);
+			parameters.add(entryKeys);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.removeEntriesFromMap(keyspace, table, mapName, entryKeys);
+		default:
+			return false;
+		}
+	}
+
+	@Override
+	public boolean multiAddItemsToSet(String keyspace, String table, String setName, List<String> setItems, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.addItemsToSet(keyspace, table, setName, setItems);
+		case RIAK_DATALAYER:
+			return dbRiak.addItemsToSet(keyspace, table, setName, setItems);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_ADD_ITEMS_TO_SET;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(setName);
+			parameters.add(setItems);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.addItemsToSet(keyspace, table, setName, setItems);
+		default:
+			return false;
+		}
+	}
+
+	@Override
+	public boolean multiRemoveItemsFromSet(String keyspace, String table, String setName, List<String> setItems, int locality) throws TException {
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			return dbLocal.removeItemsFromSet(keyspace, table, setName, setItems);
+		case RIAK_DATALAYER:
+			return dbRiak.removeItemsFromSet(keyspace, table, setName, setItems);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = MULTI_REMOVE_ITEMS_FROM_SET;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(setName);
+			parameters.add(setItems);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			return dbLocal.removeItemsFromSet(keyspace, table, setName, setItems);
+		default:
+			return false;
+		}
+	}
+
+	private static List<AbstractMap.SimpleEntry<String, ByteBuffer>> noRows (int count) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(count);
+		for (int i = 0; i < count; ++i) {
+			rows.add(NO_ROW);
+		}
+		return rows;
+	}
+
+	private static List<AbstractMap.SimpleEntry<String, ByteBuffer>> toEntries (List<KeyValuePair> keyValuePairs) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keyValuePairs.size());
+		for (KeyValuePair keyValuePair: keyValuePairs) {
+			entries.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())));
+		}
+		return entries;
+	}
+
+	private static List<KeyValuePair> toKeyValuePairs (List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries) {
+		List<KeyValuePair> keyValuePairs = new ArrayList<KeyValuePair>(entries.size());
+		for (AbstractMap.SimpleEntry<String, ByteBuffer> entry: entries) {
+			keyValuePairs.add(new KeyValuePair(entry.getKey(), entry.getValue()));
+		}
+		return keyValuePairs;
+	}
+
 	@Override
 	public long totalMemory() throws TException {
 		return Runtime.getRuntime().maxMemory();
@@ -1680,7 +2056,8 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		System.err.println("OPTIONS:\n"
 				+ " - datalayer.bind (DATALAYER_BIND)\t<host> ':' <port>\t(default: 0.0.0.0:4998)\n"
 				+ " - riak.connect (RIAK_CONNECT)\t<host> ':' (<port>) [ ',' <host> ':' (<port>)? ]\t(default: 127.0.0.1:8087"
-				+ " - all.datalayer.bind (ALL_DATALAYER_BIND)\t<host> ':' (<port>) [ ',' <host> ':' (<port>)? ]\t(default: 127.0.0.1:4998");
+				+ " - all.datalayer.bind (ALL_DATALAYER_BIND)\t<host> ':' (<port>) [ ',' <host> ':' (<port>)? ]\t(default: 127.0.0.1:4998"
+				+ " - datalayer.local_only (DATALAYER_LOCAL_ONLY)\t'true' to serve only the local (in-memory) data layer without riak\t(default: false)");
 	}
 
 	public static void main(String[] args) {
@@ -1697,7 +2074,7 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			// Copy properties from env or system props
 			Map<String,String> env = System.getenv();
 			Properties sys = System.getProperties();
-			for(String key : new String[]{"riak.connect","datalayer.bind", "all.datalayer.bind"}) {
+			for(String key : new String[]{"riak.connect","datalayer.bind", "all.datalayer.bind", "datalayer.local_only"}) {
 				String envkey = key.replace('.', '_').toUpperCase();
 				if(env.containsKey(envkey))
 					config.put(key,env.get(envkey));
@@ -1711,6 +2088,11 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			// Provide default values
 			String[] bind = config.getProperty("datalayer.bind", "127.0.0.1:4998").split(":");
 			String[] riak = config.getProperty("riak.connect","127.0.0.1:8087").split(",");
+			boolean localOnly = Boolean.parseBoolean(config.getProperty("datalayer.local_only", "false"));
+			if (localOnly) {
+				LOGGER.info("Serving only the local data layer; requests to riak will fail");
+				riak = new String[0];
+			}
 			String all_datalayer_binds_str = config.getProperty("all.datalayer.bind");
 			String[] all_datalayer_binds = null;
 			if (all_datalayer_binds_str != null)
@@ -23,8 +23,10 @@ import java.util.HashMap;
 import java.util.HashSet;
 import java.util.List;
 import java.util.Map;
+import java.util.NavigableSet;
 import java.util.Set;
 import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ConcurrentSkipListMap;
 import java.util.concurrent.ConcurrentSkipListSet;
 import java.util.concurrent.atomic.AtomicLong;
 
@@ -45,7 +47,7 @@ public class LocalAccess {
 	private static final List<AbstractMap.SimpleEntry<String, Integer>> NO_KEYSPACES = new ArrayList<AbstractMap.SimpleEntry<String, Integer>>(0);
 	private static final List<String> NO_KEYS = new ArrayList<String>(0);
 	
-	private ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>> local = new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>>();
+	private ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>>> local = new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>>>();
 	private ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, AtomicLong>>> localCounters = new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, AtomicLong>>>();
 	private ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListSet<String>>>> localSets = new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListSet<String>>>>();
 	private ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>>> localMaps = new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>>>();
@@ -71,7 +73,7 @@ public class LocalAccess {
 			return false;
 		}
 		
-		local.putIfAbsent(keyspace, new ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>());
+		local.putIfAbsent(keyspace, new ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>>());
 		localCounters.putIfAbsent(keyspace, new ConcurrentHashMap<String, ConcurrentHashMap<String, AtomicLong>>());
 		localSets.putIfAbsent(keyspace, new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListSet<String>>>());
 		localMaps.putIfAbsent(keyspace, new ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>>());
@@ -131,7 +133,7 @@ public class LocalAccess {
 		List<AbstractMap.SimpleEntry<String, String>> tables = new ArrayList<AbstractMap.SimpleEntry<String, String>>();
 
 		if (tableType.compareTo(BUCKET_TYPE_ALL) == 0 || tableType.compareTo(BUCKET_TYPE_DEFAULT) == 0) {
-			ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+			ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 			if (localKeyspace != null) {
 				List<String> names = new ArrayList<String>(localKeyspace.keySet());
 				Collections.sort(names);
@@ -192,12 +194,12 @@ public class LocalAccess {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return false;
 		}
 		
-		localKeyspace.putIfAbsent(table, new ConcurrentHashMap<String, ByteBuffer>());
+		localKeyspace.putIfAbsent(table, new ConcurrentSkipListMap<String, ByteBuffer>());
 		return true;
 	}
 	
@@ -248,7 +250,7 @@ public class LocalAccess {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return false;
 		}
@@ -304,12 +306,12 @@ public class LocalAccess {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ByteBuffer> localTable = localKeyspace.get(table);
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = localKeyspace.get(table);
 		if (localTable == null) {
 			return false;
 		}
@@ -644,12 +646,12 @@ public class LocalAccess {
 			return NO_ROW;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return NO_ROW;
 		}
 		
-		ConcurrentHashMap<String, ByteBuffer> localTable = localKeyspace.get(table);
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = localKeyspace.get(table);
 		if (localTable == null) {
 			return NO_ROW;
 		}
@@ -791,12 +793,12 @@ public class LocalAccess {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return false;
 		}
 		
-		ConcurrentHashMap<String, ByteBuffer> localTable = localKeyspace.get(table);
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = localKeyspace.get(table);
 		if (localTable == null) {
 			return false;
 		}
@@ -867,12 +869,12 @@ public class LocalAccess {
 			return NO_KEYS;
 		}
 		
-		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
 		if (localKeyspace == null) {
 			return NO_KEYS;
 		}
 		
-		ConcurrentHashMap<String, ByteBuffer> localTable = localKeyspace.get(table);
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = localKeyspace.get(table);
 		if (localTable == null) {
 			return NO_KEYS;
 		}
@@ -889,6 +891,35 @@ public class LocalAccess {
 		return keys.subList(start, end);
 	}
 	
+	public List<String> scanKeys(String keyspace, String table, String prefix, String startAfter, int count) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table) || count < 1) {
+			return NO_KEYS;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		if (localKeyspace == null) {
+			return NO_KEYS;
+		}
+		
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = localKeyspace.get(table);
+		if (localTable == null) {
+			return NO_KEYS;
+		}
+		
+		// the keys of a table are sorted: a page starts right after the cursor (or at the prefix)
+		// and ends at the first key without the prefix
+		NavigableSet<String> candidates = (startAfter.compareTo(prefix) < 0)? localTable.navigableKeySet().tailSet(prefix, true): localTable.navigableKeySet().tailSet(startAfter, false);
+		List<String> keys = new ArrayList<String>();
+		for (String key: candidates) {
+			if (keys.size() >= count || !key.startsWith(prefix)) {
+				break;
+			}
+			keys.add(key);
+		}
+		
+		return keys;
+	}
+	
 	public List<String> selectCounters (String keyspace, String table, int start, int count) {
 		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table) || start < 0 || count < 1) {
 			return NO_KEYS;
@@ -969,4 +1000,149 @@ public class LocalAccess {
 		Collections.sort(keys);
 		return keys.subList(start, end);
 	}
+	
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> selectRows (String keyspace, String table, List<String> keys) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keys.size());
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = this.getLocalTable(keyspace, table);
+		for (String key: keys) {
+			ByteBuffer localResult = (localTable == null)? null: localTable.get(key);
+			if (localResult == null) {
+				rows.add(NO_ROW);
+			} else {
+				rows.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(key, localResult));
+			}
+		}
+		return rows;
+	}
+	
+	public boolean insertRows (String keyspace, String table, List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows) {
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = this.getLocalTable(keyspace, table);
+		if (localTable == null) {
+			return false;
+		}
+		
+		for (AbstractMap.SimpleEntry<String, ByteBuffer> row: rows) {
+			localTable.put(row.getKey(), row.getValue());
+		}
+		return true;
+	}
+	
+	public boolean deleteRows (String keyspace, String table, List<String> keys) {
+		ConcurrentSkipListMap<String, ByteBuffer> localTable = this.getLocalTable(keyspace, table);
+		if (localTable == null) {
+			return false;
+		}
+		
+		for (String key: keys) {
+			localTable.remove(key);
+		}
+		return true;
+	}
+	
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> getEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(entryKeys.size());
+		ConcurrentHashMap<String, ByteBuffer> localResult = this.getLocalMap(keyspace, table, mapName);
+		for (String entryKey: entryKeys) {
+			ByteBuffer entryValue = (localResult == null)? null: localResult.get(entryKey);
+			if (entryValue == null) {
+				entries.add(NO_ROW);
+			} else {
+				entries.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(entryKey, entryValue));
+			}
+		}
+		return entries;
+	}
+	
+	public boolean putEntriesToMap (String keyspace, String table, String mapName, List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries) {
+		ConcurrentHashMap<String, ByteBuffer> localResult = this.getLocalMap(keyspace, table, mapName);
+		if (localResult == null) {
+			return false;
+		}
+		
+		for (AbstractMap.SimpleEntry<String, ByteBuffer> entry: entries) {
+			localResult.put(entry.getKey(), entry.getValue());
+		}
+		return true;
+	}
+	
+	public boolean removeEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		ConcurrentHashMap<String, ByteBuffer> localResult = this.getLocalMap(keyspace, table, mapName);
+		if (localResult == null) {
+			return false;
+		}
+		
+		for (String entryKey: entryKeys) {
+			localResult.remove(entryKey);
+		}
+		return true;
+	}
+	
+	public boolean addItemsToSet (String keyspace, String table, String setName, List<String> setItems) {
+		ConcurrentSkipListSet<String> localResult = this.getLocalSet(keyspace, table, setName);
+		if (localResult == null) {
+			return false;
+		}
+		
+		localResult.addAll(setItems);
+		return true;
+	}
+	
+	public boolean removeItemsFromSet (String keyspace, String table, String setName, List<String> setItems) {
+		ConcurrentSkipListSet<String> localResult = this.getLocalSet(keyspace, table, setName);
+		if (localResult == null) {
+			return false;
+		}
+		
+		localResult.removeAll(setItems);
+		return true;
+	}
+	
+	private ConcurrentSkipListMap<String, ByteBuffer> getLocalTable (String keyspace, String table) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+			return null;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentSkipListMap<String, ByteBuffer>> localKeyspace = local.get(keyspace);
+		if (localKeyspace == null) {
+			return null;
+		}
+		
+		return localKeyspace.get(table);
+	}
+	
+	private ConcurrentHashMap<String, ByteBuffer> getLocalMap (String keyspace, String table, String mapName) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+			return null;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>>> localKeyspace = localMaps.get(keyspace);
+		if (localKeyspace == null) {
+			return null;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentHashMap<String, ByteBuffer>> localTable = localKeyspace.get(table);
+		if (localTable == null) {
+			return null;
+		}
+		
+		return localTable.get(mapName);
+	}
+	
+	private ConcurrentSkipListSet<String> getLocalSet (String keyspace, String table, String setName) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+			return null;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentHashMap<String, ConcurrentSkipListSet<String>>> localKeyspace = localSets.get(keyspace);
+		if (localKeyspace == null) {
+			return null;
+		}
+		
+		ConcurrentHashMap<String, ConcurrentSkipListSet<String>> localTable = localKeyspace.get(table);
+		if (localTable == null) {
+			return null;
+		}
+		
+		return localTable.get(setName);
+	}
 }
@@ -22,15 +22,18 @@ import java.util.ArrayList;
 import java.util.Collections;
 import java.util.HashMap;
 import java.util.HashSet;
+import java.util.Iterator;
 import java.util.List;
 import java.util.Map;
 import java.util.Map.Entry;
+import java.util.NavigableSet;
 import java.util.concurrent.ConcurrentHashMap;
 
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
 import java.util.Set;
+import java.util.TreeSet;
 
 import com.basho.riak.client.api.RiakClient;
 import com.basho.riak.client.api.commands.buckets.StoreBucketProperties;
@@ -45,11 +48,13 @@ import com.basho.riak.client.api.commands.datatypes.SetUpdate;
 import com.basho.riak.client.api.commands.datatypes.UpdateCounter;
 import com.basho.riak.client.api.commands.datatypes.UpdateMap;
 import com.basho.riak.client.api.commands.datatypes.UpdateSet;
+import com.basho.riak.client.api.commands.indexes.BinIndexQuery;
 import com.basho.riak.client.api.commands.kv.DeleteValue;
 import com.basho.riak.client.api.commands.kv.FetchValue;
 import com.basho.riak.client.api.commands.kv.ListKeys;
 import com.basho.riak.client.api.commands.kv.StoreValue;
 import com.basho.riak.client.core.RiakCluster;
+import com.basho.riak.client.core.RiakFuture;
 import com.basho.riak.client.core.RiakNode;
 import com.basho.riak.client.core.query.Location;
 import com.basho.riak.client.core.query.Namespace;
@@ -93,6 +98,10 @@ public class RiakAccess {
 	private static final List<AbstractMap.SimpleEntry<String, String>> NO_TABLES = new ArrayList<AbstractMap.SimpleEntry<String, String>>(0);
 	private static final List<AbstractMap.SimpleEntry<String, Integer>> NO_KEYSPACES = new ArrayList<AbstractMap.SimpleEntry<String, Integer>>(0);
 	private static final List<String> NO_KEYS = new ArrayList<String>(0);
+	// largest code point; the end of the key range of a prefix
+	private static final String KEY_RANGE_END = new String(Character.toChars(Character.MAX_CODE_POINT));
+	// scanKeys() without the $key index: lifetime of the sorted listings of the buckets
+	private static final long SCAN_SNAPSHOT_TTL_MS = 60000L;
     private static final String MFN_KEYSPACES = "__MFn_Keyspaces__";
 	
 	private static int NUM_NODES = 0;
@@ -102,6 +111,7 @@ public class RiakAccess {
 		
 	private RiakCluster cluster = null;
 	private RiakClient client = null;
+	private ConcurrentHashMap<String, AbstractMap.SimpleEntry<Long, TreeSet<String>>> scanSnapshots = new ConcurrentHashMap<String, AbstractMap.SimpleEntry<Long, TreeSet<String>>>();
 	private Map<String,Integer> allDatalayerNodes;
 	
 	public RiakAccess(Map<String,Integer> allDatalayerNodes) {
@@ -766,6 +776,80 @@ public class RiakAccess {
 		}
 	}
 	
+	public List<String> scanKeys (String keyspace, String table, String prefix, String startAfter, int count) {
+		String tableType = null;
+		if (table == null) {
+			tableType = BUCKET_TYPE_DEFAULT;
+		} else {
+			tableType = BUCKET_TO_TYPE.get(keyspace + ";" + table);
+		}
+		
+		if (! KV_BUCKET_TYPES.contains(tableType) || this.detectInvalidName(keyspace) || this.detectInvalidName(table) || count < 1) {
+			LOGGER.warn("scanKeys() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table + "  Prefix: " + prefix + "  Count: " + count);
+			return NO_KEYS;
+		}
+		
+		Namespace bucket = null;
+		if (table == null) {
+			bucket = new Namespace(BUCKET_TYPE_DEFAULT, keyspace);
+		} else {
+			bucket = new Namespace(tableType, keyspace + ";" + table);
+		}
+		
+		// range query on the special $key index: the server reads only the requested page of the (sorted) keys
+		String rangeStart = (startAfter.compareTo(prefix) > 0)? startAfter: prefix;
+		String rangeEnd = prefix + KEY_RANGE_END;
+		try {
+			BinIndexQuery query = new BinIndexQuery.Builder(bucket, "$key", rangeStart, rangeEnd).withMaxResults(count + 1).build();
+			
+			long t_start = System.currentTimeMillis();
+			BinIndexQuery.Response response = client.execute(query);
+			this.logExecutionTime("scanKeys()", System.currentTimeMillis() - t_start);
+			
+			List<String> keys = new ArrayList<String>(count);
+			for (BinIndexQuery.Response.Entry entry: response.getEntries()) {
+				String key = entry.getRiakObjectLocation().getKeyAsString();
+				if (key.compareTo(startAfter) <= 0) {
+					continue;
+				}
+				if (keys.size() >= count) {
+					break;
+				}
+				keys.add(key);
+			}
+			return keys;
+		} catch (Exception e) {
+			// e.g., the storage backend does not support secondary indexes
+			LOGGER.warn("scanKeys() index query failed; listing all keys.  Keyspace: " + keyspace + "  Table: " + table + "  Prefix: " + prefix, e);
+		}
+		
+		// the sorted listing is taken at the first page of a scan and reused by the next pages,
+		// so that a page costs O(count * log(n)) instead of listing the whole bucket again
+		String snapshotName = keyspace + ";" + table;
+		long now = System.currentTimeMillis();
+		AbstractMap.SimpleEntry<Long, TreeSet<String>> snapshot = scanSnapshots.get(snapshotName);
+		if (startAfter.isEmpty() || snapshot == null || now - snapshot.getKey() > SCAN_SNAPSHOT_TTL_MS) {
+			Iterator<AbstractMap.SimpleEntry<Long, TreeSet<String>>> it = scanSnapshots.values().iterator();
+			while (it.hasNext()) {
+				if (now - it.next().getKey() > SCAN_SNAPSHOT_TTL_MS) {
+					it.remove();
+				}
+			}
+			snapshot = new AbstractMap.SimpleEntry<Long, TreeSet<String>>(now, new TreeSet<String>(this.selectAllKeysWithType(keyspace, table, tableType)));
+			scanSnapshots.put(snapshotName, snapshot);
+		}
+		
+		NavigableSet<String> candidates = (startAfter.compareTo(prefix) < 0)? snapshot.getValue().tailSet(prefix, true): snapshot.getValue().tailSet(startAfter, false);
+		List<String> keys = new ArrayList<String>(count);
+		for (String key: candidates) {
+			if (keys.size() >= count || !key.startsWith(prefix)) {
+				break;
+			}
+			keys.add(key);
+		}
+		return keys;
+	}
+	
 	private List<String> selectAllKeysWithType (String keyspace, String table, String tableType) {
 		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
 		    LOGGER.warn("selectAllKeysWithType() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table + "  TableType: " + tableType);
@@ -1326,6 +1410,260 @@ public class RiakAccess {
 	public List<String> selectMaps (String keyspace, String table, int start, int count) {
 		return this.selectKeysWithType(keyspace, table, start, count, BUCKET_TYPE_MAPS);
 	}
+	
+	private Namespace getKVBucket (String methodName, String keyspace, String table) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+			LOGGER.warn(methodName + " invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return null;
+		}
+		
+		if (table == null) {
+			return new Namespace(BUCKET_TYPE_DEFAULT, keyspace);
+		}
+		
+		String tableType = BUCKET_TO_TYPE.get(keyspace + ";" + table);
+		if (! KV_BUCKET_TYPES.contains(tableType)) {
+			LOGGER.warn(methodName + " invalid parameters.  Keyspace: " + keyspace + "  Table: " + table + ", tableType: " + tableType);
+			return null;
+		}
+		return new Namespace(tableType, keyspace + ";" + table);
+	}
+	
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> selectRows (String keyspace, String table, List<String> keys) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keys.size());
+		Namespace bucket = this.getKVBucket("selectRows()", keyspace, table);
+		if (bucket == null) {
+			for (int i = 0; i < keys.size(); ++i) {
+				rows.add(NO_ROW);
+			}
+			return rows;
+		}
+		
+		// issue all fetches before waiting for any of them
+		long t_start = System.currentTimeMillis();
+		List<RiakFuture<FetchValue.Response, Location>> futures = new ArrayList<RiakFuture<FetchValue.Response, Location>>(keys.size());
+		for (String key: keys) {
+			futures.add(client.executeAsync(new FetchValue.Builder(new Location(bucket, key)).build()));
+		}
+		
+		for (int i = 0; i < keys.size(); ++i) {
+			try {
+				RiakObject object = futures.get(i).get().getValue(RiakObject.class);
+				if (object == null || object.getValue() == null) {
+					rows.add(NO_ROW);
+					continue;
+				}
+				
+				ByteBuffer value = ByteBuffer.wrap(object.getValue().unsafeGetValue());
+				if (value.hasArray() && value.array().length == 1 && value.array()[0] == 0)
+				{
+					value = ByteBuffer.wrap(new byte[] {});
+				}
+				rows.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(keys.get(i), value));
+			} catch (Exception e) {
+				LOGGER.error("selectRows() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Key: " + keys.get(i), e);
+				rows.add(NO_ROW);
+			}
+		}
+		this.logExecutionTime("selectRows()", System.currentTimeMillis() - t_start);
+		
+		return rows;
+	}
+	
+	public boolean insertRows (String keyspace, String table, List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows) {
+		Namespace bucket = this.getKVBucket("insertRows()", keyspace, table);
+		if (bucket == null) {
+			return false;
+		}
+		
+		long t_start = System.currentTimeMillis();
+		List<RiakFuture<StoreValue.Response, Location>> futures = new ArrayList<RiakFuture<StoreValue.Response, Location>>(rows.size());
+		for (AbstractMap.SimpleEntry<String, ByteBuffer> row: rows) {
+			ByteBuffer value = row.getValue();
+			if (value.array() == null || value.array().length <= 0) {
+				value = ByteBuffer.wrap(new byte[] {0});
+			}
+			RiakObject object = new RiakObject().setContentType(Constants.CTYPE_OCTET_STREAM).setValue(BinaryValue.unsafeCreate(value.array()));
+			futures.add(client.executeAsync(new StoreValue.Builder(object).withLocation(new Location(bucket, row.getKey())).build()));
+		}
+		
+		boolean success = true;
+		for (RiakFuture<StoreValue.Response, Location> future: futures) {
+			try {
+				future.get();
+			} catch (Exception e) {
+				LOGGER.error("insertRows() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+				success = false;
+			}
+		}
+		this.logExecutionTime("insertRows()", System.currentTimeMillis() - t_start);
+		
+		return success;
+	}
+	
+	public boolean deleteRows (String keyspace, String table, List<String> keys) {
+		Namespace bucket = this.getKVBucket("deleteRows()", keyspace, table);
+		if (bucket == null) {
+			return false;
+		}
+		
+		long t_start = System.currentTimeMillis();
+		List<RiakFuture<Void, Location>> futures = new ArrayList<RiakFuture<Void, Location>>(keys.size());
+		for (String key: keys) {
+			futures.add(client.executeAsync(new DeleteValue.Builder(new Location(bucket, key)).build()));
+		}
+		
+		boolean success = true;
+		for (RiakFuture<Void, Location> future: futures) {
+			try {
+				future.get();
+			} catch (Exception e) {
+				LOGGER.error("deleteRows() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+				success = false;
+			}
+		}
+		this.logExecutionTime("deleteRows()", System.currentTimeMillis() - t_start);
+		
+		return success;
+	}
+	
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> getEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(entryKeys.size());
+		RiakMap rMap = null;
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("getEntriesFromMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+		} else {
+			try {
+				Location location = new Location(new Namespace(BUCKET_TYPE_MAPS, keyspace + ";" + table), mapName);
+				
+				// a single fetch serves all entries of the map
+				long t_start = System.currentTimeMillis();
+				rMap = client.execute(new FetchMap.Builder(location).build()).getDatatype();
+				this.logExecutionTime("getEntriesFromMap()", System.currentTimeMillis() - t_start);
+			} catch (Exception e) {
+			    LOGGER.error("getEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			}
+		}
+		
+		for (String entryKey: entryKeys) {
+			RiakRegister rRegister = (rMap == null)? null: rMap.getRegister(entryKey);
+			if (rRegister == null) {
+				entries.add(NO_ROW);
+			} else {
+				entries.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(entryKey, ByteBuffer.wrap(rRegister.view().unsafeGetValue())));
+			}
+		}
+		return entries;
+	}
+	
+	public boolean putEntriesToMap (String keyspace, String table, String mapName, List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("putEntriesToMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+		try {
+			Location location = new Location(new Namespace(BUCKET_TYPE_MAPS, keyspace + ";" + table), mapName);
+			
+			// all entries are applied with a single update
+			MapUpdate update = new MapUpdate();
+			for (AbstractMap.SimpleEntry<String, ByteBuffer> entry: entries) {
+				update.update(entry.getKey(), new RegisterUpdate(BinaryValue.unsafeCreate(entry.getValue().array())));
+			}
+			
+			long t_start = System.currentTimeMillis();
+			client.execute(new UpdateMap.Builder(location, update).build());
+			this.logExecutionTime("putEntriesToMap()", System.currentTimeMillis() - t_start);
+
+			return true;
+		} catch (Exception e) {
+		    LOGGER.error("putEntriesToMap() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return false;
+		}
+	}
+	
+	public boolean removeEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("removeEntriesFromMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+		try {
+			Location location = new Location(new Namespace(BUCKET_TYPE_MAPS, keyspace + ";" + table), mapName);
+			
+			long t_start = System.currentTimeMillis();
+			Context context = client.execute(new FetchMap.Builder(location).build()).getContext();
+			this.logExecutionTime("removeEntriesFromMap(fetch)", System.currentTimeMillis() - t_start);
+			
+			MapUpdate update = new MapUpdate();
+			for (String entryKey: entryKeys) {
+				update.removeRegister(entryKey);
+			}
+			
+			t_start = System.currentTimeMillis();
+			client.execute(new UpdateMap.Builder(location, update).withContext(context).build());
+			this.logExecutionTime("removeEntriesFromMap(update)", System.currentTimeMillis() - t_start);
+
+			return true;
+		} catch (Exception e) {
+		    LOGGER.error("removeEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return false;
+		}
+	}
+	
+	public boolean addItemsToSet (String keyspace, String table, String setName, List<String> setItems) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("addItemsToSet() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+		try {
+			Location location = new Location(new Namespace(BUCKET_TYPE_SETS, keyspace + ";" + table), setName);
+			
+			SetUpdate update = new SetUpdate();
+			for (String setItem: setItems) {
+				update.add(setItem);
+			}
+			
+			long t_start = System.currentTimeMillis();
+			client.execute(new UpdateSet.Builder(location, update).build());
+			this.logExecutionTime("addItemsToSet()", System.currentTimeMillis() - t_start);
+
+			return true;
+		} catch (Exception e) {
+		    LOGGER.error("addItemsToSet() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return false;
+		}
+	}
+	
+	public boolean removeItemsFromSet (String keyspace, String table, String setName, List<String> setItems) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("removeItemsFromSet() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+		try {
+			Location location = new Location(new Namespace(BUCKET_TYPE_SETS, keyspace + ";" + table), setName);
+			
+			long t_start = System.currentTimeMillis();
+			Context context = client.execute(new FetchSet.Builder(location).build()).getContext();
+			this.logExecutionTime("removeItemsFromSet(fetch)", System.currentTimeMillis() - t_start);
+			
+			SetUpdate update = new SetUpdate();
+			for (String setItem: setItems) {
+				update.remove(setItem);
+			}
+			
+			t_start = System.currentTimeMillis();
+			client.execute(new UpdateSet.Builder(location, update).withContext(context).build());
+			this.logExecutionTime("removeItemsFromSet(update)", System.currentTimeMillis() - t_start);
+
+			return true;
+		} catch (Exception e) {
+		    LOGGER.error("removeItemsFromSet() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return false;
+		}
+	}
 
 	private boolean notifyOthersDatalayerServers(String action, String table, String tableType) {
 		//LOGGER.info("notifyOthersDatalayerServers: action: " + action + ", table: " + table + ", type: " + tableType);
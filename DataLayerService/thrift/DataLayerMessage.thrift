@@ -46,6 +46,11 @@ struct StringPair {
 	2: string value
 }
 
+struct KeyScanResult {
+	1: list<string> keys,
+	2: string cursor
+}
+
 struct Metadata {
 	1: optional i32 replicationFactor,
 	2: optional string tableType
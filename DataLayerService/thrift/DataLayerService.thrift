@@ -41,6 +41,7 @@ service DataLayerService {
 	bool updateRow (1: string keyspace, 2: string table, 3: DataLayerMessage.KeyValuePair keyValuePair, 4: i32 locality),
 	bool deleteRow (1: string keyspace, 2: string table, 3: string key, 4: i32 locality),
 	list<string> selectKeys (1: string keyspace, 2: string table, 3: i32 start, 4: i32 count, 5: i32 locality),
+	DataLayerMessage.KeyScanResult scanKeys (1: string keyspace, 2: string table, 3: string prefix, 4: string cursor, 5: i32 count, 6: i32 locality),
 	
 	bool createCounter (1: string keyspace, 2: string table, 3: string counterName, 4: i64 initialValue, 5: i32 locality),
 	DataLayerMessage.KeyCounterPair getCounter (1: string keyspace, 2: string table, 3: string counterName, 4: i32 locality),
@@ -71,6 +72,17 @@ service DataLayerService {
 	bool deleteMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
 	list<string> selectMaps (1: string keyspace, 2: string table, 3: i32 start, 4: i32 count, 5: i32 locality),
 	
+	list<DataLayerMessage.KeyValuePair> multiSelectRows (1: string keyspace, 2: string table, 3: list<string> keys, 4: i32 locality),
+	bool multiInsertRows (1: string keyspace, 2: string table, 3: list<DataLayerMessage.KeyValuePair> keyValuePairs, 4: i32 locality),
+	bool multiDeleteRows (1: string keyspace, 2: string table, 3: list<string> keys, 4: i32 locality),
+	
+	list<DataLayerMessage.KeyValuePair> multiGetEntriesFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<string> entryKeys, 5: i32 locality),
+	bool multiPutEntriesToMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<DataLayerMessage.KeyValuePair> keyValuePairs, 5: i32 locality),
+	bool multiRemoveEntriesFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<string> entryKeys, 5: i32 locality),
+	
+	bool multiAddItemsToSet (1: string keyspace, 2: string table, 3: string setName, 4: list<string> setItems, 5: i32 locality),
+	bool multiRemoveItemsFromSet (1: string keyspace, 2: string table, 3: string setName, 4: list<string> setItems, 5: i32 locality),
+	
 	i64 totalMemory (),
 	i64 freeMemory (),
 	
@@ -0,0 +1,94 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""
+Micro-benchmark of the JSON backends in json_codec on representative envelopes.
+
+For each payload size, it measures one hop of the function worker hot path:
+encode the state output, encapsulate it with the metadata, decapsulate it and
+decode the state input (i.e., encode_output, encapsulate_output,
+decapsulate_input and decode_input), with both the JSON envelope and the
+versioned envelope with separate fields.
+
+Usage: python3 json_codec_benchmark.py [num_iterations]
+"""
+
+import json
+import sys
+import timeit
+
+sys.path.append("../python")
+import json_codec
+
+def make_metadata():
+    metadata = {}
+    metadata["__result_topic"] = "sandboxid-workflowid-end"
+    metadata["__execution_id"] = "f5c0ad8e3d8c11eb8a8e0242ac110003"
+    metadata["__function_execution_id"] = "f5c0ad8e3d8c11eb8a8e0242ac110003_0_0_1"
+    metadata["__async_execution"] = False
+    metadata["__client_origin_frontend"] = "http://10.0.0.1:8080"
+    metadata["state_counter"] = 3
+    return metadata
+
+def make_payload(size):
+    # a list of records similar to ETL workflow items
+    record = {"id": 0, "name": "item", "tags": ["a", "b/c", "d"], "price": 12.5, "valid": True, "note": None}
+    record_size = len(json.dumps(record))
+    payload = {"items": [], "source": "s3://bucket/path/to/object"}
+    for i in range(max(1, size // record_size)):
+        r = dict(record)
+        r["id"] = i
+        payload["items"].append(r)
+    return payload
+
+def hop_json_envelope(payload, metadata):
+    encoded = json_codec.dumps(payload)
+    envelope = json_codec.dumps({"__mfnuserdata": encoded, "__mfnmetadata": metadata})
+    decoded = json_codec.loads(envelope)
+    return json_codec.loads(decoded["__mfnuserdata"]), decoded["__mfnmetadata"]
+
+def hop_field_envelope(payload, metadata):
+    encoded = json_codec.dumps(payload)
+    fields = {"__mfnversion": "2", "__mfnuserdata": encoded, "__mfnmetadata": json_codec.dumps(metadata)}
+    return json_codec.loads(fields["__mfnuserdata"]), json_codec.loads(fields["__mfnmetadata"])
+
+def main():
+    # number of iterations for the 100 KB payload; scaled for the other sizes
+    num_iterations = 200
+    if len(sys.argv) > 1:
+        num_iterations = int(sys.argv[1])
+
+    metadata = make_metadata()
+    for size in [1024, 100 * 1024, 1024 * 1024]:
+        payload = make_payload(size)
+        iterations = max(5, num_iterations * 100 * 1024 // size)
+        for codec in [json_codec.CODEC_JSON, json_codec.CODEC_UJSON, json_codec.CODEC_ORJSON]:
+            if json_codec.set_codec(codec) != codec:
+                print("Skipping " + codec + ": not installed")
+                continue
+            for envelope, hop in [("json", hop_json_envelope), ("fields", hop_field_envelope)]:
+                total = timeit.timeit(lambda: hop(payload, metadata), number=iterations)
+                result = {}
+                result["codec"] = codec
+                result["envelope"] = envelope
+                result["size"] = size
+                result["iterations"] = iterations
+                result["us_per_hop"] = total / iterations * 1000000.0
+                print(json.dumps(result))
+
+    json_codec.set_codec(json_codec.CODEC_JSON)
+
+if __name__ == "__main__":
+    main()
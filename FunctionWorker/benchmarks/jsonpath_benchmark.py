@@ -0,0 +1,96 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+"""
+Micro-benchmark of the per-message JSONPath overhead of the ASL state engine.
+
+For a Task state with InputPath, ResultPath and OutputPath, it measures
+the path processing of one message (i.e., applyInputPath, applyResultPath
+and applyOutputPath of StateUtils), and compares it with parsing the same
+path expressions with the JSONPath library for every message.
+
+Usage: python3 jsonpath_benchmark.py [num_iterations]
+"""
+
+import json
+import logging
+import sys
+import timeit
+
+from ujsonpath import parse
+
+sys.path.append("../python")
+from StateUtils import StateUtils
+
+def make_state_utils(input_path, result_path, output_path):
+    state_info = {"Type": "Task", "Resource": "benchmark", "End": True}
+    state_info["InputPath"] = input_path
+    state_info["ResultPath"] = result_path
+    state_info["OutputPath"] = output_path
+
+    worker_params = {}
+    worker_params["function_state_type"] = StateUtils.taskStateType
+    worker_params["function_state_name"] = "benchmark"
+    worker_params["function_state_info"] = json.dumps(state_info)
+    worker_params["function_topic"] = "sandboxid-workflowid-benchmark"
+    worker_params["datalayer"] = "127.0.0.1:4998"
+    worker_params["storage_userid"] = "benchmark"
+    worker_params["internal_endpoint"] = "http://127.0.0.1:8080"
+    worker_params["function_runtime"] = "python"
+    worker_params["workflowid"] = "workflowid"
+    worker_params["sandboxid"] = "sandboxid"
+    return StateUtils(worker_params, logging.getLogger("jsonpath_benchmark"))
+
+def make_state_input():
+    detail = {"id": 1, "name": "item", "items": [{"id": i, "price": 12.5} for i in range(10)]}
+    return {"detail": detail, "source": "s3://bucket/path/to/object"}
+
+def message_state_utils(state_utils, state_input):
+    function_input = state_utils.applyInputPath(state_input)
+    raw_state_input_midway = state_utils.applyResultPath(state_input, function_input)
+    return state_utils.applyOutputPath(raw_state_input_midway)
+
+def message_parse(paths, state_input):
+    # parse every path expression for each message
+    input_path, result_path, output_path = paths
+    function_input = [match.value for match in parse(input_path).find(state_input)][0]
+    raw_state_input_midway = dict(state_input)
+    raw_state_input_midway[result_path.split(".")[-1]] = function_input
+    return [match.value for match in parse(output_path).find(raw_state_input_midway)][0]
+
+def main():
+    num_iterations = 10000
+    if len(sys.argv) > 1:
+        num_iterations = int(sys.argv[1])
+
+    state_input = make_state_input()
+    for label, paths in [("root", ("$", "$", "$")), ("fields", ("$.detail", "$.result", "$.result")),\
+            ("nested", ("$.detail.items", "$.result", "$.result")), ("index", ("$.detail.items[0]", "$.result", "$.result"))]:
+        state_utils = make_state_utils(*paths)
+        for mode, run in [("parse", lambda: message_parse(paths, state_input)),\
+                ("state_utils", lambda: message_state_utils(state_utils, state_input))]:
+            if mode == "parse" and label == "root":
+                # '$' has always been handled without the JSONPath library
+                continue
+            total = timeit.timeit(run, number=num_iterations)
+            result = {}
+            result["paths"] = label
+            result["mode"] = mode
+            result["iterations"] = num_iterations
+            result["us_per_message"] = total / num_iterations * 1000000.0
+            print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
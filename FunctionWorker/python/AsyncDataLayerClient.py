@@ -0,0 +1,101 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+import threading
+
+from DataLayerClient import DataLayerClient
+
+class AsyncDataLayerClient:
+    '''
+    AsyncDataLayerClient class
+    This class provides awaitable versions of the DataLayerClient operations,
+    so that a function can have multiple data layer requests in flight, e.g.:
+
+        values = await asyncio.gather(*[client.get(key) for key in keys])
+
+    The Thrift client is synchronous; each request runs in a thread of a bounded pool
+    and every thread uses a connection of its own, so up to max_concurrency
+    requests proceed in parallel over max_concurrency connections.
+    The constructor arguments other than max_concurrency are the ones of DataLayerClient.
+    '''
+    def __init__(self, max_concurrency=8, **client_args):
+        self._client_args = client_args
+        self._max_concurrency = max_concurrency
+        self._reset()
+
+    def _reset(self):
+        # threads do not survive fork(); a forked process creates its own pool and connections
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        self._local = threading.local()
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _get_thread_client(self):
+        dlc = getattr(self._local, "client", None)
+        if dlc is None:
+            dlc = DataLayerClient(**self._client_args)
+            self._local.client = dlc
+            with self._clients_lock:
+                self._clients.append(dlc)
+        return dlc
+
+    def _run(self, method_name, args, kwargs):
+        dlc = self._get_thread_client()
+        return getattr(dlc, method_name)(*args, **kwargs)
+
+    async def call(self, method_name, *args, **kwargs):
+        '''
+        Run any DataLayerClient operation (e.g., "getMapEntry") without blocking the event loop.
+        '''
+        if self._pid != os.getpid():
+            self._reset()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._run, method_name, args, kwargs))
+
+    # (key, value) operations
+    async def put(self, key, value, locality=None, tableName=None):
+        return await self.call("put", key, value, locality=locality, tableName=tableName)
+
+    async def get(self, key, locality=None, tableName=None):
+        return await self.call("get", key, locality=locality, tableName=tableName)
+
+    async def delete(self, key, tableName=None):
+        return await self.call("delete", key, tableName=tableName)
+
+    async def putMultiple(self, key_value_map, locality=None, tableName=None):
+        return await self.call("putMultiple", key_value_map, locality=locality, tableName=tableName)
+
+    async def getMultiple(self, keys, locality=None, tableName=None):
+        return await self.call("getMultiple", keys, locality=locality, tableName=tableName)
+
+    async def deleteMultiple(self, keys, tableName=None):
+        return await self.call("deleteMultiple", keys, tableName=tableName)
+
+    def shutdown(self):
+        if self._pid != os.getpid():
+            # the connections belong to the parent process
+            return
+        self._executor.shutdown(wait=True)
+        with self._clients_lock:
+            clients = self._clients
+            self._clients = []
+        for dlc in clients:
+            dlc.shutdown()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        self._local = threading.local()
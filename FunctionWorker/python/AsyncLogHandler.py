@@ -0,0 +1,167 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+import collections
+import logging
+import os
+import threading
+
+class AsyncLogHandler(logging.Handler):
+    '''
+    AsyncLogHandler class
+    This class buffers the log records in memory and writes them
+    in batches to the target handler from a background thread,
+    so that the log I/O is not on the critical path of a function execution.
+    The buffer is bounded; records that do not fit are dropped and counted
+    (reported with each execution's progress record, see get_num_dropped_all()),
+    except for the checkpoint records used for recovery and progress tracking,
+    which are then written synchronously after the buffered records.
+
+    Background threads do not survive fork(); a forked process starts its own writer
+    on its first record and must call flush() (or flush_all()) before os._exit().
+    '''
+    _handlers = []
+
+    # records that must not be dropped (see PublicationUtils)
+    CHECKPOINT_PREFIXES = ("[__mfn_progress]", "[__mfn_backup]")
+
+    def __init__(self, target, max_buffered_bytes=16 * 1024 * 1024, flush_interval=0.2, batch_size=1000):
+        logging.Handler.__init__(self)
+        self._target = target
+        self._max_buffered_bytes = max_buffered_bytes
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+
+        self._pid = None
+        self._reset()
+
+        AsyncLogHandler._handlers.append(self)
+
+    def _reset(self):
+        # also called in a forked process, so that it does not write the records buffered by its parent
+        self._buffer = collections.deque()
+        self._buffered_bytes = 0
+        self._num_dropped = 0
+        # all records dropped by this process; not reset after the warning about them is written
+        self._num_dropped_total = 0
+        self._last_dropped = None
+        self._cond = threading.Condition(threading.Lock())
+        # held while writing a batch, so that flush() returns only after the records taken by the writer thread are written
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._pid = os.getpid()
+
+    def _start_writer(self):
+        self._writer = threading.Thread(target=self._run_writer)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self._batch_size:
+                    self._cond.wait(self._flush_interval)
+            self._write_buffered()
+
+    def _write_buffered(self, sync_record=None):
+        with self._write_lock:
+            with self._cond:
+                records = self._buffer
+                num_dropped = self._num_dropped
+                last_dropped = self._last_dropped
+                self._buffer = collections.deque()
+                self._buffered_bytes = 0
+                self._num_dropped = 0
+                self._last_dropped = None
+
+            for record in records:
+                self._target.handle(record)
+
+            if num_dropped > 0:
+                # keep the other attributes of the dropped record, so that the target's formatter can use them
+                warning = dict(last_dropped.__dict__)
+                warning["levelno"] = logging.WARNING
+                warning["levelname"] = logging.getLevelName(logging.WARNING)
+                warning["msg"] = "[AsyncLogHandler] Dropped " + str(num_dropped) + " log records, because the buffer was full."
+                warning["exc_text"] = None
+                self._target.handle(logging.makeLogRecord(warning))
+
+            if sync_record is not None:
+                self._target.handle(sync_record)
+
+            self._target.flush()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            # the parent's writer thread might have been holding the target's lock at fork time
+            self._target.createLock()
+            self._reset()
+
+        try:
+            # resolve the message and exception now; their arguments may change before the record is written
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+        except Exception:
+            self.handleError(record)
+            return
+
+        size = len(record.msg)
+        with self._cond:
+            is_full = self._buffered_bytes + size > self._max_buffered_bytes
+            if is_full and not record.msg.startswith(AsyncLogHandler.CHECKPOINT_PREFIXES):
+                self._num_dropped += 1
+                self._num_dropped_total += 1
+                self._last_dropped = record
+                return
+            if not is_full:
+                self._buffer.append(record)
+                self._buffered_bytes += size
+                if len(self._buffer) >= self._batch_size:
+                    self._cond.notify()
+
+        if is_full:
+            self._write_buffered(record)
+            return
+
+        if self._writer is None:
+            self._start_writer()
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return
+        self._write_buffered()
+
+    def close(self):
+        self.flush()
+        self._target.close()
+        logging.Handler.close(self)
+
+    def get_num_dropped(self):
+        if self._pid != os.getpid():
+            # the records were dropped by the parent
+            return 0
+        return self._num_dropped_total
+
+    @staticmethod
+    def flush_all():
+        for handler in AsyncLogHandler._handlers:
+            handler.flush()
+
+    @staticmethod
+    def get_num_dropped_all():
+        return sum([handler.get_num_dropped() for handler in AsyncLogHandler._handlers])
@@ -12,7 +12,15 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import bisect
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hashlib
+import json
+import threading
 import time
+import uuid
 
 from thrift import Thrift
 from thrift.transport import TSocket
@@ -25,7 +33,106 @@ from data_layer.service import DataLayerService
 
 MAX_RETRIES = 3
 
+# put_stream()/get_stream(): chunk size in bytes and number of chunks per request
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_BATCH_SIZE = 8
+STREAM_MANIFEST_MARKER = "__mfn_stream"
+STREAM_CHUNK_KEY_PREFIX = "__mfn_stream_chunk_"
+STREAM_MANIFEST_KEY_PREFIX = "__mfn_stream_manifest_"
+# put_stream()/get_stream(): number of batches in flight (each over a connection of its own)
+STREAM_MAX_PARALLEL = 4
+
+# reserved name prefix of the maps with the branch outputs of Map and Parallel states
+BRANCH_OUTPUTS_MAP_PREFIX = "__mfn_branch_outputs_"
+
+# upper bounds (ms) of the latency histogram buckets of the request statistics;
+# the last bucket counts the slower requests
+STATS_LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0]
+
+def _payload_size(obj):
+    # approximate number of bytes of the strings and binary values in a request or a response
+    if isinstance(obj, (bytes, str)):
+        return len(obj)
+    if isinstance(obj, (list, tuple, set)):
+        return sum([_payload_size(item) for item in obj])
+    if isinstance(obj, dict):
+        return sum([_payload_size(key) + _payload_size(obj[key]) for key in obj])
+    fields = getattr(obj, "__dict__", None)
+    if fields is not None:
+        # thrift structs (e.g., KeyValuePair)
+        return sum([_payload_size(value) for value in fields.values()])
+    return 0
+
+class _InstrumentedDataLayerService:
+    '''
+    Wraps a DataLayerService client and records every request in the statistics of DataLayerClient.
+    Only used when the statistics are enabled, so that the requests do not pay for them otherwise.
+    '''
+    def __init__(self, datalayer):
+        self._datalayer = datalayer
+
+    def __getattr__(self, name):
+        method = getattr(self._datalayer, name)
+
+        def instrumented_method(*args):
+            t_start = time.time()
+            try:
+                result = method(*args)
+            except TTransport.TTransportException:
+                DataLayerClient.record_request(name, args, None, t_start, failed=True)
+                raise
+            DataLayerClient.record_request(name, args, result, t_start)
+            return result
+
+        setattr(self, name, instrumented_method)
+        return instrumented_method
+
+class _StreamBatchPool:
+    '''
+    Runs the requests of the batches of chunks of a stream in a bounded thread pool.
+    Every thread uses a connection of its own (a copy of the client with a new connection),
+    so that the connection of the client stays available to its other callers.
+    '''
+    def __init__(self, dlc, max_parallel):
+        self._dlc = dlc
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_parallel))
+        self._local = threading.local()
+        self._clients = []
+        self._clients_lock = threading.Lock()
+
+    def _get_thread_client(self):
+        dlc = getattr(self._local, "client", None)
+        if dlc is None:
+            dlc = copy.copy(self._dlc)
+            dlc.connect()
+            self._local.client = dlc
+            with self._clients_lock:
+                self._clients.append(dlc)
+        return dlc
+
+    def _run(self, method_name, args):
+        return getattr(self._get_thread_client(), method_name)(*args)
+
+    def submit(self, method_name, *args):
+        return self._executor.submit(self._run, method_name, args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        with self._clients_lock:
+            clients = self._clients
+            self._clients = []
+        for dlc in clients:
+            dlc.shutdown()
+
 class DataLayerClient:
+    # number of connection setups in this process (e.g., reported per function execution)
+    num_connects = 0
+
+    # request statistics of this process per request type and table (see enable_stats()):
+    # {"<request>:<table>": [count, total ms, bytes out, bytes in, reconnects, latency histogram]}
+    collect_stats = False
+    _stats = {}
+    _stats_lock = threading.Lock()
 
     def __init__(self, locality=1, sid=None, wid=None, suid=None, is_wf_private=False, for_mfn=False, connect="127.0.0.1:4998", init_tables=False, drop_keyspace=False, tableName=None):
         self.dladdress = connect
@@ -115,6 +222,9 @@ class DataLayerClient:
                 self.transport.open()
                 self.protocol = TCompactProtocol.TCompactProtocol(self.transport)
                 self.datalayer = DataLayerService.Client(self.protocol)
+                if DataLayerClient.collect_stats:
+                    self.datalayer = _InstrumentedDataLayerService(self.datalayer)
+                DataLayerClient.num_connects += 1
                 break
             except Thrift.TException as exc:
                 if retry < 60:
@@ -124,6 +234,85 @@ class DataLayerClient:
                 else:
                     raise
 
+    # request statistics
+    @classmethod
+    def enable_stats(cls, enabled=True):
+        '''
+        Record count, latency, payload sizes and reconnects of the requests of the clients
+        that connect afterwards (i.e., enable before creating the clients).
+        '''
+        cls.collect_stats = enabled
+
+    @classmethod
+    def record_request(cls, request, args, result, t_start, failed=False):
+        duration = (time.time() - t_start) * 1000.0
+        # the table is the second argument of the table-level requests (after the keyspace)
+        if len(args) > 1 and isinstance(args[1], str):
+            key = request + ":" + args[1]
+            bytes_out = _payload_size(args[2:])
+        else:
+            key = request
+            bytes_out = _payload_size(args[1:])
+        bytes_in = _payload_size(result)
+
+        with cls._stats_lock:
+            entry = cls._stats.get(key)
+            if entry is None:
+                entry = [0, 0.0, 0, 0, 0, [0] * (len(STATS_LATENCY_BUCKETS_MS) + 1)]
+                cls._stats[key] = entry
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += bytes_out
+            entry[3] += bytes_in
+            if failed:
+                entry[4] += 1
+            entry[5][bisect.bisect_left(STATS_LATENCY_BUCKETS_MS, duration)] += 1
+
+    @classmethod
+    def get_stats(cls, with_histogram=False):
+        stats = {}
+        with cls._stats_lock:
+            for key, entry in cls._stats.items():
+                stats[key] = {"count": entry[0], "ms": round(entry[1], 3), "bytes_out": entry[2], "bytes_in": entry[3], "reconnects": entry[4]}
+                if with_histogram:
+                    stats[key]["hist"] = list(entry[5])
+        return stats
+
+    @classmethod
+    def reset_stats(cls):
+        # also called in a forked process, where the lock may have been held by a thread of the parent
+        cls._stats_lock = threading.Lock()
+        cls._stats = {}
+
+    @staticmethod
+    def merge_stats(total, stats):
+        '''
+        Add the statistics (from get_stats(with_histogram=True)) to the total (e.g., of a function worker).
+        '''
+        for key, entry in stats.items():
+            if key not in total:
+                total[key] = {"count": 0, "ms": 0.0, "bytes_out": 0, "bytes_in": 0, "reconnects": 0, "hist": [0] * (len(STATS_LATENCY_BUCKETS_MS) + 1)}
+            total_entry = total[key]
+            for field in ["count", "ms", "bytes_out", "bytes_in", "reconnects"]:
+                total_entry[field] += entry[field]
+            for i, bucket_count in enumerate(entry.get("hist", [])):
+                total_entry["hist"][i] += bucket_count
+        return total
+
+    @staticmethod
+    def get_latency_percentile(histogram, percentile):
+        # upper bound of the histogram bucket of the percentile (ms); None for the last bucket
+        count = sum(histogram)
+        if count == 0:
+            return 0.0
+        rank = count * percentile / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(histogram):
+            seen += bucket_count
+            if seen >= rank:
+                return STATS_LATENCY_BUCKETS_MS[i] if i < len(STATS_LATENCY_BUCKETS_MS) else None
+        return None
+
     # (key, value) operations
     def put(self, key, value, locality=None, tableName=None):
         #print("Client keyspace=%s, tablename=%s putting key %s" % (self.keyspace,self.tablename,key))
@@ -170,13 +359,14 @@ class DataLayerClient:
 
         return val
 
-    def delete(self, key, tableName=None):
+    def delete(self, key, locality=None, tableName=None):
         status = False
+        loc = self.locality if locality is None else locality
         table = self.tablename if tableName is None else tableName
         #print("[DataLayerClient] [DELETE] keyspace=%s, tablename=%s deleting key %s" % (self.keyspace,table,key))
         for retry in range(MAX_RETRIES):
             try:
-                status = self.datalayer.deleteRow(self.keyspace, table, key, self.locality)
+                status = self.datalayer.deleteRow(self.keyspace, table, key, loc)
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed delete: " + str(exc))
@@ -187,6 +377,239 @@ class DataLayerClient:
 
         return status
 
+    # batched (key, value) operations; each is a single round-trip
+    def putMultiple(self, key_value_map, locality=None, tableName=None):
+        status = False
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        rows = []
+        for key in key_value_map:
+            value = key_value_map[key]
+            if value is None:
+                value = ""
+            rows.append(KeyValuePair(key, value.encode()))
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiInsertRows(self.keyspace, table, rows, loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed putMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed putMultiple: " + str(exc))
+                raise
+
+        return status
+
+    def getMultiple(self, keys, locality=None, tableName=None):
+        # returns a dict with the values of the given keys; None for the keys that do not exist
+        values = {}
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        for retry in range(MAX_RETRIES):
+            try:
+                results = self.datalayer.multiSelectRows(self.keyspace, table, keys, loc)
+                for key, result in zip(keys, results):
+                    values[key] = None
+                    if result.key != "" and result.key == key:
+                        values[key] = result.value.decode()
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed getMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed getMultiple: " + str(exc))
+                raise
+
+        return values
+
+    def deleteMultiple(self, keys, locality=None, tableName=None):
+        status = False
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiDeleteRows(self.keyspace, table, keys, loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed deleteMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed deleteMultiple: " + str(exc))
+                raise
+
+        return status
+
+    # streaming operations for large values
+    # the chunks are stored under their own keys and the manifest of the value under a key derived from its key
+    # (written last, so that a reader never sees a partially written value)
+    # the batches of chunks are transferred in parallel over connections of their own (see _StreamBatchPool)
+    def put_stream(self, key, iterable_of_bytes, chunk_size=STREAM_CHUNK_SIZE, batch_size=STREAM_BATCH_SIZE, max_parallel=STREAM_MAX_PARALLEL, tableName=None):
+        table = self.tablename if tableName is None else tableName
+        old_manifest = self._get_stream_manifest(key, table)
+
+        stream_id = uuid.uuid4().hex
+        digest = hashlib.sha256()
+        chunk_digests = []
+        pool = _StreamBatchPool(self, max_parallel)
+        size = None
+        try:
+            size = self._write_stream_chunks(pool, stream_id, iterable_of_bytes, chunk_size, batch_size, max_parallel, table, digest, chunk_digests)
+        finally:
+            pool.shutdown()
+            if size is None:
+                # a batch could not be stored: remove the chunks that have been written
+                self._delete_stream_chunks(stream_id, len(chunk_digests), table)
+        if size is None:
+            return False
+
+        manifest = {STREAM_MANIFEST_MARKER: stream_id, "size": size, "chunk_size": chunk_size, "sha256": digest.hexdigest(), "chunks": chunk_digests}
+        status = self.put(STREAM_MANIFEST_KEY_PREFIX + key, json.dumps(manifest), tableName=table)
+
+        # remove the chunks of the value that has just been replaced (or of the new value, if it could not be stored)
+        if status and old_manifest is not None:
+            self._delete_stream_chunks(old_manifest[STREAM_MANIFEST_MARKER], len(old_manifest["chunks"]), table)
+        elif not status:
+            self._delete_stream_chunks(stream_id, len(chunk_digests), table)
+
+        return status
+
+    def get_stream(self, key, batch_size=STREAM_BATCH_SIZE, max_parallel=STREAM_MAX_PARALLEL, tableName=None):
+        # returns a generator of the chunks (bytes); None if the key is not a stream
+        table = self.tablename if tableName is None else tableName
+        manifest = self._get_stream_manifest(key, table)
+        if manifest is None:
+            return None
+        return self._read_stream_chunks(key, manifest, batch_size, max_parallel, table)
+
+    def delete_stream(self, key, tableName=None):
+        table = self.tablename if tableName is None else tableName
+        manifest = self._get_stream_manifest(key, table)
+        status = self.delete(STREAM_MANIFEST_KEY_PREFIX + key, tableName=table)
+        if manifest is not None:
+            self._delete_stream_chunks(manifest[STREAM_MANIFEST_MARKER], len(manifest["chunks"]), table)
+        return status
+
+    def _get_stream_manifest(self, key, table):
+        value = self.get(STREAM_MANIFEST_KEY_PREFIX + key, tableName=table)
+        if value is None or not value.startswith("{"):
+            return None
+        try:
+            manifest = json.loads(value)
+        except Exception:
+            return None
+        if not isinstance(manifest, dict) or STREAM_MANIFEST_MARKER not in manifest:
+            return None
+        return manifest
+
+    @staticmethod
+    def _get_stream_chunk_key(stream_id, index):
+        return STREAM_CHUNK_KEY_PREFIX + stream_id + "_" + str(index)
+
+    def _write_stream_chunks(self, pool, stream_id, iterable_of_bytes, chunk_size, batch_size, max_parallel, table, digest, chunk_digests):
+        # returns the size of the value; None if a batch could not be stored
+        # at most max_parallel batches are in flight, so that the input is read as fast as it is stored
+        pending = collections.deque()
+        status = True
+        size = 0
+        rows = []
+        buf = bytearray()
+        for data in iterable_of_bytes:
+            if isinstance(data, str):
+                data = data.encode()
+            buf.extend(data)
+            while len(buf) >= chunk_size:
+                rows.append(self._make_stream_chunk(stream_id, len(chunk_digests), bytes(buf[:chunk_size]), digest, chunk_digests))
+                size += chunk_size
+                del buf[:chunk_size]
+                if len(rows) >= batch_size:
+                    pending.append(pool.submit("_insert_rows", rows, table))
+                    rows = []
+                    if len(pending) >= max_parallel:
+                        status = pending.popleft().result()
+                        if not status:
+                            break
+            if not status:
+                break
+        if status and buf:
+            rows.append(self._make_stream_chunk(stream_id, len(chunk_digests), bytes(buf), digest, chunk_digests))
+            size += len(buf)
+        if status and rows:
+            pending.append(pool.submit("_insert_rows", rows, table))
+        while pending:
+            status = pending.popleft().result() and status
+        if not status:
+            return None
+        return size
+
+    def _make_stream_chunk(self, stream_id, index, chunk, digest, chunk_digests):
+        digest.update(chunk)
+        chunk_digests.append(hashlib.sha1(chunk).hexdigest())
+        return KeyValuePair(self._get_stream_chunk_key(stream_id, index), chunk)
+
+    def _read_stream_chunks(self, key, manifest, batch_size, max_parallel, table):
+        # the next batches (up to max_parallel) are retrieved while the chunks of the current one are consumed
+        stream_id = manifest[STREAM_MANIFEST_MARKER]
+        chunk_digests = manifest["chunks"]
+        digest = hashlib.sha256()
+        pool = _StreamBatchPool(self, max_parallel)
+        pending = collections.deque()
+        next_start = 0
+        try:
+            while pending or next_start < len(chunk_digests):
+                while next_start < len(chunk_digests) and len(pending) < max_parallel:
+                    indices = range(next_start, min(next_start + batch_size, len(chunk_digests)))
+                    chunk_keys = [self._get_stream_chunk_key(stream_id, i) for i in indices]
+                    pending.append((indices, chunk_keys, pool.submit("_select_rows", chunk_keys, table)))
+                    next_start += batch_size
+                indices, chunk_keys, future = pending.popleft()
+                results = future.result()
+                if len(results) != len(chunk_keys):
+                    raise IOError("[DataLayerClient] Missing chunks of stream: " + key)
+                for i, chunk_key, result in zip(indices, chunk_keys, results):
+                    if result.key != chunk_key or hashlib.sha1(result.value).hexdigest() != chunk_digests[i]:
+                        raise IOError("[DataLayerClient] Missing or corrupted chunk " + str(i) + " of stream: " + key)
+                    digest.update(result.value)
+                    yield result.value
+        finally:
+            pool.shutdown()
+
+        if digest.hexdigest() != manifest["sha256"]:
+            raise IOError("[DataLayerClient] Integrity check failed for stream: " + key)
+
+    def _delete_stream_chunks(self, stream_id, num_chunks, table):
+        chunk_keys = [self._get_stream_chunk_key(stream_id, i) for i in range(num_chunks)]
+        if chunk_keys:
+            self.deleteMultiple(chunk_keys, tableName=table)
+
+    def _insert_rows(self, rows, table):
+        status = False
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiInsertRows(self.keyspace, table, rows, self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed put_stream: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed put_stream: " + str(exc))
+                raise
+        return status
+
+    def _select_rows(self, keys, table):
+        results = []
+        for retry in range(MAX_RETRIES):
+            try:
+                results = self.datalayer.multiSelectRows(self.keyspace, table, keys, self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed get_stream: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed get_stream: " + str(exc))
+                raise
+        return results
+
     # map operations
     def createMap(self, mapname):
         status = False
@@ -255,6 +678,62 @@ class DataLayerClient:
                 raise
         return status
 
+    def putMapEntries(self, mapname, key_value_map, locality=None):
+        status = False
+        loc = self.locality if locality is None else locality
+        rows = []
+        for key in key_value_map:
+            value = key_value_map[key]
+            if value is None:
+                value = ""
+            rows.append(KeyValuePair(key, value.encode()))
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiPutEntriesToMap(self.keyspace, self.maptablename, mapname, rows, loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed putMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed putMapEntries: " + str(exc))
+                raise
+
+        return status
+
+    def getMapEntries(self, mapname, keys):
+        # returns a dict with the values of the given keys; None for the keys that do not exist
+        values = {}
+        for retry in range(MAX_RETRIES):
+            try:
+                kvps = self.datalayer.multiGetEntriesFromMap(self.keyspace, self.maptablename, mapname, keys, self.locality)
+                for key, kvp in zip(keys, kvps):
+                    values[key] = None
+                    if kvp.key != "" and kvp.key == key:
+                        values[key] = kvp.value.decode()
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed getMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed getMapEntries: " + str(exc))
+                raise
+
+        return values
+
+    def deleteMapEntries(self, mapname, keys):
+        status = False
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiRemoveEntriesFromMap(self.keyspace, self.maptablename, mapname, keys, self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed deleteMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed deleteMapEntries: " + str(exc))
+                raise
+        return status
+
     def containsMapKey(self, mapname, key):
         ret = False
         for retry in range(MAX_RETRIES):
@@ -336,9 +815,17 @@ class DataLayerClient:
 
     def getMapNames(self, start_index=0, end_index=2147483647):
         maps = []
+        map_response = []
         for retry in range(MAX_RETRIES):
             try:
                 maps = self.datalayer.selectMaps(self.keyspace, self.maptablename, start_index, end_index, self.locality)
+                if maps is not None or isinstance(maps, list):
+                    for name in maps:
+                        if name.startswith(BRANCH_OUTPUTS_MAP_PREFIX):
+                            continue
+                        else:
+                            map_response.append(name)
+
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed getMapNames: " + str(exc))
@@ -346,7 +833,7 @@ class DataLayerClient:
             except Exception as exc:
                 print("[DataLayerClient] failed getMapNames: " + str(exc))
                 raise
-        return maps
+        return map_response
 
     # set operations
     def createSet(self, setname):
@@ -391,6 +878,34 @@ class DataLayerClient:
                 raise
         return status
 
+    def addSetEntries(self, setname, items):
+        status = False
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiAddItemsToSet(self.keyspace, self.settablename, setname, items, self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed addSetEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed addSetEntries: " + str(exc))
+                raise
+        return status
+
+    def removeSetEntries(self, setname, items):
+        status = False
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.multiRemoveItemsFromSet(self.keyspace, self.settablename, setname, items, self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed removeSetEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed removeSetEntries: " + str(exc))
+                raise
+        return status
+
     def containsSetItem(self, setname, item):
         ret = False
         for retry in range(MAX_RETRIES):
@@ -521,6 +1036,30 @@ class DataLayerClient:
                 raise
         return status
 
+    def incrementAndGetCounter(self, countername, increment, tableName=None):
+        '''
+        Increment the counter and return its new value (None if the counter does not exist).
+        No increment is lost, but the returned value is the view of a single replica
+        (Riak counters are CRDTs): concurrent callers may observe the same value, a value may be skipped,
+        and a retry after a connection failure may apply the increment twice.
+        So the value cannot be used to claim an item or to detect the last of several callers exactly.
+        '''
+        cv = None
+        table = self.countertablename if tableName is None else tableName
+        for retry in range(MAX_RETRIES):
+            try:
+                kcp = self.datalayer.incrementCounter(self.keyspace, table, countername, increment, self.locality)
+                if kcp.key != "" and kcp.key == countername:
+                    cv = kcp.counter
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed incrementAndGetCounter: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed incrementAndGetCounter: " + str(exc))
+                raise
+        return cv
+
     def decrementCounter(self, countername, decrement, tableName=None):
         status = False
         table = self.countertablename if tableName is None else tableName
@@ -591,10 +1130,7 @@ class DataLayerClient:
                 listkeys_response = self.datalayer.selectKeys(self.keyspace, table, start, count, self.locality)
                 if listkeys_response is not None or isinstance(listkeys_response, list):
                     for key in listkeys_response:
-                        if key.startswith("grain_requirements_") or\
-                            key.startswith("grain_source_") or\
-                            key.startswith("workflow_json_") or\
-                            key.endswith("_metadata"):
+                        if self._is_internal_key(key):
                             continue
                         else:
                             keys_response.append(key)
@@ -608,6 +1144,49 @@ class DataLayerClient:
 
         return keys_response
 
+    def scanKeys(self, prefix="", cursor="", count=1000, tableName=None):
+        # returns the next (up to) 'count' keys starting with 'prefix' in key order after 'cursor',
+        # and the cursor to continue from ("": no more keys)
+        keys_response = []
+        next_cursor = ""
+        table = self.tablename if tableName is None else tableName
+
+        for retry in range(MAX_RETRIES):
+            try:
+                scan_result = self.datalayer.scanKeys(self.keyspace, table, prefix, cursor, count, self.locality)
+                if scan_result is not None:
+                    # the cursor is from the server, so that filtering the keys does not affect it
+                    next_cursor = scan_result.cursor
+                    keys_response = [key for key in scan_result.keys if not self._is_internal_key(key)]
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed scanKeys: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed scanKeys: " + str(exc))
+                raise
+
+        return keys_response, next_cursor
+
+    def iterKeys(self, prefix="", batch_size=1000, tableName=None):
+        # generator of all keys starting with 'prefix'; each batch is a single request
+        cursor = ""
+        while True:
+            keys, cursor = self.scanKeys(prefix, cursor, batch_size, tableName)
+            for key in keys:
+                yield key
+            if cursor == "":
+                break
+
+    @staticmethod
+    def _is_internal_key(key):
+        return key.startswith("grain_requirements_") or\
+            key.startswith("grain_source_") or\
+            key.startswith("workflow_json_") or\
+            key.startswith(STREAM_CHUNK_KEY_PREFIX) or\
+            key.startswith(STREAM_MANIFEST_KEY_PREFIX) or\
+            key.endswith("_metadata")
+
     def shutdown(self):
         self._is_running = False
         try:
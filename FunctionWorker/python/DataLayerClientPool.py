@@ -0,0 +1,148 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import threading
+import time
+
+from DataLayerClient import DataLayerClient
+
+class DataLayerClientPool:
+    '''
+    DataLayerClientPool class
+    This class keeps the idle DataLayerClient connections of this process,
+    keyed by the data layer address, keyspace and tables of the client,
+    so that short-lived users (e.g., the counter operations of Map and Parallel states)
+    do not pay a connection setup per operation.
+
+    A client is taken with acquire() (same arguments as the DataLayerClient constructor)
+    and given back with release() instead of shutdown().
+    Idle clients are health-checked before they are handed out again.
+    The pool is per process; a forked process drops the clients of its parent
+    without closing them, because the parent is still using the same connections.
+    '''
+    MAX_IDLE_PER_KEY = 4
+    # idle clients older than this are checked with a request before being reused
+    HEALTH_CHECK_INTERVAL = 10.0 #s
+
+    _lock = threading.Lock()
+    _pid = None
+    _idle = {}
+    _stats = {"hits": 0, "misses": 0, "health_check_failures": 0, "discarded": 0}
+
+    @classmethod
+    def acquire(cls, locality=1, sid=None, wid=None, suid=None, is_wf_private=False, for_mfn=False, connect="127.0.0.1:4998", tableName=None):
+        key = (connect, locality, sid, wid, suid, is_wf_private, for_mfn, tableName)
+        while True:
+            with cls._lock:
+                cls._check_pid()
+                clients = cls._idle.get(key)
+                if not clients:
+                    cls._stats["misses"] += 1
+                    break
+                dlc, last_used = clients.pop()
+
+            if cls._is_healthy(dlc, last_used):
+                with cls._lock:
+                    cls._stats["hits"] += 1
+                return dlc
+
+            with cls._lock:
+                cls._stats["health_check_failures"] += 1
+            cls._close(dlc)
+
+        dlc = DataLayerClient(locality=locality, sid=sid, wid=wid, suid=suid, is_wf_private=is_wf_private, for_mfn=for_mfn, connect=connect, tableName=tableName)
+        dlc._pool_key = key
+        dlc._pool_pid = os.getpid()
+        return dlc
+
+    @classmethod
+    def release(cls, dlc):
+        key = getattr(dlc, "_pool_key", None)
+        if key is None or dlc._pool_pid != os.getpid():
+            # not from the pool or inherited from the parent process
+            cls._close(dlc)
+            return
+
+        with cls._lock:
+            cls._check_pid()
+            clients = cls._idle.setdefault(key, [])
+            if len(clients) < cls.MAX_IDLE_PER_KEY:
+                clients.append((dlc, time.time()))
+                return
+            cls._stats["discarded"] += 1
+
+        cls._close(dlc)
+
+    @classmethod
+    def get_stats(cls):
+        with cls._lock:
+            cls._check_pid()
+            stats = dict(cls._stats)
+            stats["idle"] = sum([len(clients) for clients in cls._idle.values()])
+        return stats
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._lock:
+            for name in cls._stats:
+                cls._stats[name] = 0
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._check_pid()
+            idle = cls._idle
+            cls._idle = {}
+
+        for clients in idle.values():
+            for dlc, _ in clients:
+                cls._close(dlc)
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        # the lock might have been held by another thread of the parent at the time of fork()
+        cls._lock = threading.Lock()
+
+    @classmethod
+    def _check_pid(cls):
+        # called with the lock held
+        pid = os.getpid()
+        if cls._pid != pid:
+            # the idle connections belong to the parent process; just forget about them
+            cls._idle = {}
+            for name in cls._stats:
+                cls._stats[name] = 0
+            cls._pid = pid
+
+    @classmethod
+    def _is_healthy(cls, dlc, last_used):
+        try:
+            if not dlc.transport.isOpen():
+                return False
+            if time.time() - last_used > cls.HEALTH_CHECK_INTERVAL:
+                dlc.datalayer.totalMemory()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(dlc):
+        try:
+            dlc.shutdown()
+        except Exception:
+            pass
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=DataLayerClientPool._after_fork_in_child)
@@ -12,9 +12,18 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from DataLayerClient import DataLayerClient
+import time
+
+from AsyncDataLayerClient import AsyncDataLayerClient
+from DataLayerClientPool import DataLayerClientPool
+from DataLayerWriteBehind import DataLayerWriteBehind
 
 class DataLayerOperator:
+    # cross-execution tier of the read cache for get(): {(is_private, table, key): (value, expiry)}
+    # kept per process, so it is only used by processes that handle multiple executions (i.e., warm pool instances);
+    # a process forked per message would discard it (see set_shared_read_cache())
+    _shared_read_cache = {}
+    MAX_SHARED_READ_CACHE_ENTRIES = 10000
 
     def __init__(self, suid, sid, wid, datalayer):
         self._storage_userid = suid
@@ -25,6 +34,22 @@ class DataLayerOperator:
         # global data layer clients for either workflow-private data or user storage
         self._data_layer_client = None
         self._data_layer_client_private = None
+        # asyncio clients for the awaitable operations (e.g., aget())
+        self._async_data_layer_client = None
+        self._async_data_layer_client_private = None
+        # whether the clients should be kept open after committing the changes
+        # (i.e., in a warm pool instance that handles multiple executions)
+        self._reuse_clients = False
+
+        # read cache for get() (see set_read_cache())
+        self._read_cache_enabled = False
+        self._read_cache_ttl = 0
+        self._read_cache = {}
+        self._shared_read_cache_enabled = False
+
+        # write-behind of the (key, value) operations via the local data layer (see set_write_behind())
+        self._write_behind = None
+        self._write_behind_flush_on_publish = True
 
         # TODO (?): use the local data layer for operations regarding KV, maps, sets and counters instead of in-memory data structures (e.g., transient_data_output)
         # and store the operations/data for is_queued = True operations,
@@ -36,17 +61,28 @@ class DataLayerOperator:
         self.data_to_be_deleted = {}
         self.data_to_be_deleted_private = {}
 
+        self._init_transient_data_structures()
+
+    def _init_transient_data_structures(self):
+        # maps, sets and counters of queued operations (see commit_transient_data_structures())
         self.map_output = {}
         self.set_output = {}
         self.counter_output = {}
+        self.map_output_private = {}
+        self.set_output_private = {}
+        self.counter_output_private = {}
 
         self.map_output_delete = {}
         self.set_output_delete = {}
         self.counter_output_delete = {}
+        self.map_output_delete_private = {}
+        self.set_output_delete_private = {}
+        self.counter_output_delete_private = {}
 
 
     # TODO: update to use local data layer for (key, value) operations
     def put(self, key, value, is_private=False, is_queued=False, table=None):
+        self._invalidate_cached_value(key, is_private, table)
         if is_queued:
             if is_private:
                 self.transient_data_output_private[key] = value
@@ -56,11 +92,13 @@ class DataLayerOperator:
                 self.transient_data_output[key] = value
                 if key in self.data_to_be_deleted:
                     self.data_to_be_deleted.pop(key, None)
+        elif self._write_behind is not None:
+            self._write_behind.put(key, value, is_private, table)
         else:
             data_layer_client = self._get_data_layer_client(is_private)
             data_layer_client.put(key, value, tableName=table)
 
-    def get(self, key, is_private=False, table=None):
+    def get(self, key, is_private=False, table=None, use_cache=True):
         # check first transient_output
         # if not there, return the actual (global) data layer data item
         # if not there either, return empty string (as defined in the DataLayerClient)
@@ -78,12 +116,19 @@ class DataLayerOperator:
             value = self.transient_data_output.get(key)
 
         if value is None:
-            data_layer_client = self._get_data_layer_client(is_private)
-            value = data_layer_client.get(key, tableName=table)
+            if use_cache and self._read_cache_enabled:
+                cache_key = (is_private, table, key)
+                found, value = self._get_cached_value(cache_key)
+                if not found:
+                    value = self._get_value(key, is_private, table)
+                    self._cache_value(cache_key, value)
+            else:
+                value = self._get_value(key, is_private, table)
 
         return value
 
     def delete(self, key, is_private=False, is_queued=False, table=None):
+        self._invalidate_cached_value(key, is_private, table)
         if is_queued:
             if is_private:
                 self.transient_data_output_private.pop(key, None)
@@ -91,11 +136,229 @@ class DataLayerOperator:
             else:
                 self.transient_data_output.pop(key, None)
                 self.data_to_be_deleted[key] = True
+        elif self._write_behind is not None:
+            self._write_behind.delete(key, is_private, table)
         else:
             data_layer_client = self._get_data_layer_client(is_private)
             data_layer_client.delete(key, tableName=table)
 
-    def getKeys(self, start_index, end_index, is_private=False):
+    # batched (key, value) operations; the non-queued ones are a single data layer round-trip
+    def put_many(self, key_value_map, is_private=False, is_queued=False, table=None):
+        for key in key_value_map:
+            self._invalidate_cached_value(key, is_private, table)
+        if is_queued:
+            for key in key_value_map:
+                self.put(key, key_value_map[key], is_private, is_queued=True)
+        elif key_value_map:
+            if self._write_behind is not None:
+                self._write_behind.put_many(key_value_map, is_private, table)
+            else:
+                data_layer_client = self._get_data_layer_client(is_private)
+                data_layer_client.putMultiple(key_value_map, tableName=table)
+
+    def get_many(self, keys, is_private=False, table=None, use_cache=True):
+        # same semantics as get(), but the keys that are not
+        # in the transient data are retrieved with a single call
+        values = {}
+        to_fetch = []
+        if is_private:
+            to_be_deleted = self.data_to_be_deleted_private
+            data_output = self.transient_data_output_private
+        else:
+            to_be_deleted = self.data_to_be_deleted
+            data_output = self.transient_data_output
+
+        for key in keys:
+            if key in to_be_deleted:
+                values[key] = ""
+            elif data_output.get(key) is not None:
+                values[key] = data_output[key]
+            elif use_cache and self._read_cache_enabled:
+                found, value = self._get_cached_value((is_private, table, key))
+                if found:
+                    values[key] = value
+                else:
+                    to_fetch.append(key)
+            else:
+                to_fetch.append(key)
+
+        if to_fetch:
+            if self._write_behind is not None:
+                fetched = self._write_behind.get_many(to_fetch, is_private, table)
+            else:
+                data_layer_client = self._get_data_layer_client(is_private)
+                fetched = data_layer_client.getMultiple(to_fetch, tableName=table)
+            if use_cache and self._read_cache_enabled:
+                for key in fetched:
+                    self._cache_value((is_private, table, key), fetched[key])
+            values.update(fetched)
+
+        return values
+
+    def delete_many(self, keys, is_private=False, is_queued=False, table=None):
+        for key in keys:
+            self._invalidate_cached_value(key, is_private, table)
+        if is_queued:
+            for key in keys:
+                self.delete(key, is_private, is_queued=True)
+        elif keys:
+            if self._write_behind is not None:
+                self._write_behind.delete_many(keys, is_private, table)
+            else:
+                data_layer_client = self._get_data_layer_client(is_private)
+                data_layer_client.deleteMultiple(keys, tableName=table)
+
+    def _get_value(self, key, is_private, table):
+        if self._write_behind is not None:
+            return self._write_behind.get(key, is_private, table)
+        data_layer_client = self._get_data_layer_client(is_private)
+        return data_layer_client.get(key, tableName=table)
+
+    # write-behind via the local data layer
+    def set_write_behind(self, enabled, flush_interval_ms=100, flush_on_publish=True):
+        '''
+        Apply the non-queued (key, value) writes to the local data layer of the host
+        and replicate them to the global data layer every flush_interval_ms (0: only when flushed)
+        and, if flush_on_publish, before the function publishes its output.
+        The remaining writes are always replicated before the function instance finishes.
+        '''
+        if enabled:
+            self._write_behind = DataLayerWriteBehind(self._storage_userid, self._sandboxid, self._workflowid, self._datalayer, flush_interval_ms)
+        else:
+            self._write_behind = None
+        self._write_behind_flush_on_publish = flush_on_publish
+
+    def flush_write_behind(self, is_publishing=False):
+        if self._write_behind is None:
+            return
+        if is_publishing and not self._write_behind_flush_on_publish:
+            return
+        self._write_behind.flush()
+
+    def shutdown_write_behind(self):
+        if self._write_behind is not None:
+            self._write_behind.shutdown()
+
+    # read cache for get() and get_many()
+    def set_read_cache(self, enabled, ttl=0):
+        '''
+        Enable the memoization of the values read from the data layer within an execution
+        and, if ttl > 0, keep them for ttl seconds for the next executions in this process
+        once the process handles multiple executions (see set_shared_read_cache()).
+        Writes by this process invalidate the cached values of the keys they touch;
+        writes by others are only seen after invalidate_cache() or the expiry.
+        '''
+        self._read_cache_enabled = enabled or ttl > 0
+        self._read_cache_ttl = ttl
+
+    def set_shared_read_cache(self, enabled):
+        '''
+        Enable the cross-execution tier of the read cache (i.e., with ttl > 0).
+        Only called in warm pool instances; a process forked per message exits after one execution.
+        '''
+        self._shared_read_cache_enabled = enabled
+
+    def invalidate_cache(self, key=None, is_private=False, table=None):
+        if key is None:
+            self._read_cache = {}
+            DataLayerOperator._shared_read_cache.clear()
+        else:
+            self._invalidate_cached_value(key, is_private, table)
+
+    def _get_cached_value(self, cache_key):
+        # returns whether the key was in the cache and its value
+        if cache_key in self._read_cache:
+            return True, self._read_cache[cache_key]
+
+        if self._read_cache_ttl > 0 and self._shared_read_cache_enabled:
+            entry = DataLayerOperator._shared_read_cache.get(cache_key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._read_cache[cache_key] = entry[0]
+                    return True, entry[0]
+                DataLayerOperator._shared_read_cache.pop(cache_key, None)
+
+        return False, None
+
+    def _cache_value(self, cache_key, value):
+        self._read_cache[cache_key] = value
+
+        if self._read_cache_ttl > 0 and self._shared_read_cache_enabled:
+            shared_read_cache = DataLayerOperator._shared_read_cache
+            shared_read_cache.pop(cache_key, None)
+            if len(shared_read_cache) >= self.MAX_SHARED_READ_CACHE_ENTRIES:
+                # evict the oldest entry
+                shared_read_cache.pop(next(iter(shared_read_cache)))
+            shared_read_cache[cache_key] = (value, time.time() + self._read_cache_ttl)
+
+    def _invalidate_cached_value(self, key, is_private, table):
+        if not self._read_cache_enabled:
+            return
+        cache_key = (is_private, table, key)
+        self._read_cache.pop(cache_key, None)
+        DataLayerOperator._shared_read_cache.pop(cache_key, None)
+
+    # streaming operations for large values; not queued
+    def put_stream(self, key, iterable_of_bytes, is_private=False, table=None):
+        self._invalidate_cached_value(key, is_private, table)
+        data_layer_client = self._get_data_layer_client(is_private)
+        return data_layer_client.put_stream(key, iterable_of_bytes, tableName=table)
+
+    def get_stream(self, key, is_private=False, table=None):
+        data_layer_client = self._get_data_layer_client(is_private)
+        return data_layer_client.get_stream(key, tableName=table)
+
+    def delete_stream(self, key, is_private=False, table=None):
+        self._invalidate_cached_value(key, is_private, table)
+        data_layer_client = self._get_data_layer_client(is_private)
+        return data_layer_client.delete_stream(key, tableName=table)
+
+    # awaitable (key, value) operations; same semantics as the synchronous ones
+    # (with the write-behind, the operations are local and done synchronously)
+    async def aput(self, key, value, is_private=False, is_queued=False, table=None):
+        if is_queued or self._write_behind is not None:
+            self.put(key, value, is_private, is_queued, table)
+        else:
+            self._invalidate_cached_value(key, is_private, table)
+            await self._get_async_data_layer_client(is_private).put(key, value, tableName=table)
+
+    async def aget(self, key, is_private=False, table=None, use_cache=True):
+        if is_private:
+            if key in self.data_to_be_deleted_private:
+                return ""
+            value = self.transient_data_output_private.get(key)
+        else:
+            if key in self.data_to_be_deleted:
+                return ""
+            value = self.transient_data_output.get(key)
+
+        if value is None:
+            cache_key = (is_private, table, key)
+            found = False
+            if use_cache and self._read_cache_enabled:
+                found, value = self._get_cached_value(cache_key)
+            if not found:
+                if self._write_behind is not None:
+                    value = self._write_behind.get(key, is_private, table)
+                else:
+                    value = await self._get_async_data_layer_client(is_private).get(key, tableName=table)
+                if use_cache and self._read_cache_enabled:
+                    self._cache_value(cache_key, value)
+
+        return value
+
+    async def adelete(self, key, is_private=False, is_queued=False, table=None):
+        if is_queued or self._write_behind is not None:
+            self.delete(key, is_private, is_queued, table)
+        else:
+            self._invalidate_cached_value(key, is_private, table)
+            await self._get_async_data_layer_client(is_private).delete(key, tableName=table)
+
+    def scanKeys(self, prefix="", cursor="", count=1000, is_private=False):
+        dlc = self._get_data_layer_client(is_private)
+        return dlc.scanKeys(prefix, cursor, count)
+
+    def getKeys(self, start_index, end_index, is_private=False, prefix=""):
         keys = set()
 
         # XXX: should follow "read your writes"
@@ -106,27 +369,53 @@ class DataLayerOperator:
         # TODO: 1. check local data layer first: get locally created and deleted
 
         # 2. retrieve all existing globally
+        # (the keys are streamed in order with a cursor, instead of being paged by offset on the server;
+        # 'end_index' is the number of keys, as with the previous listKeys(start, count))
+        # the keys before 'start_index' are read again on every call, but not kept;
+        # scanKeys() continues from the cursor of the previous page instead
         dlc = self._get_data_layer_client(is_private)
-        m2 = dlc.listKeys(start_index, end_index)
-        if m2 is not None:
-            # TODO: 3. remove the ones deleted locally
-            keys = keys.union(m2)
+        m2 = []
+        num_skipped = 0
+        for key in dlc.iterKeys(prefix, batch_size=max(1, min(1000, start_index + end_index))):
+            if num_skipped < start_index:
+                num_skipped += 1
+                continue
+            if len(m2) >= end_index:
+                break
+            m2.append(key)
+        # TODO: 3. remove the ones deleted locally
+        keys = keys.union(m2)
 
         return list(keys)
 
     # map operations
+    # queued (is_queued=True) map, set and counter operations are kept in memory
+    # and read back by this function instance (i.e., "read your writes");
+    # they are committed with commit_transient_data_structures() when the function instance finishes
+    def _get_transient_maps(self, is_private):
+        if is_private:
+            return self.map_output_private, self.map_output_delete_private
+        return self.map_output, self.map_output_delete
+
+    def _get_transient_map(self, mapname, is_private):
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        if mapname not in map_output:
+            # a map deleted earlier in this execution starts empty
+            map_output[mapname] = {"created": False, "cleared": mapname in map_output_delete, "entries": {}, "deleted": set()}
+        return map_output[mapname]
+
     def createMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_transient_map(mapname, is_private)["created"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createMap(mapname)
 
     def putMapEntry(self, mapname, key, value, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tmap = self._get_transient_map(mapname, is_private)
+            tmap["entries"][key] = value
+            tmap["deleted"].discard(key)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.putMapEntry(mapname, key, value)
@@ -134,18 +423,27 @@ class DataLayerOperator:
     def getMapEntry(self, mapname, key, is_private=False):
         value = None
 
-        # TODO: check transient data structure first
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        tmap = map_output.get(mapname)
+        if tmap is not None:
+            if key in tmap["entries"]:
+                return tmap["entries"][key]
+            if key in tmap["deleted"] or tmap["cleared"]:
+                return value
+        elif mapname in map_output_delete:
+            return value
 
-        if value is None:
-            dlc = self._get_data_layer_client(is_private)
-            value = dlc.getMapEntry(mapname, key)
+        dlc = self._get_data_layer_client(is_private)
+        value = dlc.getMapEntry(mapname, key)
 
         return value
 
     def deleteMapEntry(self, mapname, key, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tmap = self._get_transient_map(mapname, is_private)
+            tmap["entries"].pop(key, None)
+            if not tmap["cleared"]:
+                tmap["deleted"].add(key)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteMapEntry(mapname, key)
@@ -153,65 +451,79 @@ class DataLayerOperator:
     def containsMapKey(self, mapname, key, is_private=False):
         ret = False
 
-        # TODO: check transient data structure first
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        tmap = map_output.get(mapname)
+        if tmap is not None:
+            if key in tmap["entries"]:
+                return True
+            if key in tmap["deleted"] or tmap["cleared"]:
+                return ret
+        elif mapname in map_output_delete:
+            return ret
 
-        if not ret:
-            dlc = self._get_data_layer_client(is_private)
-            ret = dlc.containsMapKey(mapname, key)
+        dlc = self._get_data_layer_client(is_private)
+        ret = dlc.containsMapKey(mapname, key)
 
         return ret
 
     def retrieveMap(self, mapname, is_private=False):
         retmap = {}
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
+        # the result includes all existing globally (unless cleared or deleted locally)
+        # minus the ones deleted locally, plus the ones created locally
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        tmap = map_output.get(mapname)
+        if tmap is None and mapname in map_output_delete:
+            return retmap
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        if tmap is None or not tmap["cleared"]:
+            dlc = self._get_data_layer_client(is_private)
+            retmap2 = dlc.retrieveMap(mapname)
+            if retmap2 is not None:
+                for k in retmap2:
+                    retmap[k] = retmap2[k]
 
-        # 2. retrieve all existing globally
-        dlc = self._get_data_layer_client(is_private)
-        retmap2 = dlc.retrieveMap(mapname)
-        if retmap2 is not None:
-            for k in retmap2:
-                retmap[k] = retmap2[k]
-            # TODO: 3. remove the ones deleted locally
+        if tmap is not None:
+            for k in tmap["deleted"]:
+                retmap.pop(k, None)
+            retmap.update(tmap["entries"])
 
         return retmap
 
     def getMapKeys(self, mapname, is_private=False):
         keys = set()
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        tmap = map_output.get(mapname)
+        if tmap is None and mapname in map_output_delete:
+            return keys
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        if tmap is None or not tmap["cleared"]:
+            dlc = self._get_data_layer_client(is_private)
+            k2 = dlc.getMapKeys(mapname)
+            if k2 is not None:
+                keys = keys.union(k2)
 
-        # 2. retrieve all existing globally
-        dlc = self._get_data_layer_client(is_private)
-        k2 = dlc.getMapKeys(mapname)
-        if k2 is not None:
-            # TODO: 3. remove the ones deleted locally
-            keys = keys.union(k2)
+        if tmap is not None:
+            keys = keys.difference(tmap["deleted"]).union(tmap["entries"])
 
         return keys
 
     def clearMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tmap = self._get_transient_map(mapname, is_private)
+            tmap["cleared"] = True
+            tmap["entries"] = {}
+            tmap["deleted"] = set()
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.clearMap(mapname)
 
     def deleteMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            map_output, map_output_delete = self._get_transient_maps(is_private)
+            map_output.pop(mapname, None)
+            map_output_delete[mapname] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteMap(mapname)
@@ -219,43 +531,53 @@ class DataLayerOperator:
     def getMapNames(self, start_index=0, end_index=2147483647, is_private=False):
         maps = set()
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
-
-        # TODO: 1. check local data layer first: get locally created and deleted
-
-        # 2. retrieve all existing globally
+        # retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         m2 = dlc.getMapNames(start_index, end_index)
         if m2 is not None:
-            # TODO: 3. remove the ones deleted locally
             maps = maps.union(m2)
 
+        # remove the ones deleted locally and add the ones created locally
+        map_output, map_output_delete = self._get_transient_maps(is_private)
+        maps = maps.difference(map_output_delete).union(map_output)
+
         return list(maps)
 
     # set operations
+    def _get_transient_sets(self, is_private):
+        if is_private:
+            return self.set_output_private, self.set_output_delete_private
+        return self.set_output, self.set_output_delete
+
+    def _get_transient_set(self, setname, is_private):
+        set_output, set_output_delete = self._get_transient_sets(is_private)
+        if setname not in set_output:
+            # a set deleted earlier in this execution starts empty
+            set_output[setname] = {"created": False, "cleared": setname in set_output_delete, "added": set(), "removed": set()}
+        return set_output[setname]
+
     def createSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_transient_set(setname, is_private)["created"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createSet(setname)
 
     def addSetEntry(self, setname, item, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tset = self._get_transient_set(setname, is_private)
+            tset["added"].add(item)
+            tset["removed"].discard(item)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.addSetEntry(setname, item)
 
     def removeSetEntry(self, setname, item, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tset = self._get_transient_set(setname, is_private)
+            tset["added"].discard(item)
+            if not tset["cleared"]:
+                tset["removed"].add(item)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.removeSetEntry(setname, item)
@@ -263,45 +585,57 @@ class DataLayerOperator:
     def containsSetItem(self, setname, item, is_private=False):
         ret = False
 
-        # TODO: check transient data structure first
+        set_output, set_output_delete = self._get_transient_sets(is_private)
+        tset = set_output.get(setname)
+        if tset is not None:
+            if item in tset["added"]:
+                return True
+            if item in tset["removed"] or tset["cleared"]:
+                return ret
+        elif setname in set_output_delete:
+            return ret
 
-        if not ret:
-            dlc = self._get_data_layer_client(is_private)
-            ret = dlc.containsSetItem(setname, item)
+        dlc = self._get_data_layer_client(is_private)
+        ret = dlc.containsSetItem(setname, item)
 
         return ret
 
     def retrieveSet(self, setname, is_private=False):
         items = set()
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
+        # the result includes all existing globally (unless cleared or deleted locally)
+        # minus the ones removed locally, plus the ones added locally
+        set_output, set_output_delete = self._get_transient_sets(is_private)
+        tset = set_output.get(setname)
+        if tset is None and setname in set_output_delete:
+            return items
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        if tset is None or not tset["cleared"]:
+            dlc = self._get_data_layer_client(is_private)
+            i2 = dlc.retrieveSet(setname)
+            if i2 is not None:
+                items = items.union(i2)
 
-        # 2. retrieve all existing globally
-        dlc = self._get_data_layer_client(is_private)
-        i2 = dlc.retrieveSet(setname)
-        if i2 is not None:
-            # TODO: 3. remove the ones deleted locally
-            items = items.union(i2)
+        if tset is not None:
+            items = items.difference(tset["removed"]).union(tset["added"])
 
         return items
 
     def clearSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tset = self._get_transient_set(setname, is_private)
+            tset["cleared"] = True
+            tset["added"] = set()
+            tset["removed"] = set()
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.clearSet(setname)
 
     def deleteSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            set_output, set_output_delete = self._get_transient_sets(is_private)
+            set_output.pop(setname, None)
+            set_output_delete[setname] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteSet(setname)
@@ -309,27 +643,40 @@ class DataLayerOperator:
     def getSetNames(self, start_index=0, end_index=2147483647, is_private=False):
         sets = set()
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
-
-        # TODO: 1. check local data layer first: get locally created and deleted
-
-        # 2. retrieve all existing globally
+        # retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         s2 = dlc.getSetNames(start_index, end_index)
         if s2 is not None:
-            # TODO: 3. remove the ones deleted locally
             sets = sets.union(s2)
 
+        # remove the ones deleted locally and add the ones created locally
+        set_output, set_output_delete = self._get_transient_sets(is_private)
+        sets = sets.difference(set_output_delete).union(set_output)
+
         return list(sets)
 
     # counter operations
+    def _get_transient_counters(self, is_private):
+        if is_private:
+            return self.counter_output_private, self.counter_output_delete_private
+        return self.counter_output, self.counter_output_delete
+
+    def _get_transient_counter(self, countername, is_private):
+        counter_output, counter_output_delete = self._get_transient_counters(is_private)
+        if countername not in counter_output:
+            # 'value' is only known when the counter was (re-)created in this execution;
+            # otherwise, 'delta' is applied to the global value
+            value = None
+            if countername in counter_output_delete:
+                value = 0
+            counter_output[countername] = {"value": value, "delta": 0}
+        return counter_output[countername]
+
     def createCounter(self, countername, count, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            tcounter = self._get_transient_counter(countername, is_private)
+            tcounter["value"] = count
+            tcounter["delta"] = 0
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createCounter(countername, count)
@@ -337,33 +684,40 @@ class DataLayerOperator:
     def getCounterValue(self, countername, is_private=False):
         value = 0
 
-        # TODO: check transient data structure first and apply any changes to the global value
+        counter_output, counter_output_delete = self._get_transient_counters(is_private)
+        tcounter = counter_output.get(countername)
+        if tcounter is not None and tcounter["value"] is not None:
+            return tcounter["value"] + tcounter["delta"]
+        if tcounter is None and countername in counter_output_delete:
+            return value
 
         dlc = self._get_data_layer_client(is_private)
         value = dlc.getCounter(countername)
 
+        if tcounter is not None:
+            value = value + tcounter["delta"]
+
         return value
 
     def incrementCounter(self, countername, increment, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_transient_counter(countername, is_private)["delta"] += increment
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.incrementCounter(countername, increment)
 
     def decrementCounter(self, countername, decrement, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_transient_counter(countername, is_private)["delta"] -= decrement
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.decrementCounter(countername, decrement)
 
     def deleteCounter(self, countername, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            counter_output, counter_output_delete = self._get_transient_counters(is_private)
+            counter_output.pop(countername, None)
+            counter_output_delete[countername] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteCounter(countername)
@@ -371,22 +725,85 @@ class DataLayerOperator:
     def getCounterNames(self, start_index=0, end_index=2147483647, is_private=False):
         counters = set()
 
-        # XXX: should follow "read your writes"
-        # the final result should include:
-        # 1. all created locally
-        # 2. all existing globally minus the ones deleted locally
-
-        # TODO: 1. check local data layer first: get locally created and deleted
-
-        # 2. retrieve all existing globally
+        # retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         c2 = dlc.getCounterNames(start_index, end_index)
         if c2 is not None:
-            # TODO: 3. remove the ones deleted locally
             counters = counters.union(c2)
 
+        # remove the ones deleted locally and add the ones created locally
+        counter_output, counter_output_delete = self._get_transient_counters(is_private)
+        created = [name for name in counter_output if counter_output[name]["value"] is not None]
+        counters = counters.difference(counter_output_delete).union(created)
+
         return list(counters)
 
+    def commit_transient_data_output(self):
+        '''
+        Commit the queued (key, value) operations to the data layer
+        when the function instance finishes.
+        '''
+        for is_private in [False, True]:
+            data_out = self.get_transient_data_output(is_private)
+            to_be_deleted = self.get_data_to_be_deleted(is_private)
+            if data_out:
+                self.put_many(data_out, is_private)
+            if to_be_deleted:
+                self.delete_many(list(to_be_deleted), is_private)
+
+    def commit_transient_data_structures(self):
+        '''
+        Commit the queued map, set and counter operations to the data layer
+        when the function instance finishes.
+        The entries of a map or a set are written with a single request.
+        '''
+        for is_private in [False, True]:
+            map_output, map_output_delete = self._get_transient_maps(is_private)
+            set_output, set_output_delete = self._get_transient_sets(is_private)
+            counter_output, counter_output_delete = self._get_transient_counters(is_private)
+            if not (map_output or map_output_delete or set_output or set_output_delete or counter_output or counter_output_delete):
+                continue
+
+            dlc = self._get_data_layer_client(is_private)
+
+            # deletions first, so that any re-creation in the same execution takes effect
+            for mapname in map_output_delete:
+                dlc.deleteMap(mapname)
+            for mapname in map_output:
+                tmap = map_output[mapname]
+                if tmap["created"]:
+                    dlc.createMap(mapname)
+                if tmap["cleared"] and mapname not in map_output_delete:
+                    dlc.clearMap(mapname)
+                if tmap["deleted"]:
+                    dlc.deleteMapEntries(mapname, list(tmap["deleted"]))
+                if tmap["entries"]:
+                    dlc.putMapEntries(mapname, tmap["entries"])
+
+            for setname in set_output_delete:
+                dlc.deleteSet(setname)
+            for setname in set_output:
+                tset = set_output[setname]
+                if tset["created"]:
+                    dlc.createSet(setname)
+                if tset["cleared"] and setname not in set_output_delete:
+                    dlc.clearSet(setname)
+                if tset["removed"]:
+                    dlc.removeSetEntries(setname, list(tset["removed"]))
+                if tset["added"]:
+                    dlc.addSetEntries(setname, list(tset["added"]))
+
+            for countername in counter_output_delete:
+                dlc.deleteCounter(countername)
+            for countername in counter_output:
+                tcounter = counter_output[countername]
+                if tcounter["value"] is not None:
+                    dlc.createCounter(countername, tcounter["value"] + tcounter["delta"])
+                elif tcounter["delta"] > 0:
+                    dlc.incrementCounter(countername, tcounter["delta"])
+                elif tcounter["delta"] < 0:
+                    dlc.decrementCounter(countername, -tcounter["delta"])
+
     def get_transient_data_output(self, is_private=False):
         '''
         Return the transient data, so that it can be committed to the data layer
@@ -407,6 +824,25 @@ class DataLayerOperator:
 
         return self.data_to_be_deleted
 
+    def reset_transient_data(self):
+        '''
+        Clear the transient data after it has been committed to the data layer,
+        so that a warm pool instance starts its next execution without it.
+        '''
+        self.transient_data_output = {}
+        self.transient_data_output_private = {}
+
+        self.data_to_be_deleted = {}
+        self.data_to_be_deleted_private = {}
+
+        self._init_transient_data_structures()
+
+        # the cross-execution tier of the read cache is kept
+        self._read_cache = {}
+
+    def set_reuse_clients(self, reuse_clients):
+        self._reuse_clients = reuse_clients
+
     def _get_data_layer_client(self, is_private=False):
         '''
         Return the data layer client, so that it can be used to commit to the data layer
@@ -416,24 +852,43 @@ class DataLayerOperator:
         # TODO: need also the locality information
         if is_private:
             if self._data_layer_client_private is None:
-                self._data_layer_client_private = DataLayerClient(locality=1, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer)
+                self._data_layer_client_private = DataLayerClientPool.acquire(locality=1, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer)
             return self._data_layer_client_private
 
         if self._data_layer_client is None:
-            self._data_layer_client = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            self._data_layer_client = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
         return self._data_layer_client
 
+    def _get_async_data_layer_client(self, is_private=False):
+        if is_private:
+            if self._async_data_layer_client_private is None:
+                self._async_data_layer_client_private = AsyncDataLayerClient(locality=1, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer)
+            return self._async_data_layer_client_private
+
+        if self._async_data_layer_client is None:
+            self._async_data_layer_client = AsyncDataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+        return self._async_data_layer_client
+
     def _shutdown_data_layer_client(self):
         '''
         Shut down the data layer client if it has been initialized
         after the function instance finishes committing changes
         to the data layer.
         '''
+        if self._reuse_clients:
+            return
+
         if self._data_layer_client_private is not None:
-            self._data_layer_client_private.shutdown()
+            DataLayerClientPool.release(self._data_layer_client_private)
             self._data_layer_client_private = None
 
         if self._data_layer_client is not None:
-            self._data_layer_client.shutdown()
+            DataLayerClientPool.release(self._data_layer_client)
             self._data_layer_client = None
 
+        for async_data_layer_client in [self._async_data_layer_client, self._async_data_layer_client_private]:
+            if async_data_layer_client is not None:
+                async_data_layer_client.shutdown()
+        self._async_data_layer_client = None
+        self._async_data_layer_client_private = None
+
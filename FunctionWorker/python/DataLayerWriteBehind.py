@@ -0,0 +1,248 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import threading
+
+from DataLayerClientPool import DataLayerClientPool
+
+# localities of the data layer requests (see DataLayerService Commons)
+LOCAL_DATALAYER = 0
+GLOBAL_DATALAYER = 1
+READ_LOCAL_THEN_GLOBAL = GLOBAL_DATALAYER - 2**31
+
+class DataLayerWriteBehind:
+    '''
+    DataLayerWriteBehind class
+    This class applies the (key, value) writes of a function worker to the local data layer
+    of the host (locality 0) and replicates them to the global data layer in batches,
+    either periodically in a background thread (every flush_interval_ms) or when flush() is called
+    (e.g., before the function publishes its output).
+    Reads check the writes that have not been replicated yet, then the local data layer
+    and then the global data layer.
+
+    Replicated keys are removed from the local data layer again,
+    so that the local copies do not hide the updates made through other hosts.
+    Writes to tables that do not exist in the local data layer (e.g., user buckets)
+    go directly to the global data layer.
+    '''
+
+    def __init__(self, suid, sid, wid, datalayer, flush_interval_ms=100):
+        self._storage_userid = suid
+        self._sandboxid = sid
+        self._workflowid = wid
+        self._datalayer = datalayer
+        self._flush_interval = flush_interval_ms / 1000.0
+
+        self._lock = threading.Lock()
+        # only one flush at a time; the flushing clients are used only under this lock
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()
+
+        # writes that have not been replicated yet: {(is_private, table): {key: value or None (deleted)}}
+        self._pending = {}
+        # writes being replicated by the current flush
+        self._in_flight = {}
+
+        self._clients = {}
+        self._flush_clients = {}
+
+        self._pid = os.getpid()
+        self._thread = None
+        self._is_running = False
+
+    def _check_pid(self):
+        # a forked process must not replicate the writes of its parent,
+        # nor rely on the parent's flusher thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._flush_event = threading.Event()
+            self._pending = {}
+            self._in_flight = {}
+            self._clients = {}
+            self._flush_clients = {}
+            self._thread = None
+            self._is_running = False
+
+    def _acquire_client(self, is_private):
+        if is_private:
+            return DataLayerClientPool.acquire(locality=GLOBAL_DATALAYER, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer)
+        return DataLayerClientPool.acquire(locality=GLOBAL_DATALAYER, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+
+    def _get_client(self, is_private):
+        if is_private not in self._clients:
+            self._clients[is_private] = self._acquire_client(is_private)
+        return self._clients[is_private]
+
+    def _get_flush_client(self, is_private):
+        if is_private not in self._flush_clients:
+            self._flush_clients[is_private] = self._acquire_client(is_private)
+        return self._flush_clients[is_private]
+
+    def _start_flusher(self):
+        if self._thread is None and self._flush_interval > 0:
+            self._is_running = True
+            self._thread = threading.Thread(target=self._run_flusher, name="DataLayerWriteBehind")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run_flusher(self):
+        while self._is_running:
+            self._flush_event.wait(self._flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                print("[DataLayerWriteBehind] failed flush: " + str(exc))
+
+    def _add_pending(self, key_value_map, is_private, table):
+        with self._lock:
+            self._pending.setdefault((is_private, table), {}).update(key_value_map)
+
+    def _lookup_pending(self, key, is_private, table):
+        # returns whether the key has a write that has not been replicated yet and its value
+        with self._lock:
+            for writes in [self._pending, self._in_flight]:
+                table_writes = writes.get((is_private, table))
+                if table_writes is not None and key in table_writes:
+                    return True, table_writes[key]
+        return False, None
+
+    def put(self, key, value, is_private=False, table=None):
+        self.put_many({key: value}, is_private, table)
+
+    def put_many(self, key_value_map, is_private=False, table=None):
+        self._check_pid()
+        # the writes are pending before they are in the local data layer,
+        # so that a concurrent flush does not remove the new local copies
+        self._add_pending(key_value_map, is_private, table)
+        dlc = self._get_client(is_private)
+        if not dlc.putMultiple(key_value_map, locality=LOCAL_DATALAYER, tableName=table):
+            # no such local table
+            with self._lock:
+                table_writes = self._pending.get((is_private, table), {})
+                for key in key_value_map:
+                    table_writes.pop(key, None)
+            dlc.putMultiple(key_value_map, tableName=table)
+            return
+        self._start_flusher()
+
+    def delete(self, key, is_private=False, table=None):
+        self.delete_many([key], is_private, table)
+
+    def delete_many(self, keys, is_private=False, table=None):
+        self._check_pid()
+        self._add_pending({key: None for key in keys}, is_private, table)
+        dlc = self._get_client(is_private)
+        if not dlc.deleteMultiple(keys, locality=LOCAL_DATALAYER, tableName=table):
+            with self._lock:
+                table_writes = self._pending.get((is_private, table), {})
+                for key in keys:
+                    table_writes.pop(key, None)
+            dlc.deleteMultiple(keys, tableName=table)
+            return
+        self._start_flusher()
+
+    def get(self, key, is_private=False, table=None):
+        return self.get_many([key], is_private, table)[key]
+
+    def get_many(self, keys, is_private=False, table=None):
+        # returns a dict with the values of the given keys; None for the keys that do not exist
+        self._check_pid()
+        values = {}
+        to_fetch = []
+        for key in keys:
+            found, value = self._lookup_pending(key, is_private, table)
+            if found:
+                values[key] = value
+            else:
+                to_fetch.append(key)
+
+        if to_fetch:
+            dlc = self._get_client(is_private)
+            values.update(dlc.getMultiple(to_fetch, locality=READ_LOCAL_THEN_GLOBAL, tableName=table))
+
+        return values
+
+    def flush(self):
+        '''
+        Replicate the pending writes to the global data layer.
+        The writes that fail are kept pending for the next flush, unless they have been overwritten meanwhile.
+        '''
+        self._check_pid()
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._in_flight = self._pending
+                self._pending = {}
+
+            failed = {}
+            try:
+                for (is_private, table), table_writes in self._in_flight.items():
+                    if not self._replicate(table_writes, is_private, table):
+                        failed[(is_private, table)] = table_writes
+            except Exception:
+                failed = self._in_flight
+                raise
+            finally:
+                with self._lock:
+                    for table_key, table_writes in failed.items():
+                        # newer writes win over the failed ones
+                        table_writes.update(self._pending.get(table_key, {}))
+                        self._pending[table_key] = table_writes
+                    self._in_flight = {}
+
+    def _replicate(self, table_writes, is_private, table):
+        dlc = self._get_flush_client(is_private)
+        puts = {key: value for key, value in table_writes.items() if value is not None}
+        deletes = [key for key, value in table_writes.items() if value is None]
+
+        if puts and not dlc.putMultiple(puts, tableName=table):
+            return False
+        if deletes and not dlc.deleteMultiple(deletes, tableName=table):
+            return False
+
+        # remove the local copies that have not been written again meanwhile
+        with self._lock:
+            table_pending = self._pending.get((is_private, table), {})
+            replicated = [key for key in puts if key not in table_pending]
+        if replicated:
+            dlc.deleteMultiple(replicated, locality=LOCAL_DATALAYER, tableName=table)
+
+        return True
+
+    def has_pending_writes(self):
+        with self._lock:
+            return bool(self._pending) or bool(self._in_flight)
+
+    def shutdown(self):
+        '''
+        Stop the flusher thread after replicating the pending writes and release the clients.
+        '''
+        self._check_pid()
+        self._is_running = False
+        self._flush_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+        for clients in [self._clients, self._flush_clients]:
+            for dlc in clients.values():
+                DataLayerClientPool.release(dlc)
+            clients.clear()
@@ -21,7 +21,9 @@ import imp
 import json
 import logging
 import random
+import select
 import socket
+import struct
 import subprocess
 import shlex
 import hashlib
@@ -33,13 +35,16 @@ import thriftpy2
 
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
-#from DataLayerClient import DataLayerClient
+from DataLayerClient import DataLayerClient
+from DataLayerClientPool import DataLayerClientPool
 from MicroFunctionsLogWriter import MicroFunctionsLogWriter
+from AsyncLogHandler import AsyncLogHandler
 from MicroFunctionsAPI import MicroFunctionsAPI
 from StateUtils import StateUtils
 from SessionUtils import SessionUtils
 from PublicationUtils import PublicationUtils
 
+import json_codec
 import py3utils
 
 LOGGER_HOSTNAME = 'hostname-unset'
@@ -49,6 +54,24 @@ LOGGER_USERID = 'userid-unset'
 LOGGER_WORKFLOWNAME = 'workflow-name-unset'
 LOGGER_WORKFLOWID = 'workflow-id-unset'
 
+def _send_frame(sock, data):
+    sock.sendall(struct.pack("!I", len(data)) + data)
+
+def _recv_exactly(sock, size):
+    buf = b""
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+def _recv_frame(sock):
+    header = _recv_exactly(sock, 4)
+    if header is None:
+        return None
+    return _recv_exactly(sock, struct.unpack("!I", header)[0])
+
 class LoggingFilter(logging.Filter):
     def filter(self, record):
         global LOGGER_HOSTNAME
@@ -57,7 +80,7 @@ class LoggingFilter(logging.Filter):
         global LOGGER_USERID
         global LOGGER_WORKFLOWNAME
         global LOGGER_WORKFLOWID
-        record.timestamp = time.time()*1000000
+        record.timestamp = record.created*1000000
         record.hostname = LOGGER_HOSTNAME
         record.containername = LOGGER_CONTAINERNAME
         record.uuid = LOGGER_UUID
@@ -70,9 +93,11 @@ class FunctionWorker:
 
     # TODO: scratch space for each function worker, possibly tmpfs path
     # each topic is defined as a function of (user, sandbox, workflow, function id). as a result, topic will identify the workflow.
-    def __init__(self, args_dict):
+    def __init__(self, args_dict, is_fused=False):
         self._POLL_MAX_NUM_MESSAGES = 500
         self._POLL_TIMEOUT = py3utils.ensure_long(10000)
+        # adapted to the backlog: doubled when a batch comes back full, halved when it is mostly empty
+        self._poll_batch_size = 1
 
         self._set_args(args_dict)
         # instead of passing individual fields, pass a bigger object to improve readibility
@@ -83,6 +108,12 @@ class FunctionWorker:
 
         self._setup_loggers()
 
+        json_codec.set_codec(self._json_codec)
+
+        # before any data layer client connects
+        if self._data_layer_stats:
+            DataLayerClient.enable_stats()
+
         # set up API objects once and let the CoW handle the accesses from forked processes
         self._state_utils = StateUtils(self._worker_params, self._logger)
 
@@ -122,12 +153,35 @@ class FunctionWorker:
                     #self._logger.debug("dir of functionworker after importing user code: " + curdir)
                 except Exception as exc:
                     self._logger.exception("Exception loading user code: %s", str(exc))
+                    if is_fused:
+                        # set up by the function worker of another state (see _setup_fused_workers())
+                        raise
                     sys.stdout.flush()
+                    AsyncLogHandler.flush_all()
                     os._exit(1)
 
+        # a fused worker only executes its state in the process of its predecessor (see _run_fused_chain())
+        self._is_fused = is_fused
+        self._fused_workers = {}
+        self._publication_utils.set_fusion_enabled(bool(self._fused_chain_topics))
+        if self._is_fused:
+            self._is_running = False
+            return
+
         # for retrieving new messages
         self.local_queue_client = LocalQueueClient(connect=self._queue)
 
+        self._consumer_group = None
+        if self._num_replicas > 1:
+            self._consumer_group = "function_workers"
+            self._consumer_name = "replica-" + str(self._replica_index)
+            # update and stop messages have to reach every replica, so the sandbox agent sends them to a topic per replica
+            self._control_topic = self._function_topic + "_control_" + str(self._replica_index)
+            self.local_queue_client.createGroup(self._function_topic, self._consumer_group)
+            self.local_queue_client.createGroup(self._control_topic, self._consumer_group)
+            self._unacked_msg_ids = {self._function_topic: [], self._control_topic: []}
+            self._t_last_reclaim = time.time() * 1000.0
+
         # for storing (key, pid) tuples on the data layer
         # keyspace: hostname + "InstancePidMap"
         # tablename: topic with "_" as separator
@@ -137,6 +191,40 @@ class FunctionWorker:
 
         signal(SIGCHLD, SIG_IGN)
 
+        # the children are reaped by init, so each forked instance holds the write end of a pipe
+        # and the read end becomes readable (EOF) when the instance exits; (read fd -> pid)
+        self._live_instances = {}
+        self._instance_poller = select.poll()
+
+        # function instances report their data layer request statistics after each execution via a pipe,
+        # so that this process can log a summary of all of them periodically
+        self._stats_read_fd = None
+        self._stats_write_fd = None
+        if self._data_layer_stats:
+            self._stats_read_fd, self._stats_write_fd = os.pipe()
+            os.set_blocking(self._stats_read_fd, False)
+            os.set_blocking(self._stats_write_fd, False)
+            self._stats_buffer = b""
+            self._worker_data_layer_stats = {}
+            self._t_last_stats_summary = time.time()
+
+        # pre-forked, already connected function instances that handle multiple executions
+        # only python task states of non-session workflows are handled this way;
+        # everything else keeps forking a new process per message
+        self._warm_pool = None
+        if self._warm_pool_size > 0:
+            if self._function_runtime == "python 3.6" and self._state_utils.isTaskState() and not self._is_session_workflow:
+                self._warm_pool = []
+            else:
+                self._logger.info("[FunctionWorker] Warm pool is not supported for this function; forking per message.")
+
+        if self._warm_pool is None and float(args_dict.get("data_layer_read_cache_ttl", 0)) > 0:
+            self._logger.info("[FunctionWorker] Data layer read cache TTL only applies to warm pool instances; caching reads within each execution.")
+
+        # set up the fused states once, so that the forked instances do not have to load them for every message
+        if self._fused_chain_topics:
+            self._setup_fused_workers()
+
         # do this once rather than at every forked process
         if self._state_utils.isTaskState():
             os.chdir(self._function_folder)
@@ -187,6 +275,36 @@ class FunctionWorker:
 
         self._should_checkpoint = args["should_checkpoint"]
 
+        # workflow setting first, then the sandbox-wide setting
+        self._json_codec = args.get("json_codec", "")
+        if self._json_codec == "":
+            self._json_codec = os.getenv("MFN_JSON_CODEC", json_codec.CODEC_JSON)
+
+        # the states that can follow this state in a fused chain (function topic -> worker params file);
+        # empty, if this state cannot be part of one
+        self._fused_chain_topics = args.get("fused_chain_topics", {})
+        self._fused_chain_max_length = int(args.get("fused_chain_max_length", 10))
+
+        # 0 means that the warm pool is disabled
+        self._warm_pool_size = int(args.get("warm_pool_size", 0))
+        self._warm_pool_max_executions = int(args.get("warm_pool_max_executions", 1000))
+
+        # workflow setting, or the sandbox-wide setting
+        self._async_logging = args.get("async_logging", False) or os.getenv("MFN_ASYNC_LOGGING", "").lower() in ["1", "true"]
+
+        # replicas share the function topic via a consumer group (1: this function worker owns the topic)
+        self._num_replicas = int(args.get("num_replicas", 1))
+        self._replica_index = int(args.get("replica_index", 0))
+        self._pending_reclaim_idle_ms = int(args.get("pending_reclaim_idle_ms", 60000))
+
+        # maximum number of concurrently running forked instances (0: unlimited)
+        self._max_instances = int(args.get("max_function_instances", 0))
+
+        # data layer request statistics: workflow setting, or the sandbox-wide setting
+        self._data_layer_stats = args.get("data_layer_stats", False) or os.getenv("MFN_DATALAYER_STATS", "").lower() in ["1", "true"]
+        # seconds between the summaries of the function worker
+        self._data_layer_stats_interval = float(args.get("data_layer_stats_interval", 60))
+
     def _get_loglevel(self):    
         loglevel = logging.INFO
         if "LOG_LEVEL" in os.environ and os.environ["LOG_LEVEL"] != None and len(str(os.environ["LOG_LEVEL"])) > 0:
@@ -217,12 +335,18 @@ class FunctionWorker:
         hdlr = logging.FileHandler(logfile)
         hdlr.setLevel(loglevel)
         hdlr.setFormatter(formatter)
+        if self._async_logging:
+            # the records are written in batches; every process must call AsyncLogHandler.flush_all() before os._exit()
+            hdlr = AsyncLogHandler(hdlr)
+            hdlr.setLevel(loglevel)
         self._logger.addHandler(hdlr)
 
         global print
         print = self._logger.info
-        sys.stdout = MicroFunctionsLogWriter(self._logger, logging.INFO)
-        sys.stderr = MicroFunctionsLogWriter(self._logger, logging.ERROR)
+        self._stdout = MicroFunctionsLogWriter(self._logger, logging.INFO)
+        self._stderr = MicroFunctionsLogWriter(self._logger, logging.ERROR)
+        sys.stdout = self._stdout
+        sys.stderr = self._stderr
 
     #FOR_DEBUGGING_ONLY
     def _print_self(self):
@@ -258,12 +382,19 @@ class FunctionWorker:
         self._logger.debug("\tself._usertoken: %s", str(self._usertoken))
     ####
 
-    def _fork_and_handle_message(self, key, encapsulated_value):
+    def _fork_and_handle_message(self, key, encapsulated_value, t_enqueue=0.0):
         #self._logger.debug("[FunctionWorker] fork_and_handle_message, Before fork")
         try:
             # replace individual timestamps with a map
             timestamp_map = {}
             timestamp_map["t_start_fork"] = time.time() * 1000.0
+            if t_enqueue > 0.0:
+                timestamp_map["t_queue_wait"] = timestamp_map["t_start_fork"] - t_enqueue
+
+            exit_fd = None
+            if self._max_instances > 0:
+                live_fd, exit_fd = os.pipe()
+                timestamp_map["live_instances"] = len(self._live_instances) + 1
 
             instance_pid = os.fork()
 
@@ -271,295 +402,558 @@ class FunctionWorker:
                 global LOGGER_UUID
                 LOGGER_UUID = key
 
+                # keep only the write end of this instance's pipe, which is closed by the exit
+                self._close_live_instance_fds()
+                if exit_fd is not None:
+                    os.close(live_fd)
+
                 #self._print_self()  #FOR_DEBUGGING_ONLY
                 #self._logger.debug("[FunctionWorker] fork_and_handle_message, After fork" + str(encapsulated_value))
 
-                has_error = False
-                error_type = ""
+                if self._handle_message_in_instance(key, encapsulated_value, timestamp_map):
+                    self._run_fused_chain()
+                    self._report_data_layer_stats()
+                    AsyncLogHandler.flush_all()
+                    os._exit(0)
+
+                self._report_data_layer_stats()
+                sys.stdout.flush()
+                AsyncLogHandler.flush_all()
+                os._exit(1)
 
-                timestamp_map["t_start_pubutils"] = time.time() * 1000.0
+            else:
+                # parent
+                if exit_fd is not None:
+                    os.close(exit_fd)
+                    self._live_instances[live_fd] = instance_pid
+                    self._instance_poller.register(live_fd, select.POLLIN)
 
-                # Start of pre-processing
+                # ignore children's exit signal, which allows the init to reap them
+                # TODO: store child process ids, so that we can keep track of running instances
+                # remove child process ids in the host agent, when the 'fin' message is received
+                # store (key, pid) mapping to the data layer to keep track of function instances
+                # TODO: maybe store this information in a forked process,
+                # so that we don't bottleneck/fail the parent functionworker
+                # TODO: need some component to remove the finished (key, instance_pid) tuples
+                #self._logger.debug("[FunctionWorker] key: " + key + " -> " + str(instance_pid))
+                #self._logger.debug("State Output instance PID: " + str(instance_pid) + str(has_error))
+                #self.local_data_layer_client.putMapEntry(self._map_name_key_pid, key, str(instance_pid))
+                pass
 
-                # 1. Decapsulate the input.
-                # The actual user input is encapsulated in a dict of the form {"__mfnuserdata": actual_user_input, "__mfnmetadata": mfn_specific_metadata}
-                # This encapsulation is invisible to the user and is added, maintained, and removed by the hostagent and functionworker.
-                #self._logger.debug("[FunctionWorker] Received encapsulated input:" + str(type(encapsulated_value)) + ":" + encapsulated_value)
-                timestamp_map["t_start_decapsulate"] = time.time() * 1000.0
-                if not has_error:
+        except Exception as exc:
+            if instance_pid == 0:
+                self._logger.exception("Child exception: %s", str(exc))
+                AsyncLogHandler.flush_all()
+                os._exit(1)
+            else:
+                self._logger.exception("Fork exception: %s", str(instance_pid))
+                self._logger.exception(str(exc))
+                sys.stdout.flush()
+
+    def _handle_message_in_instance(self, key, encapsulated_value, timestamp_map):
+        # runs inside a function instance process (i.e., a freshly forked child or a warm pool instance)
+        # returns whether the output was published successfully
+        has_error = False
+        error_type = ""
+
+        timestamp_map["t_start_pubutils"] = time.time() * 1000.0
+
+        # count the connection setups of this execution (see PublicationUtils.publish_output_direct())
+        LocalQueueClient.num_connects = 0
+        DataLayerClient.num_connects = 0
+        DataLayerClientPool.reset_stats()
+        DataLayerClient.reset_stats()
+
+        # Start of pre-processing
+
+        # 1. Decapsulate the input.
+        # The actual user input is encapsulated in a dict of the form {"__mfnuserdata": actual_user_input, "__mfnmetadata": mfn_specific_metadata}
+        # This encapsulation is invisible to the user and is added, maintained, and removed by the hostagent and functionworker.
+        #self._logger.debug("[FunctionWorker] Received encapsulated input:" + str(type(encapsulated_value)) + ":" + encapsulated_value)
+        timestamp_map["t_start_decapsulate"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                value, metadata = self._publication_utils.decapsulate_input(encapsulated_value)
+                if "state_counter" not in metadata:
+                    metadata["state_counter"] = 1
+                else:
+                    metadata["state_counter"] += 1
+                #self._logger.debug("[FunctionWorker] fork_and_handle_message, metadata[state_counter]: " + str(metadata["state_counter"]))
+
+                #self._logger.debug("[FunctionWorker] Received state input:" + str(type(value)) + ":" + value)
+                #self._logger.debug("[FunctionWorker] Enclosed metadata:" + str(type(metadata)) + ":" + str(metadata))
+
+                # pass the metadata to the publication_utils, so that we can use it for sending immediate triggers
+                self._publication_utils.set_metadata(metadata)
+            except Exception as exc:
+                self._logger.exception("User input decapsulation error: %s\n%s", str(key), str(exc))
+                error_type = "User Input Decapsulation Error"
+                has_error = True
+
+        signal(SIGCHLD, SIG_DFL)
+
+        # 2. Decode input. Input (value) must be a valid JSON Text.
+        # Note: JSON Text is not the same as JSON string. JSON string a one variable type that can be contained inside a JSON Text.
+        # Double quote delimited strings are valid JSON Texts, representing JSON strings. Examples below:
+        # (variable 'value' refers is the input to fork_and_handle_message)
+        #
+        # value='abcdefghi'  is a python string, NOT a valid JSON Text (this will throw an error)
+        #
+        # value='"abcdefghi"' is a valid JSON Text representation of the string python 'abcdefghi'
+        #   user code will receive <type 'str'> or <type 'unicode'> as input
+        #
+        # value='{"x":1}'  is a JSON Text representation of <type 'dict'>.
+        #   user code will receive a <type 'dict'> as input
+        timestamp_map["t_start_decodeinput"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                raw_state_input = self._publication_utils.decode_input(value)
+                #self._logger.debug("[FunctionWorker] Decoded state input:" + str(type(raw_state_input)) + ":" + str(raw_state_input))
+            except Exception as exc:
+                self._logger.exception("State Input Decoding exception: %s\n%s", str(key), str(exc))
+                error_type = "State Input Decoding exception"
+                has_error = True
+
+        # 3. Apply InputPath, if available
+        timestamp_map["t_start_inputpath"] = time.time() * 1000.0
+        #self._logger.debug("[FunctionWorker] Before Path/Parameters processing, input: " + str(type(raw_state_input)) + " : " + str(raw_state_input) + ", metadata: " + str(metadata) + " has_error: " + str(has_error))
+        if not has_error:
+            try:
+                if "__state_action" not in metadata or (metadata["__state_action"] != "post_map_processing" and metadata["__state_action"] != "post_parallel_processing"):
+                    #self._logger.debug("[FunctionWorker] User code input(Before InputPath processing):" + str(type(raw_state_input)) + ":" + str(raw_state_input))
+                    function_input = self._state_utils.applyInputPath(raw_state_input)
+                    #self._logger.debug("[FunctionWorker] User code input(Before applyParameter processing):" + str(type(function_input)) + ":" + str(function_input))
+                    function_input = self._state_utils.applyParameters(function_input)
+                    #self._logger.debug("[FunctionWorker] User code input(Before ItemsPath processing):" + str(type(function_input)) + ":" + str(function_input))
+                    function_input = self._state_utils.applyItemsPath(function_input) # process map items path
+
+                #elif "Action" not in metadata or metadata["Action"] != "post_parallel_processing":
+                #     function_input = self._state_utils.applyInputPath(raw_state_input)
+
+                else:
+                    function_input = raw_state_input
+            except Exception as exc:
+                self._logger.exception("InputPath processing exception: %s\n%s", str(key), str(exc))
+                error_type = "InputPath processing exception"
+                has_error = True
+
+        # Start of function setup (i.e., session utils, MicroFunctionsAPI)
+
+        timestamp_map["t_start_sessutils"] = time.time() * 1000.0
+        # 4. Setup session related stuff here if necessary
+        if not has_error:
+            # set up session related stuff here, if this is a session workflow/function
+            # do this after fork(), so that we don't bottleneck the parent
+            # 1. a session id
+            # 2. a session function instance id
+            # TODO: 3. other metadata (e.g., direct data pipe endpoints)
+            # 4. health check mechanism (e.g., a thread in session_utils?)
+            # 5. Telemetry can be handled by the function instance writing to the data layer, or sending out a message immediately
+            # (see MicroFunctionsAPI.send_to_running_function_in_session() with send_now=True)
+            if self._is_session_workflow:
+                # set a given session id if it is present in the incoming event
+                # for all messages coming to a session
+                session_id = None
+                if "sessionId" in function_input and function_input["sessionId"] != "" and function_input["sessionId"] is not None:
+                    session_id = function_input["sessionId"]
+                elif "session_id" in function_input and function_input["session_id"] != "" and function_input["session_id"] is not None:
+                    session_id = function_input["session_id"]
+
+                self._session_utils.set_key(key)
+                # even if session_id is None, this will initialize it and set up the necessary objects
+                self._session_utils.set_session_id(session_id)
+
+                if self._is_session_function:
                     try:
-                        value, metadata = self._publication_utils.decapsulate_input(encapsulated_value)
-                        if "state_counter" not in metadata:
-                            metadata["state_counter"] = 1
-                        else:
-                            metadata["state_counter"] += 1
-                        #self._logger.debug("[FunctionWorker] fork_and_handle_message, metadata[state_counter]: " + str(metadata["state_counter"]))
-
-                        #self._logger.debug("[FunctionWorker] Received state input:" + str(type(value)) + ":" + value)
-                        #self._logger.debug("[FunctionWorker] Enclosed metadata:" + str(type(metadata)) + ":" + str(metadata))
-
-                        # pass the metadata to the publication_utils, so that we can use it for sending immediate triggers
-                        self._publication_utils.set_metadata(metadata)
+                        self._session_utils.setup_session_function(self._session_function_parameters)
                     except Exception as exc:
-                        self._logger.exception("User input decapsulation error: %s\n%s", str(key), str(exc))
-                        error_type = "User Input Decapsulation Error"
+                        self._logger.exception("Session function instantiation exception: %s\n%s", str(key), str(exc))
+                        error_type = "sessionFunctionId error"
                         has_error = True
 
-                signal(SIGCHLD, SIG_DFL)
-
-                # 2. Decode input. Input (value) must be a valid JSON Text.
-                # Note: JSON Text is not the same as JSON string. JSON string a one variable type that can be contained inside a JSON Text.
-                # Double quote delimited strings are valid JSON Texts, representing JSON strings. Examples below:
-                # (variable 'value' refers is the input to fork_and_handle_message)
-                #
-                # value='abcdefghi'  is a python string, NOT a valid JSON Text (this will throw an error)
-                #
-                # value='"abcdefghi"' is a valid JSON Text representation of the string python 'abcdefghi'
-                #   user code will receive <type 'str'> or <type 'unicode'> as input
-                #
-                # value='{"x":1}'  is a JSON Text representation of <type 'dict'>.
-                #   user code will receive a <type 'dict'> as input
-                timestamp_map["t_start_decodeinput"] = time.time() * 1000.0
-                if not has_error:
+        timestamp_map["t_start_sapi"] = time.time() * 1000.0
+        # 5. Setup the MicroFunctionsAPI object
+        if not has_error:
+            self._sapi.set_key(key)
+
+        timestamp_map["t_start"] = time.time() * 1000.0
+        # todo add catch retry
+        #a = self._state_utils.get_retry_data()
+        #b = self._state_utils.get_catcher_data()
+        #self._logger.debug("CatchRetry Data: " + json.dumps(self._state_utils.get_retry_data()))
+        #self._logger.debug("CatchRetry Data2: " + str(type((self._state_utils.get_retry_data()))))
+        #retrydata = self._state_utils.get_retry_data()
+
+        # 6. Execute function
+        if not has_error:
+            #self._logger.debug("[FunctionWorker] Before isTaskState, query: " + str(self._state_utils.isTaskState()))
+            if self._function_runtime == "python 3.6":
+                if self._state_utils.isTaskState() and self.code:
+                    function_output = None
                     try:
-                        raw_state_input = self._publication_utils.decode_input(value)
-                        #self._logger.debug("[FunctionWorker] Decoded state input:" + str(type(raw_state_input)) + ":" + str(raw_state_input))
+                        # TODO: acknowledgement for session function instance creation
+                        # if this is a session function, we'll keep running until the end of that function instance (e.g., session end)
+                        # need a way to 'acknowledge' that the session function instance is running, so that the host agent also knows
+                        # that the triggering message has indeed created a new instance
+                        # if we do not send such acknowledgement, the host agent will keep thinking it has not been handled (e.g., after a restart)
+                        # and will try to recreate the session function instance again (and again).
+                        exec_arguments = {}
+                        exec_arguments["function"] = self.code.handle
+                        exec_arguments["function_input"] = function_input
+                        function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, self._sapi)
                     except Exception as exc:
-                        self._logger.exception("State Input Decoding exception: %s\n%s", str(key), str(exc))
-                        error_type = "State Input Decoding exception"
+                        self._logger.exception("User code exception: %s\n%s", str(key), str(exc))
+                        sys.stdout.flush()
+                        error_type = "User code exception: " + str(exc.__class__.__name__)
                         has_error = True
 
-                # 3. Apply InputPath, if available
-                timestamp_map["t_start_inputpath"] = time.time() * 1000.0
-                #self._logger.debug("[FunctionWorker] Before Path/Parameters processing, input: " + str(type(raw_state_input)) + " : " + str(raw_state_input) + ", metadata: " + str(metadata) + " has_error: " + str(has_error))
-                if not has_error:
+                else:
+                    # Processing for Non 'Task' states
                     try:
-                        if "__state_action" not in metadata or (metadata["__state_action"] != "post_map_processing" and metadata["__state_action"] != "post_parallel_processing"):
-                            #self._logger.debug("[FunctionWorker] User code input(Before InputPath processing):" + str(type(raw_state_input)) + ":" + str(raw_state_input))
-                            function_input = self._state_utils.applyInputPath(raw_state_input)
-                            #self._logger.debug("[FunctionWorker] User code input(Before applyParameter processing):" + str(type(function_input)) + ":" + str(function_input))
-                            function_input = self._state_utils.applyParameters(function_input)
-                            #self._logger.debug("[FunctionWorker] User code input(Before ItemsPath processing):" + str(type(function_input)) + ":" + str(function_input))
-                            function_input = self._state_utils.applyItemsPath(function_input) # process map items path
-
-                        #elif "Action" not in metadata or metadata["Action"] != "post_parallel_processing":
-                        #     function_input = self._state_utils.applyInputPath(raw_state_input)
-
-                        else:
-                            function_input = raw_state_input
+                        #self._logger.debug("[FunctionWorker] Before evaluateNonTaskState, input: " + str(function_input) + str(metadata))
+                        #TODO: catch-retry for non-task functions?
+                        function_output, metadata_updated = self._state_utils.evaluateNonTaskState(function_input, key, metadata, self._sapi)
+                        # update metadata in the publication utils
+                        self._publication_utils.set_metadata(metadata_updated)
+
+                        #self._logger.debug("[FunctionWorker] After evaluateNonTaskState, result: " + str(function_output) + str(function_input))
                     except Exception as exc:
-                        self._logger.exception("InputPath processing exception: %s\n%s", str(key), str(exc))
-                        error_type = "InputPath processing exception"
+                        self._logger.exception("NonTaskState evaluation exception: %s\n%s", str(key), str(exc))
+                        error_type = "NonTaskState evaluation exception"
                         has_error = True
+            elif self._function_runtime == "java":
+                exec_arguments = {}
 
-                # Start of function setup (i.e., session utils, MicroFunctionsAPI)
-
-                timestamp_map["t_start_sessutils"] = time.time() * 1000.0
-                # 4. Setup session related stuff here if necessary
-                if not has_error:
-                    # set up session related stuff here, if this is a session workflow/function
-                    # do this after fork(), so that we don't bottleneck the parent
-                    # 1. a session id
-                    # 2. a session function instance id
-                    # TODO: 3. other metadata (e.g., direct data pipe endpoints)
-                    # 4. health check mechanism (e.g., a thread in session_utils?)
-                    # 5. Telemetry can be handled by the function instance writing to the data layer, or sending out a message immediately
-                    # (see MicroFunctionsAPI.send_to_running_function_in_session() with send_now=True)
-                    if self._is_session_workflow:
-                        # set a given session id if it is present in the incoming event
-                        # for all messages coming to a session
-                        session_id = None
-                        if "sessionId" in function_input and function_input["sessionId"] != "" and function_input["sessionId"] is not None:
-                            session_id = function_input["sessionId"]
-                        elif "session_id" in function_input and function_input["session_id"] != "" and function_input["session_id"] is not None:
-                            session_id = function_input["session_id"]
-
-                        self._session_utils.set_key(key)
-                        # even if session_id is None, this will initialize it and set up the necessary objects
-                        self._session_utils.set_session_id(session_id)
-
-                        if self._is_session_function:
-                            try:
-                                self._session_utils.setup_session_function(self._session_function_parameters)
-                            except Exception as exc:
-                                self._logger.exception("Session function instantiation exception: %s\n%s", str(key), str(exc))
-                                error_type = "sessionFunctionId error"
-                                has_error = True
-
-                timestamp_map["t_start_sapi"] = time.time() * 1000.0
-                # 5. Setup the MicroFunctionsAPI object
-                if not has_error:
-                    self._sapi.set_key(key)
-
-                timestamp_map["t_start"] = time.time() * 1000.0
-                # todo add catch retry
-                #a = self._state_utils.get_retry_data()
-                #b = self._state_utils.get_catcher_data()
-                #self._logger.debug("CatchRetry Data: " + json.dumps(self._state_utils.get_retry_data()))
-                #self._logger.debug("CatchRetry Data2: " + str(type((self._state_utils.get_retry_data()))))
-                #retrydata = self._state_utils.get_retry_data()
-
-                # 6. Execute function
-                if not has_error:
-                    #self._logger.debug("[FunctionWorker] Before isTaskState, query: " + str(self._state_utils.isTaskState()))
-                    if self._function_runtime == "python 3.6":
-                        if self._state_utils.isTaskState() and self.code:
-                            function_output = None
-                            try:
-                                # TODO: acknowledgement for session function instance creation
-                                # if this is a session function, we'll keep running until the end of that function instance (e.g., session end)
-                                # need a way to 'acknowledge' that the session function instance is running, so that the host agent also knows
-                                # that the triggering message has indeed created a new instance
-                                # if we do not send such acknowledgement, the host agent will keep thinking it has not been handled (e.g., after a restart)
-                                # and will try to recreate the session function instance again (and again).
-                                exec_arguments = {}
-                                exec_arguments["function"] = self.code.handle
-                                exec_arguments["function_input"] = function_input
-                                function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, self._sapi)
-                            except Exception as exc:
-                                self._logger.exception("User code exception: %s\n%s", str(key), str(exc))
-                                sys.stdout.flush()
-                                error_type = "User code exception: " + str(exc.__class__.__name__)
-                                has_error = True
-
-                        else:
-                            # Processing for Non 'Task' states
-                            try:
-                                #self._logger.debug("[FunctionWorker] Before evaluateNonTaskState, input: " + str(function_input) + str(metadata))
-                                #TODO: catch-retry for non-task functions?
-                                function_output, metadata_updated = self._state_utils.evaluateNonTaskState(function_input, key, metadata, self._sapi)
-                                # update metadata in the publication utils
-                                self._publication_utils.set_metadata(metadata_updated)
-
-                                #self._logger.debug("[FunctionWorker] After evaluateNonTaskState, result: " + str(function_output) + str(function_input))
-                            except Exception as exc:
-                                self._logger.exception("NonTaskState evaluation exception: %s\n%s", str(instance_pid), str(exc))
-                                error_type = "NonTaskState evaluation exception"
-                                has_error = True
-                    elif self._function_runtime == "java":
-                        exec_arguments = {}
+                random.seed()
+                name = self._function_state_name + "_" + key + "_" + str(time.time() * 1000.0) + "_" + str(random.uniform(0, 100000))
+                sha = hashlib.sha256(name.encode()).hexdigest()
+                api_uds = "/tmp/" + sha + ".uds"
 
-                        random.seed()
-                        name = self._function_state_name + "_" + key + "_" + str(time.time() * 1000.0) + "_" + str(random.uniform(0, 100000))
-                        sha = hashlib.sha256(name.encode()).hexdigest()
-                        api_uds = "/tmp/" + sha + ".uds"
+                exec_arguments["api_uds"] = api_uds
+                exec_arguments["thriftAPIService"] = self._api_thrift.MicroFunctionsAPIService
 
-                        exec_arguments["api_uds"] = api_uds
-                        exec_arguments["thriftAPIService"] = self._api_thrift.MicroFunctionsAPIService
+                # serialize the input to the java worker
+                java_input = {}
+                java_input["key"] = key
+                java_input["event"] = function_input
+                java_input["APIServerSocketFilename"] = api_uds
 
-                        # serialize the input to the java worker
-                        java_input = {}
-                        java_input["key"] = key
-                        java_input["event"] = function_input
-                        java_input["APIServerSocketFilename"] = api_uds
+                java_input = json.dumps(java_input)
 
-                        java_input = json.dumps(java_input)
+                exec_arguments["function_input"] = java_input
 
-                        exec_arguments["function_input"] = java_input
+                function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, self._sapi)
 
-                        function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, self._sapi)
+        timestamp_map["t_end"] = timestamp_map["t_start_resultpath"] = time.time() * 1000.0
 
-                timestamp_map["t_end"] = timestamp_map["t_start_resultpath"] = time.time() * 1000.0
+        #self._logger.debug("[FunctionWorker] User code output:" + str(type(function_output)) + ":" + str(function_output))
+        # Start of post-processing
 
-                #self._logger.debug("[FunctionWorker] User code output:" + str(type(function_output)) + ":" + str(function_output))
-                # Start of post-processing
+        # 7. Apply ResultPath, if available
+        if not has_error:
+            try:
+                raw_state_input_midway = self._state_utils.applyResultPath(raw_state_input, function_output)
+                #self._logger.debug("[FunctionWorker] After ResultPath processing:" + str(type(raw_state_input_midway)) + ":" + str(raw_state_input_midway))
+            except Exception as exc:
+                self._logger.exception("ResultPath processing exception: %s\n%s", str(key), str(exc))
+                error_type = "ResultPath processing exception"
+                has_error = True
+
+        # 8. Apply OutputPath, if available
+        timestamp_map["t_start_outputpath"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                raw_state_output = self._state_utils.applyOutputPath(raw_state_input_midway)
+                #self._logger.debug("[FunctionWorker] After OutputPath processing:" + str(type(raw_state_output)) + ":" + str(raw_state_output))
+            except Exception as exc:
+                self._logger.exception("OutputPath processing exception: %s\n%s", str(key), str(exc))
+                error_type = "OutputPath processing exception"
+                has_error = True
+
+        # 9. Produce output string (value_output) from raw_state_output
+        #   (Data sent to publish output should also be a JSON Text.)
+        timestamp_map["t_start_encodeoutput"] = time.time() * 1000.0
+        value_output = 'null'
+        if not has_error:
+            try:
+                value_output = self._publication_utils.encode_output(raw_state_output)
+                #self._logger.debug("[FunctionWorker] Encoded state output:" + str(type(value_output)) + ":" + value_output)
+            except Exception as exc:
+                self._logger.exception("State Output Encoding exception: %s\n%s", str(key), str(exc))
+                error_type = "State Output Encoding exception"
+                has_error = True
+
+        # 10. If current state is a terminal state inside a parallel branch then store output and decrement counter
+        timestamp_map["t_start_branchterminal"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                self._state_utils.processBranchTerminalState(key, value_output, metadata, self._sapi) # not supposed to have a return value
+            except Exception as exc:
+                self._logger.exception("ProcessBranchTerminalState: %s\n%s", str(key), str(exc))
+                error_type = "ProcessBranchTerminalState exception"
+                has_error = True
 
-                # 7. Apply ResultPath, if available
-                if not has_error:
-                    try:
-                        raw_state_input_midway = self._state_utils.applyResultPath(raw_state_input, function_output)
-                        #self._logger.debug("[FunctionWorker] After ResultPath processing:" + str(type(raw_state_input_midway)) + ":" + str(raw_state_input_midway))
-                    except Exception as exc:
-                        self._logger.exception("ResultPath processing exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "ResultPath processing exception"
-                        has_error = True
+        #self._logger.exception("Before publish, has_error: " + str(has_error))
 
-                # 8. Apply OutputPath, if available
-                timestamp_map["t_start_outputpath"] = time.time() * 1000.0
-                if not has_error:
-                    try:
-                        raw_state_output = self._state_utils.applyOutputPath(raw_state_input_midway)
-                        #self._logger.debug("[FunctionWorker] After OutputPath processing:" + str(type(raw_state_output)) + ":" + str(raw_state_output))
-                    except Exception as exc:
-                        self._logger.exception("OutputPath processing exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "OutputPath processing exception"
-                        has_error = True
+        # Start of output publishing
+        try:
+            # _XXX_: a potential race condition here with the session_utils helper thread
+            # if the long-running function finishes and publishes the output,
+            # the local queue client there is shut down at the end of the publishing
+            # but the helper thread may not still have exited its polling loop for session update messages
+            # hence may try to send another heartbeat message with the publication_utils local queue client
 
-                # 9. Produce output string (value_output) from raw_state_output
-                #   (Data sent to publish output should also be a JSON Text.)
-                timestamp_map["t_start_encodeoutput"] = time.time() * 1000.0
-                value_output = 'null'
-                if not has_error:
-                    try:
-                        value_output = self._publication_utils.encode_output(raw_state_output)
-                        #self._logger.debug("[FunctionWorker] Encoded state output:" + str(type(value_output)) + ":" + value_output)
-                    except Exception as exc:
-                        self._logger.exception("State Output Encoding exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "State Output Encoding exception"
-                        has_error = True
+            # need a way to sync the cleanup of the local queue client?
+            # 1. shutdown the helper thread before publishing
+            # 2. ensure in the helper thread no other heartbeat is published when it just exits the polling loop
+            if self._session_utils is not None and self._is_session_function:
+                self._session_utils.shutdown_helper_thread()
 
-                # 10. If current state is a terminal state inside a parallel branch then store output and decrement counter
-                timestamp_map["t_start_branchterminal"] = time.time() * 1000.0
-                if not has_error:
-                    try:
-                        self._state_utils.processBranchTerminalState(key, value_output, metadata, self._sapi) # not supposed to have a return value
-                    except Exception as exc:
-                        self._logger.exception("ProcessBranchTerminalState: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "ProcessBranchTerminalState exception"
-                        has_error = True
+            if self._publication_utils is not None:
+                self._publication_utils.publish_output_direct(key, value_output, has_error, error_type, timestamp_map)
 
-                #self._logger.exception("Before publish, has_error: " + str(has_error))
+            # remove session function metadata from the session metadata tables if this is a session function
+            if self._session_utils is not None and self._is_session_function:
+                self._session_utils.cleanup()
 
-                # Start of output publishing
-                try:
-                    # _XXX_: a potential race condition here with the session_utils helper thread
-                    # if the long-running function finishes and publishes the output,
-                    # the local queue client there is shut down at the end of the publishing
-                    # but the helper thread may not still have exited its polling loop for session update messages
-                    # hence may try to send another heartbeat message with the publication_utils local queue client
+            return True
 
-                    # need a way to sync the cleanup of the local queue client?
-                    # 1. shutdown the helper thread before publishing
-                    # 2. ensure in the helper thread no other heartbeat is published when it just exits the polling loop
-                    if self._session_utils is not None and self._is_session_function:
-                        self._session_utils.shutdown_helper_thread()
+        except Exception as exc:
+            self._logger.exception("Publication exception: %s\n%s", str(key), str(exc))
+            return False
+
+    def _spawn_warm_instance(self):
+        parent_sock, instance_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        t_start_spawn = time.time() * 1000.0
+        instance_pid = os.fork()
+        if instance_pid == 0:
+            parent_sock.close()
+            for instance in self._warm_pool:
+                instance["sock"].close()
+            self._close_live_instance_fds()
+            self._warm_pool = None
+            self._run_warm_instance(instance_sock, t_start_spawn)
+            AsyncLogHandler.flush_all()
+            os._exit(0)
+
+        instance_sock.close()
+        instance = {}
+        instance["pid"] = instance_pid
+        instance["sock"] = parent_sock
+        instance["busy"] = False
+        instance["executions"] = 0
+        self._warm_pool.append(instance)
+
+    def _replace_warm_instance(self, instance):
+        instance["sock"].close()
+        self._warm_pool.remove(instance)
+        self._spawn_warm_instance()
+
+    def _run_warm_instance(self, sock, t_start_spawn):
+        signal(SIGCHLD, SIG_DFL)
+
+        LocalQueueClient.num_connects = 0
+        DataLayerClient.num_connects = 0
+        DataLayerClientPool.reset_stats()
+        self._publication_utils.set_reuse_clients(True)
+        self._publication_utils.connect_clients()
+
+        # the cached data layer reads can be kept for the next executions
+        self._sapi._enable_shared_read_cache()
+        for fused_worker in self._fused_workers.values():
+            fused_worker._sapi._enable_shared_read_cache()
+
+        # the fork and connection setup costs that every message handled here does not need to pay
+        t_saved = time.time() * 1000.0 - t_start_spawn
+
+        num_executions = 0
+        num_connects = LocalQueueClient.num_connects + DataLayerClient.num_connects
+        while True:
+            try:
+                frame = _recv_frame(sock)
+            except Exception as exc:
+                self._logger.error("[FunctionWorker] Warm instance could not receive: %s", str(exc))
+                break
+            if frame is None:
+                break
 
-                    if self._publication_utils is not None:
-                        self._publication_utils.publish_output_direct(key, value_output, has_error, error_type, timestamp_map)
+            work = json_codec.loads(frame.decode())
+            if "action" in work:
+                self._process_update(frame.decode())
+                continue
 
-                    # remove session function metadata from the session metadata tables if this is a session function
-                    if self._session_utils is not None and self._is_session_function:
-                        self._session_utils.cleanup()
+            key = work["key"]
+            num_executions += 1
 
-                    os._exit(0)
+            timestamp_map = {}
+            timestamp_map["t_start_fork"] = work["t_start_fork"]
+            if "t_queue_wait" in work:
+                timestamp_map["t_queue_wait"] = work["t_queue_wait"]
+            timestamp_map["live_instances"] = work["live_instances"]
+            timestamp_map["t_warm_saved"] = t_saved
+            timestamp_map["warm_executions"] = num_executions
 
-                except Exception as exc:
-                    self._logger.exception("Publication exception: %s\n%s", str(instance_pid), str(exc))
-                    sys.stdout.flush()
-                    os._exit(1)
+            global LOGGER_UUID
+            LOGGER_UUID = key
 
-            else:
-                # parent
-                # ignore children's exit signal, which allows the init to reap them
-                # TODO: store child process ids, so that we can keep track of running instances
-                # remove child process ids in the host agent, when the 'fin' message is received
-                # store (key, pid) mapping to the data layer to keep track of function instances
-                # TODO: maybe store this information in a forked process,
-                # so that we don't bottleneck/fail the parent functionworker
-                # TODO: need some component to remove the finished (key, instance_pid) tuples
-                #self._logger.debug("[FunctionWorker] key: " + key + " -> " + str(instance_pid))
-                #self._logger.debug("State Output instance PID: " + str(instance_pid) + str(has_error))
-                #self.local_data_layer_client.putMapEntry(self._map_name_key_pid, key, str(instance_pid))
-                pass
+            try:
+                if self._handle_message_in_instance(key, work["value"], timestamp_map):
+                    self._run_fused_chain()
+            except Exception as exc:
+                self._logger.exception("Warm instance exception: %s\n%s", str(key), str(exc))
+            sys.stdout.flush()
 
+            self._publication_utils.reset_execution_state()
+            self._sapi._reset_transient_data()
+            self._report_data_layer_stats()
+            LOGGER_UUID = "0l"
+            num_connects += LocalQueueClient.num_connects + DataLayerClient.num_connects
+
+            try:
+                sock.sendall(b"d")
+            except Exception:
+                break
+
+        self._logger.info("[FunctionWorker] Warm instance exit: %d executions, %d connection setups", num_executions, num_connects)
+        self._sapi._shutdown_write_behind()
+        self._publication_utils.shutdown_clients()
+        DataLayerClientPool.clear()
+        sock.close()
+
+    def _collect_warm_instances(self, timeout):
+        busy = [instance["sock"] for instance in self._warm_pool if instance["busy"]]
+        if not busy:
+            return
+        readable, _, _ = select.select(busy, [], [], timeout)
+        for instance in list(self._warm_pool):
+            if instance["sock"] not in readable:
+                continue
+            try:
+                done = instance["sock"].recv(1)
+            except Exception:
+                done = b""
+            if done and instance["executions"] < self._warm_pool_max_executions:
+                instance["busy"] = False
+                continue
+
+            # either recycle the instance after it reached the maximum number of executions
+            # or replace it, because it exited unexpectedly (e.g., user code called os._exit())
+            if not done:
+                self._logger.error("[FunctionWorker] Warm instance exited unexpectedly: %s", str(instance["pid"]))
+            self._replace_warm_instance(instance)
+
+    def _get_idle_warm_instance(self, timeout=0.0):
+        self._collect_warm_instances(0.0)
+        for instance in self._warm_pool:
+            if not instance["busy"]:
+                return instance
+        if timeout > 0.0:
+            self._collect_warm_instances(timeout)
+            for instance in self._warm_pool:
+                if not instance["busy"]:
+                    return instance
+        return None
+
+    def _dispatch_to_warm_instance(self, key, encapsulated_value, t_enqueue=0.0):
+        instance = self._get_idle_warm_instance()
+        if instance is None:
+            self._logger.error("[FunctionWorker] No warm instance available; forking for: %s", key)
+            self._fork_and_handle_message(key, encapsulated_value, t_enqueue)
+            return
+
+        work = {}
+        work["key"] = key
+        work["value"] = encapsulated_value
+        work["t_start_fork"] = time.time() * 1000.0
+        if t_enqueue > 0.0:
+            work["t_queue_wait"] = work["t_start_fork"] - t_enqueue
+        work["live_instances"] = len([instance for instance in self._warm_pool if instance["busy"]]) + 1
+        instance["busy"] = True
+        instance["executions"] += 1
+        try:
+            _send_frame(instance["sock"], json_codec.dumps(work).encode())
         except Exception as exc:
-            if instance_pid == 0:
-                self._logger.exception("Child exception: %s", str(exc))
-                os._exit(1)
-            else:
-                self._logger.exception("Fork exception: %s", str(instance_pid))
-                self._logger.exception(str(exc))
-                sys.stdout.flush()
+            self._logger.error("[FunctionWorker] Could not dispatch to warm instance: %s; forking for: %s", str(exc), key)
+            self._replace_warm_instance(instance)
+            self._fork_and_handle_message(key, encapsulated_value, t_enqueue)
+
+    def _send_update_to_warm_instances(self, update):
+        # frames are handled in order, so busy instances apply the update before their next execution
+        for instance in self._warm_pool:
+            try:
+                _send_frame(instance["sock"], json.dumps(update).encode())
+            except Exception as exc:
+                self._logger.error("[FunctionWorker] Could not send update to warm instance: %s", str(exc))
+
+    def _shutdown_warm_pool(self):
+        # the instances exit after finishing their current execution
+        for instance in self._warm_pool:
+            instance["sock"].close()
+        self._warm_pool = []
+
+    def _setup_fused_workers(self):
+        # the states that can be part of a fused chain started by this state
+        global print
+        for topic in self._fused_chain_topics:
+            try:
+                with open(self._fused_chain_topics[topic], "r") as paramsf:
+                    params = json.load(paramsf)
+                self._fused_workers[topic] = FunctionWorker(params, is_fused=True)
+            except Exception as exc:
+                self._logger.exception("[FunctionWorker] Could not set up fused state; sending messages instead: %s\n%s", topic, str(exc))
+
+        # setting up the fused workers redirected the output of this process to their loggers
+        print = self._logger.info
+        sys.stdout = self._stdout
+        sys.stderr = self._stderr
+        self._logger.info("[FunctionWorker] Set up %d fused states", len(self._fused_workers))
+
+    def _run_fused_chain(self):
+        # execute the next co-located python task states in this process
+        # until a fusion boundary (i.e., a state that cannot be fused, an error or the maximum chain length)
+        # only the first eligible trigger of each state is fused; any others have already been sent via the local queue
+        global LOGGER_UUID
+        fused_trigger = self._publication_utils.pop_fused_trigger()
+        if fused_trigger is None:
+            return
+
+        prevdir = os.getcwd()
+        worker = self
+        chain_length = 0
+        while fused_trigger is not None:
+            topic_next, key, value = fused_trigger
+            chain_length += 1
+            next_worker = self._fused_workers.get(topic_next)
+            if next_worker is None:
+                # could not be set up (see _setup_fused_workers())
+                worker._publication_utils.send_fused_trigger(fused_trigger)
+                break
+
+            next_worker._publication_utils.share_clients(worker._publication_utils)
+            next_worker._publication_utils.set_workflow_local_functions(self._wf_local)
+            next_worker._publication_utils.set_fusion_enabled(chain_length < self._fused_chain_max_length)
+
+            timestamp_map = {}
+            timestamp_map["t_start_fork"] = time.time() * 1000.0
+            timestamp_map["fused_chain_length"] = chain_length
+
+            LOGGER_UUID = key
+            os.chdir(next_worker._function_folder)
+            sys.stdout = next_worker._stdout
+            sys.stderr = next_worker._stderr
+
+            fused_trigger = None
+            if next_worker._handle_message_in_instance(key, value, timestamp_map):
+                fused_trigger = next_worker._publication_utils.pop_fused_trigger()
+
+            # fused workers are set up once in the parent and re-used by warm pool instances
+            next_worker._publication_utils.reset_execution_state()
+            next_worker._sapi._reset_transient_data()
+            worker = next_worker
+
+        os.chdir(prevdir)
+        sys.stdout = self._stdout
+        sys.stderr = self._stderr
 
     def _process_update(self, value):
         try:
@@ -573,27 +967,156 @@ class FunctionWorker:
             elif action == "update-local-functions":
                 self._wf_local = update["localFunctions"]
                 self._publication_utils.set_workflow_local_functions(self._wf_local)
+                if self._warm_pool:
+                    self._send_update_to_warm_instances(update)
         except Exception as exc:
             self._logger.error("Could not parse update message: %s; ignored...", str(exc))
 
-    def _handle_message(self, lqm):
+    def _report_data_layer_stats(self):
+        # runs inside a function instance process after an execution
+        if self._stats_write_fd is None:
+            return
+        stats = DataLayerClient.get_stats(with_histogram=True)
+        DataLayerClient.reset_stats()
+        if not stats:
+            return
+        report = (json.dumps(stats) + "\n").encode()
+        if len(report) > select.PIPE_BUF:
+            # only writes up to PIPE_BUF bytes do not interleave with the reports of other instances
+            request_stats = {}
+            for key, entry in stats.items():
+                DataLayerClient.merge_stats(request_stats, {key.split(":")[0]: entry})
+            stats = request_stats
+            report = (json.dumps(stats) + "\n").encode()
+        try:
+            if len(report) <= select.PIPE_BUF:
+                os.write(self._stats_write_fd, report)
+        except OSError:
+            # the pipe is full; this report is dropped
+            pass
+
+    def _collect_data_layer_stats(self):
+        while True:
+            try:
+                data = os.read(self._stats_read_fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self._stats_buffer += data
+        if self._stats_buffer:
+            lines = self._stats_buffer.split(b"\n")
+            self._stats_buffer = lines.pop()
+            for line in lines:
+                DataLayerClient.merge_stats(self._worker_data_layer_stats, json.loads(line.decode()))
+
+        t_now = time.time()
+        if t_now - self._t_last_stats_summary < self._data_layer_stats_interval:
+            return
+        # including the requests of this process
+        DataLayerClient.merge_stats(self._worker_data_layer_stats, DataLayerClient.get_stats(with_histogram=True))
+        DataLayerClient.reset_stats()
+        if self._worker_data_layer_stats:
+            for entry in self._worker_data_layer_stats.values():
+                entry["ms"] = round(entry["ms"], 3)
+                entry["p50"] = DataLayerClient.get_latency_percentile(entry["hist"], 50)
+                entry["p99"] = DataLayerClient.get_latency_percentile(entry["hist"], 99)
+            self._logger.info("[__mfn_datalayer_stats] %s %.3f %s", self._function_topic, t_now - self._t_last_stats_summary, json_codec.dumps(self._worker_data_layer_stats))
+        self._worker_data_layer_stats = {}
+        self._t_last_stats_summary = t_now
+
+    def _close_live_instance_fds(self):
+        for live_fd in self._live_instances:
+            os.close(live_fd)
+        self._live_instances = {}
+
+    def _collect_finished_instances(self, timeout):
+        # timeout in ms; returns the number of instances that are still running
+        if self._live_instances:
+            for live_fd, _ in self._instance_poller.poll(timeout):
+                self._instance_poller.unregister(live_fd)
+                os.close(live_fd)
+                del self._live_instances[live_fd]
+        return len(self._live_instances)
+
+    def _handle_message(self, lqm, msg_id=None):
         try:
             lqcm = LocalQueueClientMessage(lqm=lqm)
             key = lqcm.get_key()
             value = lqcm.get_value()
+            # the stream message id starts with the time (ms) the message was added
+            t_enqueue = 0.0
+            if msg_id is not None:
+                t_enqueue = float(msg_id.split("-")[0])
             if key == "0l":
                 self._process_update(value)
+            elif self._warm_pool is not None:
+                self._dispatch_to_warm_instance(key, value, t_enqueue)
             else:
-                self._fork_and_handle_message(key, value)
+                self._fork_and_handle_message(key, value, t_enqueue)
         except Exception as exc:
             self._logger.exception("Exception in handling: %s", str(exc))
             sys.stdout.flush()
+            AsyncLogHandler.flush_all()
             os._exit(1)
 
+    def _get_group_messages(self, max_count):
+        # returns (message id, message) tuples
+        lqm_list = []
+
+        # take over the messages of replicas that retrieved, but did not hand them over (e.g., because they crashed)
+        t_now = time.time() * 1000.0
+        if t_now - self._t_last_reclaim >= self._pending_reclaim_idle_ms:
+            self._t_last_reclaim = t_now
+            reclaimed_list = self.local_queue_client.reclaimMessages(self._function_topic, self._consumer_group, self._consumer_name, self._pending_reclaim_idle_ms, max_count)
+            for msg_id, lqm in reclaimed_list:
+                self._unacked_msg_ids[self._function_topic].append(msg_id)
+                lqm_list.append((msg_id, lqm))
+            if lqm_list:
+                self._logger.info("[FunctionWorker] Reclaimed %d pending messages", len(lqm_list))
+                return lqm_list
+
+        msg_list = self.local_queue_client.getMultipleGroupMessages([self._function_topic, self._control_topic], self._consumer_group, self._consumer_name, max_count, self._POLL_TIMEOUT)
+        for topic, msg_id, lqm in msg_list:
+            self._unacked_msg_ids[topic].append(msg_id)
+            lqm_list.append((msg_id, lqm))
+
+        return lqm_list
+
     def _get_and_handle_message(self):
-        lqm = self.local_queue_client.getMessage(self._function_topic, self._POLL_TIMEOUT)
-        if lqm is not None:
-            self._handle_message(lqm)
+        max_count = self._poll_batch_size
+        if self._warm_pool is not None:
+            # keep the messages in the stream until a warm instance becomes available
+            if self._get_idle_warm_instance(self._POLL_TIMEOUT / 1000.0) is None:
+                return
+            num_idle = len([instance for instance in self._warm_pool if not instance["busy"]])
+            max_count = min(max_count, num_idle)
+        elif self._max_instances > 0:
+            # admission control: keep the messages in the stream until an instance exits
+            num_live = self._collect_finished_instances(0)
+            if num_live >= self._max_instances:
+                num_live = self._collect_finished_instances(self._POLL_TIMEOUT)
+                if num_live >= self._max_instances:
+                    return
+            max_count = min(max_count, self._max_instances - num_live)
+
+        if self._consumer_group is not None:
+            lqm_list = self._get_group_messages(max_count)
+        else:
+            lqm_list = self.local_queue_client.getMultipleMessages(self._function_topic, max_count, self._POLL_TIMEOUT, with_ids=True)
+        for msg_id, lqm in lqm_list:
+            self._handle_message(lqm, msg_id)
+
+        if self._consumer_group is not None:
+            # the messages have been handed to function instances; other replicas must not reclaim them
+            for topic in self._unacked_msg_ids:
+                self.local_queue_client.ackMessages(topic, self._consumer_group, self._unacked_msg_ids[topic])
+                self._unacked_msg_ids[topic] = []
+
+        if len(lqm_list) >= max_count:
+            self._poll_batch_size = min(self._poll_batch_size * 2, self._POLL_MAX_NUM_MESSAGES)
+        elif len(lqm_list) < max_count // 2:
+            self._poll_batch_size = max(self._poll_batch_size // 2, 1)
 
     def run(self):
         self._is_running = True
@@ -605,8 +1128,18 @@ class FunctionWorker:
             + ", sandbox: " + self._sandboxid \
             + ", pid: " + str(os.getpid()))
 
+        if self._warm_pool is not None:
+            for _ in range(self._warm_pool_size):
+                self._spawn_warm_instance()
+            self._logger.info("[FunctionWorker] Started warm pool with %d instances, recycled after %d executions", self._warm_pool_size, self._warm_pool_max_executions)
+
         while self._is_running:
             self._get_and_handle_message()
+            if self._stats_read_fd is not None:
+                self._collect_data_layer_stats()
+
+        if self._warm_pool is not None:
+            self._shutdown_warm_pool()
 
         self._logger.debug("[FunctionWorker] Waiting for child processes to finish:" \
             + self._function_state_name \
@@ -630,6 +1163,7 @@ class FunctionWorker:
         self.local_queue_client.shutdown()
 
         self._logger.info("[FunctionWorker] Done")
+        AsyncLogHandler.flush_all()
         time.sleep(0.5)
         # shut down also the data layer client used for (key, pid) tuples
         #self.local_data_layer_client.shutdown()
@@ -643,6 +1177,7 @@ class FunctionWorker:
             + ", pid: " + str(os.getpid()))
         self.local_queue_client.shutdown()
         self._logger.info("[FunctionWorker] Done")
+        AsyncLogHandler.flush_all()
         time.sleep(0.5)
         os._exit(0)
 
@@ -705,6 +1240,10 @@ def main():
     with open(params_filename, "r") as paramsf:
         params = json.load(paramsf)
 
+    # the sandbox agent starts the replicas of a function worker with the same parameters file
+    if len(sys.argv) > 2:
+        params["replica_index"] = int(sys.argv[2])
+
     # create a thread with local queue consumer and subscription
     try:
         gw = FunctionWorker(params)
@@ -25,6 +25,9 @@ class LocalQueueClient:
         as the publication manager in the queue service.
 
     '''
+    # number of connection setups in this process (e.g., reported per function execution)
+    num_connects = 0
+
     def __init__(self, connect="/opt/mfn/redis-server/redis.sock"):
         self._qaddress = connect
 
@@ -39,6 +42,7 @@ class LocalQueueClient:
                 self._queue = redis.Redis.from_url("unix://" + self._qaddress, decode_responses=True)
                 # make sure we are really connected by forcing the redis connection to be established
                 self._queue.ping()
+                LocalQueueClient.num_connects += 1
                 break
             except Exception as exc:
                 if retry < 60:
@@ -62,6 +66,22 @@ class LocalQueueClient:
 
         return status
 
+    def addMessages(self, topic_message_list):
+        # add the (topic, message) tuples with a single round-trip;
+        # MULTI/EXEC ensures that a failed attempt can be retried as a whole
+        status = True
+        try:
+            pipe = self._queue.pipeline(transaction=True)
+            for topic, message in topic_message_list:
+                pipe.xadd(topic, message.get_message())
+            status = all(pipe.execute())
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed addMessages: " + str(exc))
+            status = False
+            self.connect()
+
+        return status
+
     def getMessage(self, topic, timeout):
         message = None
         try:
@@ -77,22 +97,115 @@ class LocalQueueClient:
 
         return message
 
-    def getMultipleMessages(self, topic, max_count, timeout):
-        message_list = []
+    def getMultipleMessages(self, topic, max_count, timeout, with_ids=False):
+        # with_ids: return (message id, message) tuples; the id encodes the time the message was added (ms)
+        msg_list = []
         try:
             message_list = self._queue.xread({topic: "0"}, block=timeout, count=max_count)
+            if message_list:
+                msg_id_list = []
+                for msg in message_list[0][1]:
+                    if with_ids:
+                        msg_list.append((msg[0], msg[1]))
+                    else:
+                        msg_list.append(msg[1])
+                    msg_id_list.append(msg[0])
+                # remove all retrieved messages from the topic with a single call
+                self._queue.xdel(topic, *msg_id_list)
         except Exception as exc:
             print("[LocalQueueClient] Reconnecting because of failed getMultipleMessages: " + str(exc))
             self.connect()
 
+        return msg_list
+
+    def createGroup(self, topic, group):
+        # a consumer group lets several consumers (e.g., function worker replicas) share a topic;
+        # start from the beginning of the stream, so that messages published before the group exists are not lost
+        try:
+            self._queue.xgroup_create(topic, group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as exc:
+            # another consumer has already created the group
+            if str(exc).find("BUSYGROUP") == -1:
+                raise
+
+    def getMultipleGroupMessages(self, topic_list, group, consumer, max_count, timeout):
+        # returns a list of (topic, message id, message) tuples;
+        # the messages stay pending in the group until they are acknowledged with ackMessages()
+        msg_list = []
+        try:
+            streams = {}
+            for topic in topic_list:
+                streams[topic] = ">"
+            message_list = self._queue.xreadgroup(group, consumer, streams, count=max_count, block=timeout)
+            if message_list:
+                for topic, messages in message_list:
+                    for msg in messages:
+                        msg_list.append((topic, msg[0], msg[1]))
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed getMultipleGroupMessages: " + str(exc))
+            self.connect()
+
+        return msg_list
+
+    def ackMessages(self, topic, group, msg_id_list):
+        # acknowledge and remove the messages with a single round-trip
+        status = True
+        if not msg_id_list:
+            return status
+        try:
+            pipe = self._queue.pipeline(transaction=True)
+            pipe.xack(topic, group, *msg_id_list)
+            pipe.xdel(topic, *msg_id_list)
+            pipe.execute()
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed ackMessages: " + str(exc))
+            status = False
+            self.connect()
+
+        return status
+
+    def reclaimMessages(self, topic, group, consumer, min_idle_time, max_count):
+        # take over the messages that another consumer retrieved, but did not acknowledge within min_idle_time (ms)
+        # (e.g., because it crashed); returns a list of (message id, message) tuples
         msg_list = []
-        for msg in message_list[0][1]:
-            msg_list.append(msg[1])
-            # remove the message from the topic
-            self._queue.xdel(topic, msg[0])
+        try:
+            pending_list = self._queue.xpending_range(topic, group, "-", "+", max_count)
+            msg_id_list = [pending["message_id"] for pending in pending_list if pending["time_since_delivered"] >= min_idle_time]
+            if msg_id_list:
+                message_list = self._queue.xclaim(topic, group, consumer, min_idle_time, msg_id_list)
+                for msg in message_list:
+                    # deleted entries are returned without their fields
+                    if msg and msg[1]:
+                        msg_list.append((msg[0], msg[1]))
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed reclaimMessages: " + str(exc))
+            self.connect()
 
         return msg_list
 
+    def incrementCounter(self, counter_name):
+        # INCR is atomic, so every caller observes a distinct value (a missing counter starts from 0);
+        # returns None on failure without retrying, because the failed attempt may have been applied
+        value = None
+        try:
+            value = self._queue.incr(counter_name)
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed incrementCounter: " + str(exc))
+            self.connect()
+
+        return value
+
+    def deleteCounters(self, counter_name_list):
+        status = True
+        try:
+            self._queue.delete(*counter_name_list)
+        except Exception as exc:
+            print("[LocalQueueClient] Reconnecting because of failed deleteCounters: " + str(exc))
+            status = False
+            self.connect()
+
+        return status
+
     def shutdown(self):
         self._is_running = False
         self._queue.close()
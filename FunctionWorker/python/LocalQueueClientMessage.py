@@ -15,16 +15,25 @@
 class LocalQueueClientMessage:
 
     def __init__(self, lqm=None, key=None, value=None):
+        # value is either a single string (e.g., the JSON envelope)
+        # or a dict of separate stream fields (e.g., a versioned envelope)
         if lqm is None and key is None and value is None:
             return
         elif lqm is not None:
             self._message = lqm
             self._key = self._message["key"]
-            self._value = self._message["value"]
+            if "value" in self._message:
+                self._value = self._message["value"]
+            else:
+                self._value = {k: v for k, v in self._message.items() if k != "key"}
         elif key is not None and value is not None:
             self._key = key
             self._value = value
-            self._message = {"key": self._key, "value": self._value}
+            if isinstance(self._value, dict):
+                self._message = dict(self._value)
+                self._message["key"] = self._key
+            else:
+                self._message = {"key": self._key, "value": self._value}
 
     def get_key(self):
         return self._key
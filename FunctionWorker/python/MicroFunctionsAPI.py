@@ -94,6 +94,8 @@ class MicroFunctionsAPI:
         self._suid = worker_params["storage_userid"]
 
         self._data_layer_operator = DataLayerOperator(self._suid, self._sid, self._wid, self._datalayer)
+        self._data_layer_operator.set_read_cache(worker_params.get("data_layer_read_cache", False), worker_params.get("data_layer_read_cache_ttl", 0))
+        self._data_layer_operator.set_write_behind(worker_params.get("data_layer_write_behind", False), worker_params.get("data_layer_write_behind_flush_interval_ms", 100), worker_params.get("data_layer_write_behind_flush_on_publish", True))
 
         # for sending immediate triggers to other functions
         self._publication_utils = publication_utils
@@ -1074,7 +1076,7 @@ class MicroFunctionsAPI:
                 "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
             raise MicroFunctionsDataLayerException(errmsg)
 
-    def get(self, key, is_private=False, bucketName=None):
+    def get(self, key, is_private=False, bucketName=None, use_cache=True):
         '''
         Access to data layer to load the value of a given key.
         The key is first checked in the transient deleted items.
@@ -1088,12 +1090,16 @@ class MicroFunctionsAPI:
         If the function used put() and delete() operations with is_queued=False (default),
         then the checks of the transient bucket will result in empty values,
         so that the item will be retrieved from the global data layer.
+        If the workflow enables the data layer read cache, a value retrieved
+        from the global data layer is cached for the rest of the execution
+        (and for the configured TTL across executions).
 
         Args:
             key (string): the key of the data item
             is_private (boolean): whether the item should be read from the private data layer of the workflow; default: False
             bucketName (string): name of the bucket where to get the key from. By default, it will be fetched from the default bucket. If this method is
                 called with is_private = True, then the bucketName parameter will be ignored.
+            use_cache (boolean): whether the value may come from the read cache, if it is enabled; default: True
 
         Returns:
             value (string): the value of the data item; empty string if the data item is not present.
@@ -1104,10 +1110,36 @@ class MicroFunctionsAPI:
         # check first transient_output
         # if not there, return the actual (global) data layer data item
         # if not there either, return empty string (as defined in the DataLayerClient)
-        if py3utils.is_string(key) and isinstance(is_private, bool):
-            return self._data_layer_operator.get(key, is_private, table=bucketName)
+        if py3utils.is_string(key) and isinstance(is_private, bool) and isinstance(use_cache, bool):
+            return self._data_layer_operator.get(key, is_private, table=bucketName, use_cache=use_cache)
         else:
             errmsg = "MicroFunctionsAPI.get(key) accepts a string as 'key'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and use_cache (boolean) are also accepted; defaults are False and True."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def invalidate_cache(self, key=None, is_private=False, bucketName=None):
+        '''
+        Remove a data item from the data layer read cache of this function worker,
+        so that the next get() retrieves it from the data layer.
+        Data items written by this function worker are invalidated automatically;
+        this is needed for the items updated elsewhere before the cache TTL expires.
+
+        Args:
+            key (string): the key of the data item; default: None (i.e., invalidate all cached items)
+            is_private (boolean): whether the item is in the private data layer of the workflow; default: False
+            bucketName (string): name of the bucket of the key; default: None (i.e., the default bucket)
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string.
+        '''
+        if (key is None or py3utils.is_string(key)) and isinstance(is_private, bool):
+            self._data_layer_operator.invalidate_cache(key, is_private, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.invalidate_cache(key) accepts a string as 'key' or None to invalidate all."
             errmsg = errmsg + \
                 "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
@@ -1150,12 +1182,246 @@ class MicroFunctionsAPI:
                 "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
             raise MicroFunctionsDataLayerException(errmsg)
 
-    def getKeys(self, start_index=0, end_index=2147483647, is_private=False):
+    def put_many(self, key_value_map, is_private=False, is_queued=False, bucketName=None):
+        '''
+        Access to data layer to store multiple data items in a single operation.
+        Behaves like calling put() for each (key, value) pair, but the items
+        are written to the data layer with one request instead of one request per item.
+
+        Args:
+            key_value_map (dict): the (key, value) pairs of the data items; keys and values must be strings
+            is_private (boolean): whether the items should be written to the private data layer of the workflow; default: False
+            is_queued (boolean): whether the put operation should be reflected on the data layer after the execution finish; default: False
+            bucketName (string): name of the bucket where to put the keys. By default, they will be put in the default bucket. If this method is
+                called with is_private = True, then the bucketName parameter will be ignored.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys and/or values are not strings.
+        '''
+        if isinstance(key_value_map, dict) and all(py3utils.is_string(k) and py3utils.is_string(v) for k, v in key_value_map.items()) \
+                and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.put_many(
+                key_value_map, is_private, is_queued, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.put_many(key_value_map) accepts a dict with strings as keys and values."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def get_many(self, keys, is_private=False, bucketName=None, use_cache=True):
+        '''
+        Access to data layer to load the values of multiple keys in a single operation.
+        Behaves like calling get() for each key (i.e., the transient data of this
+        function instance is consulted first), but the keys that have to be
+        retrieved from the data layer are fetched with one request.
+
+        Args:
+            keys (list): the keys of the data items (strings)
+            is_private (boolean): whether the items should be read from the private data layer of the workflow; default: False
+            bucketName (string): name of the bucket where to get the keys from. By default, they will be fetched from the default bucket. If this method is
+                called with is_private = True, then the bucketName parameter will be ignored.
+            use_cache (boolean): whether the values may come from the read cache, if it is enabled; default: True
+
+        Returns:
+            values (dict): a map of each key to the value of its data item; same value as get() would return for a key that is not present.
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys are not strings.
+        '''
+        if isinstance(keys, list) and all(py3utils.is_string(k) for k in keys) and isinstance(is_private, bool) and isinstance(use_cache, bool):
+            return self._data_layer_operator.get_many(keys, is_private, table=bucketName, use_cache=use_cache)
+        else:
+            errmsg = "MicroFunctionsAPI.get_many(keys) accepts a list of strings as 'keys'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def delete_many(self, keys, is_private=False, is_queued=False, bucketName=None):
+        '''
+        Access to data layer to remove multiple data items in a single operation.
+        Behaves like calling remove() for each key, but the items are
+        removed from the data layer with one request.
+
+        Args:
+            keys (list): the keys of the data items (strings)
+            is_private (boolean): whether the items should be deleted from the private data layer of the workflow; default: False
+            is_queued (boolean): whether the delete operation should be reflected on the data layer after the execution finish; default: False
+            bucketName (string): name of the bucket where to remove the keys from. By default, they will be deleted from the default bucket.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys are not strings.
+        '''
+        if isinstance(keys, list) and all(py3utils.is_string(k) for k in keys) \
+                and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.delete_many(
+                keys, is_private, is_queued, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.delete_many(keys) accepts a list of strings as 'keys'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def put_stream(self, key, iterable_of_bytes, is_private=False, bucketName=None):
+        '''
+        Access to data layer to store a large data item from an iterable of bytes
+        (e.g., a file object opened in binary mode, or a generator).
+        The data is split into chunks that are written in batches as they are read
+        (several batches in parallel), so that the whole value does not need to be in memory.
+        The value becomes visible when all chunks have been written;
+        a previous value of the key is replaced.
+        The value can only be accessed with get_stream() and delete_stream() (i.e., not with get()),
+        and the key is not listed by getKeys().
+        The operation is not queued (i.e., it is reflected on the data layer immediately).
+
+        Args:
+            key (string): the key of the data item
+            iterable_of_bytes (iterable): the parts of the value (bytes or strings)
+            is_private (boolean): whether the item should be written to the private data layer of the workflow; default: False
+            bucketName (string): name of the bucket where to put the key. By default, it will be put in the default bucket.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string, or the value could not be stored.
+        '''
+        if py3utils.is_string(key) and isinstance(is_private, bool):
+            try:
+                status = self._data_layer_operator.put_stream(key, iterable_of_bytes, is_private, table=bucketName)
+            except Exception as exc:
+                raise MicroFunctionsDataLayerException("MicroFunctionsAPI.put_stream() failed: " + str(exc))
+            if not status:
+                raise MicroFunctionsDataLayerException("MicroFunctionsAPI.put_stream() could not store key: " + key)
+        else:
+            errmsg = "MicroFunctionsAPI.put_stream(key, iterable_of_bytes) accepts a string as 'key'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def get_stream(self, key, is_private=False, bucketName=None):
+        '''
+        Access to data layer to load a large data item stored with put_stream().
+        The chunks are retrieved in batches (the next ones in parallel) while the returned generator is consumed,
+        and each chunk as well as the whole value are checked for integrity.
+
+        Args:
+            key (string): the key of the data item
+            is_private (boolean): whether the item should be read from the private data layer of the workflow; default: False
+            bucketName (string): name of the bucket where to get the key from. By default, it will be fetched from the default bucket.
+
+        Returns:
+            A generator of the chunks of the value (bytes); None if the key was not stored with put_stream().
+            The generator raises an IOError, if a chunk is missing or corrupted.
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string.
+        '''
+        if py3utils.is_string(key) and isinstance(is_private, bool):
+            return self._data_layer_operator.get_stream(key, is_private, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.get_stream(key) accepts a string as 'key'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def delete_stream(self, key, is_private=False, bucketName=None):
+        '''
+        Access to data layer to remove a large data item stored with put_stream(), including its chunks.
+
+        Args:
+            key (string): the key of the data item
+            is_private (boolean): whether the item should be deleted from the private data layer of the workflow; default: False
+            bucketName (string): name of the bucket where to remove the key from. By default, it will be deleted from the default bucket.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string.
+        '''
+        if py3utils.is_string(key) and isinstance(is_private, bool):
+            self._data_layer_operator.delete_stream(key, is_private, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.delete_stream(key) accepts a string as 'key'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    async def aput(self, key, value, is_private=False, is_queued=False, bucketName=None):
+        '''
+        Awaitable version of put(), so that an 'async' handler can have
+        multiple data layer operations in flight (e.g., with asyncio.gather()).
+        The arguments are the same as the ones of put().
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key and/or value are not strings.
+        '''
+        if py3utils.is_string(key) and py3utils.is_string(value) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            await self._data_layer_operator.aput(key, value, is_private, is_queued, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.aput(key, value) accepts a string as 'key' and 'value'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    async def aget(self, key, is_private=False, bucketName=None, use_cache=True):
+        '''
+        Awaitable version of get(), so that an 'async' handler can have
+        multiple data layer operations in flight, e.g.:
+
+            values = await asyncio.gather(*[context.aget(key) for key in keys])
+
+        The arguments are the same as the ones of get().
+
+        Returns:
+            value (string): the value of the data item; empty string if the data item is not present.
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string.
+        '''
+        if py3utils.is_string(key) and isinstance(is_private, bool) and isinstance(use_cache, bool):
+            return await self._data_layer_operator.aget(key, is_private, table=bucketName, use_cache=use_cache)
+        else:
+            errmsg = "MicroFunctionsAPI.aget(key) accepts a string as 'key'."
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and use_cache (boolean) are also accepted; defaults are False and True."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    async def adelete(self, key, is_private=False, is_queued=False, bucketName=None):
+        '''
+        Awaitable version of delete().
+        The arguments are the same as the ones of delete().
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the key is not a string.
+        '''
+        if py3utils.is_string(key) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            await self._data_layer_operator.adelete(key, is_private, is_queued, table=bucketName)
+        else:
+            errmsg = "MicroFunctionsAPI.adelete(key) accepts a string as 'key'"
+            errmsg = errmsg + \
+                "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def getKeys(self, start_index=0, end_index=2147483647, is_private=False, prefix=""):
         '''
         Args:
             start_index (int): the starting index of the keys to be retrieved; default: 0
             end_index (int): the end index of the keys to be retrieved; default: 2147483647
             is_private (boolean): whether the keys should be retrieved from the private data layer of the workflow; default: False
+            prefix (string): only retrieve the keys starting with this prefix; default: "" (all keys)
 
         Returns:
             List of keys (list)
@@ -1164,14 +1430,44 @@ class MicroFunctionsAPI:
             MicroFunctionsDataLayerException: when start_index < 0 and/or end_index > 2147483647.
 
         Note:
+            The keys before start_index are read again on every call;
+            to page through many keys, use scanKeys() with the cursor returned for the previous page.
             The usage of this function is only possible with a KNIX-specific feature (i.e., support for CRDTs).
             Using a KNIX-specific feature might make the function incompatible with other platforms.
 
         '''
-        if start_index >= 0 and end_index <= 2147483647 and isinstance(is_private, bool):
-            return self._data_layer_operator.getKeys(start_index, end_index, is_private)
+        if start_index >= 0 and end_index <= 2147483647 and isinstance(is_private, bool) and isinstance(prefix, str):
+            return self._data_layer_operator.getKeys(start_index, end_index, is_private, prefix)
         else:
             errmsg = "MicroFunctionsAPI.getKeys(start_index, end_index) accepts indices between 0 and 2147483647 (defaults)."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) and prefix (string) are also accepted; defaults are False and \"\"."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def scanKeys(self, prefix="", cursor="", count=1000, is_private=False):
+        '''
+        Retrieve the keys starting with a prefix page by page, in key order.
+
+        Args:
+            prefix (string): only retrieve the keys starting with this prefix; default: "" (all keys)
+            cursor (string): the cursor returned by the previous call; default: "" (start from the beginning)
+            count (int): the maximum number of keys to be retrieved in this call; default: 1000
+            is_private (boolean): whether the keys should be retrieved from the private data layer of the workflow; default: False
+
+        Returns:
+            Tuple of the list of keys and the cursor to continue from (list, string); the cursor is "" when there are no more keys
+
+        Raises:
+            MicroFunctionsDataLayerException: when count is not between 1 and 2147483647.
+
+        Note:
+            The usage of this function is only possible with a KNIX-specific feature (i.e., support for CRDTs).
+            Using a KNIX-specific feature might make the function incompatible with other platforms.
+
+        '''
+        if isinstance(prefix, str) and isinstance(cursor, str) and isinstance(count, int) and 0 < count <= 2147483647 and isinstance(is_private, bool):
+            return self._data_layer_operator.scanKeys(prefix, cursor, count, is_private)
+        else:
+            errmsg = "MicroFunctionsAPI.scanKeys(prefix, cursor, count) accepts a prefix (string), a cursor (string) and a count between 1 and 2147483647."
             errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
 
@@ -1882,6 +2178,49 @@ class MicroFunctionsAPI:
         '''
         return self._data_layer_operator.get_data_to_be_deleted(is_private)
 
+    def _commit_transient_data_output(self):
+        '''
+        Commit the queued (key, value) operations to the data layer
+        when the function instance finishes.
+        '''
+        self._data_layer_operator.commit_transient_data_output()
+
+    def _commit_transient_data_structures(self):
+        '''
+        Commit the queued map, set and counter operations to the data layer
+        when the function instance finishes.
+        '''
+        self._data_layer_operator.commit_transient_data_structures()
+
+    def _flush_write_behind(self, is_publishing=True):
+        '''
+        Replicate the writes of the function to the global data layer,
+        if the workflow uses the write-behind via the local data layer.
+        When publishing the output, this is done only if the workflow asks for it.
+        '''
+        self._data_layer_operator.flush_write_behind(is_publishing)
+
+    def _shutdown_write_behind(self):
+        '''
+        Replicate the remaining writes of the function to the global data layer
+        and stop the background replication.
+        '''
+        self._data_layer_operator.shutdown_write_behind()
+
+    def _enable_shared_read_cache(self):
+        '''
+        Keep the cached data layer reads for the next executions (with a read cache TTL),
+        because this process (i.e., a warm pool instance) handles multiple executions.
+        '''
+        self._data_layer_operator.set_shared_read_cache(True)
+
+    def _reset_transient_data(self):
+        '''
+        Clear the transient data after the function instance finishes,
+        so that a warm pool instance starts its next execution without it.
+        '''
+        self._data_layer_operator.reset_transient_data()
+
     def _get_data_layer_client(self, is_private=False):
         '''
         Returns:
@@ -1891,6 +2230,13 @@ class MicroFunctionsAPI:
         '''
         return self._data_layer_operator._get_data_layer_client(is_private)
 
+    def _set_reuse_data_layer_clients(self, reuse_clients):
+        '''
+        Keep the data layer clients open across executions
+        (i.e., in a warm pool instance).
+        '''
+        self._data_layer_operator.set_reuse_clients(reuse_clients)
+
     def _shutdown_data_layer_client(self):
         '''
         Shut down the data layer client if it has been initialized
@@ -1899,6 +2245,49 @@ class MicroFunctionsAPI:
         '''
         self._data_layer_operator._shutdown_data_layer_client()
 
+    def _add_internal_next(self, next, value, function_execution_id, metadata=None):
+        '''
+        Add a trigger with a given execution id for the workflow's own processing of Map and Parallel states
+        (i.e., starting a pending Map item or the post-processing after the branches have been joined).
+        The destination is not a potential next of the current state, so the trigger is not checked like the user triggers.
+
+        Args:
+            next (string): the state to be triggered
+            value: the input of the state; a python data type
+            function_execution_id (string): the execution id of the triggered state
+            metadata (dict): the metadata fields to be set for the triggered state (e.g., '__state_action')
+        '''
+        trigger = {}
+        trigger["next"] = next
+        trigger["value"] = value
+        trigger["is_privileged"] = False
+        trigger["function_execution_id"] = function_execution_id
+        if metadata is not None:
+            trigger["metadata"] = metadata
+        self._publication_utils.append_trigger(trigger)
+
+    def _increment_local_counter(self, counter_name):
+        '''
+        Increment a counter of the workflow's own processing of Map and Parallel states (e.g., the finished branches)
+        and return its new value; None if the counter could not be incremented.
+        The counter is kept by the local queue of the sandbox, where all branches of an execution run,
+        and the increment is atomic: concurrent callers observe distinct values.
+        A counter that does not exist starts from 0.
+
+        Args:
+            counter_name (string): the name of the counter
+        '''
+        return self._publication_utils._get_local_queue_client().incrementCounter(counter_name)
+
+    def _delete_local_counters(self, counter_name_list):
+        '''
+        Remove counters incremented with _increment_local_counter().
+
+        Args:
+            counter_name_list (list): the names of the counters
+        '''
+        return self._publication_utils._get_local_queue_client().deleteCounters(counter_name_list)
+
     def addTriggerableBucket(self, bucketName):
         '''
         Args:
@@ -14,17 +14,26 @@
 
 import copy
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
+from AsyncLogHandler import AsyncLogHandler
 from DataLayerClient import DataLayerClient
+from DataLayerClientPool import DataLayerClientPool
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
 from MicroFunctionsExceptions import MicroFunctionsException
 
+import json_codec
 import py3utils
 
+# versioned envelope: the user data and metadata travel as separate stream fields,
+# so that the (already encoded) user data is not serialized a second time
+ENVELOPE_VERSION = "2"
+
 class PublicationUtils():
     def __init__(self, worker_params, state_utils, logger):
         self._logger = logger
@@ -61,6 +70,16 @@ class PublicationUtils():
 
         self._local_queue_client = None
         self._backup_data_layer_client = None
+        # the process that created the clients; they must not be shared with forked processes
+        self._clients_pid = None
+        # whether the clients should be kept open after publishing
+        # (i.e., in a warm pool instance that handles multiple executions)
+        self._reuse_clients = False
+
+        # co-located python task states that can be executed in this process instead of sending them a message
+        self._fused_chain_topics = worker_params.get("fused_chain_topics", {})
+        self._can_fuse = False
+        self._fused_trigger = None
 
         self._sapi = None
 
@@ -71,6 +90,10 @@ class PublicationUtils():
         self._execution_info_map_name = None
         self._next_backup_list = []
 
+        # messages collected while publishing to multiple destinations (see _flush_message_batches())
+        self._local_message_batch = None
+        self._remote_message_batch = None
+
         self._internal_endpoint = worker_params["internal_endpoint"]
         self._external_endpoint = worker_params["external_endpoint"]
 
@@ -83,6 +106,51 @@ class PublicationUtils():
     def set_sapi(self, sapi):
         self._sapi = sapi
 
+    def set_reuse_clients(self, reuse_clients):
+        self._reuse_clients = reuse_clients
+        if self._sapi is not None:
+            self._sapi._set_reuse_data_layer_clients(reuse_clients)
+
+    def set_fusion_enabled(self, can_fuse):
+        self._can_fuse = can_fuse
+
+    def pop_fused_trigger(self):
+        '''
+        Return the (topic, key, value) of the next function to be executed in this process
+        (see FunctionWorker._run_fused_chain()), if any.
+        '''
+        fused_trigger = self._fused_trigger
+        self._fused_trigger = None
+        return fused_trigger
+
+    def send_fused_trigger(self, fused_trigger):
+        # fall back to the local queue (e.g., when the next function could not be set up in this process)
+        topic_next, key, value = fused_trigger
+        self._send_local_queue_message(self._get_local_queue_client(), topic_next, key, value)
+        if not self._reuse_clients:
+            self.shutdown_clients()
+
+    def share_clients(self, publication_utils):
+        # re-use the clients of the previous function of a fused chain
+        self._local_queue_client = publication_utils._local_queue_client
+        self._backup_data_layer_client = publication_utils._backup_data_layer_client
+        self._clients_pid = publication_utils._clients_pid
+        self.set_reuse_clients(publication_utils._reuse_clients)
+
+    def reset_execution_state(self):
+        '''
+        Clear the state accumulated during a function execution,
+        so that a warm pool instance can handle the next one.
+        '''
+        self._metadata = None
+        self._fused_trigger = None
+        self._local_message_batch = None
+        self._remote_message_batch = None
+        self._output_counter_map = {}
+        self._dynamic_workflow = []
+        self._execution_info_map_name = None
+        self._next_backup_list = []
+
     def set_metadata(self, metadata):
         self._metadata = metadata
         self._execution_info_map_name = "execution_info_map_" + self._metadata["__execution_id"]
@@ -95,7 +163,15 @@ class PublicationUtils():
                 self._metadata["__mfnusermetadata"] = {}
             self._metadata["__mfnusermetadata"][metadata_name] = metadata_value
 
+    def _check_clients_pid(self):
+        # clients inherited via fork() share their sockets with the parent; create new ones instead
+        if self._clients_pid != os.getpid():
+            self._local_queue_client = None
+            self._backup_data_layer_client = None
+            self._clients_pid = os.getpid()
+
     def _get_local_queue_client(self):
+        self._check_clients_pid()
         if self._local_queue_client is None:
             self._local_queue_client = LocalQueueClient(connect=self._queue)
         return self._local_queue_client
@@ -105,13 +181,23 @@ class PublicationUtils():
             self._local_queue_client.shutdown()
 
     def _get_backup_data_layer_client(self):
+        self._check_clients_pid()
         if self._backup_data_layer_client is None:
-            self._backup_data_layer_client = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
+            self._backup_data_layer_client = DataLayerClientPool.acquire(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
         return self._backup_data_layer_client
 
     def _shutdown_backup_data_layer_client(self):
         if self._backup_data_layer_client is not None:
-            self._backup_data_layer_client.shutdown()
+            DataLayerClientPool.release(self._backup_data_layer_client)
+            self._backup_data_layer_client = None
+
+    def connect_clients(self):
+        self._get_local_queue_client()
+        self._get_backup_data_layer_client()
+
+    def shutdown_clients(self):
+        self._shutdown_local_queue_client()
+        self._shutdown_backup_data_layer_client()
 
     def convert_api_message_to_python_object(self, message):
         # _XXX_: Java objects need to be serialized and passed to python; however, API functions expect python objects
@@ -204,7 +290,7 @@ class PublicationUtils():
         #self._logger.debug("received user input in decode_input: " + str(encoded_input))
         try:
            #if isinstance(encoded_input,str):
-            raw_state_input = json.loads(encoded_input)
+            raw_state_input = json_codec.loads(encoded_input)
             #if isinstance(encoded_input,dict):
             #    raw_state_input = encoded_input
             return raw_state_input
@@ -217,7 +303,7 @@ class PublicationUtils():
     def encode_output(self, raw_state_output):
         #Produce output JSON Text from raw_state_output
         try:
-            value_output = json.dumps(raw_state_output)
+            value_output = json_codec.dumps(raw_state_output)
             return value_output
         except Exception as exc:
             #self._logger.exception("Error while encoding state output")
@@ -230,13 +316,22 @@ class PublicationUtils():
         # "__mfnmetadata": system_specific_metadata }
         # This encapsulation is invisible to the user and is added,
         # maintained, and removed by the frontend and function worker.
+        # Messages from other function workers may instead carry a versioned envelope
+        # with the same keys as separate fields (see encapsulate_output_fields()).
 
         if encoded_encapsulated_input == '':
             #self._logger.exception("Invalid encapsulation of user input")
             raise MicroFunctionsException("Invalid encapsulation of user input.")
         else:
             try:
-                encapsulated_input = json.loads(encoded_encapsulated_input)
+                if isinstance(encoded_encapsulated_input, dict):
+                    if encoded_encapsulated_input["__mfnversion"] != ENVELOPE_VERSION:
+                        raise MicroFunctionsException("Unsupported envelope version: " + str(encoded_encapsulated_input["__mfnversion"]))
+                    userdata = encoded_encapsulated_input['__mfnuserdata']
+                    metadata = json_codec.loads(encoded_encapsulated_input['__mfnmetadata'])
+                    return userdata, metadata
+
+                encapsulated_input = json_codec.loads(encoded_encapsulated_input)
                 userdata = encapsulated_input['__mfnuserdata']
                 metadata = encapsulated_input['__mfnmetadata']
                 return userdata, metadata
@@ -248,13 +343,25 @@ class PublicationUtils():
     def encapsulate_output(self, encoded_state_output, metadata):
         try:
             value = {"__mfnuserdata": encoded_state_output, "__mfnmetadata":  metadata}
-            value_output = json.dumps(value)
+            value_output = json_codec.dumps(value)
             return value_output
         except Exception as exc:
             #self._logger.exception("Error while encoding state output")
             #self._logger.exception(e)
             raise MicroFunctionsException("Error while encoding state output: " + str(exc))
 
+    def encapsulate_output_fields(self, encoded_state_output, metadata):
+        # only for messages to other function workers;
+        # the frontend and the data layer keep receiving the JSON envelope from encapsulate_output()
+        try:
+            value = {}
+            value["__mfnversion"] = ENVELOPE_VERSION
+            value["__mfnuserdata"] = encoded_state_output
+            value["__mfnmetadata"] = json_codec.dumps(metadata)
+            return value
+        except Exception as exc:
+            raise MicroFunctionsException("Error while encoding state output: " + str(exc))
+
     def get_dynamic_workflow(self):
         '''
         Return the dynamically generated workflow information,
@@ -273,29 +380,11 @@ class PublicationUtils():
         return converted_function_output
 
     def _store_output_data(self):
-        data_out = self._sapi.get_transient_data_output()
-        to_be_deleted = self._sapi.get_data_to_be_deleted()
-
-        if data_out or to_be_deleted:
-            dlc = self._sapi._get_data_layer_client()
+        self._sapi._commit_transient_data_output()
 
-            for k in data_out:
-                dlc.put(k, data_out.get(k))
+        self._sapi._commit_transient_data_structures()
 
-            for k in to_be_deleted:
-                dlc.delete(k)
-
-        data_out_private = self._sapi.get_transient_data_output(is_private=True)
-        to_be_deleted_private = self._sapi.get_data_to_be_deleted(is_private=True)
-
-        if data_out_private or to_be_deleted_private:
-            dlc_private = self._sapi._get_data_layer_client(is_private=True)
-
-            for k in data_out_private:
-                dlc_private.put(k, data_out_private.get(k))
-
-            for k in to_be_deleted_private:
-                dlc_private.delete(k)
+        self._sapi._flush_write_behind()
 
         self._sapi._shutdown_data_layer_client()
 
@@ -304,14 +393,53 @@ class PublicationUtils():
         # and send it to the local queue topic via the local queue client
         lqcm = LocalQueueClientMessage(key=key, value=value)
 
+        if self._local_message_batch is not None:
+            self._local_message_batch.append((lqtopic, lqcm))
+            return
+
         #lqcpub.addMessage(lqtopic, lqcm, False)
         ack = lqcpub.addMessage(lqtopic, lqcm, True)
         while not ack:
             ack = lqcpub.addMessage(lqtopic, lqcm, True)
 
+    def _start_message_batches(self):
+        self._local_message_batch = []
+        self._remote_message_batch = []
+
+    def _flush_message_batches(self, lqcpub, timestamp_map):
+        local_message_batch = self._local_message_batch
+        remote_message_batch = self._remote_message_batch
+        self._local_message_batch = None
+        self._remote_message_batch = None
+
+        timestamp_map["t_start_pubflush"] = time.time() * 1000.0
+        timestamp_map["num_pub_local"] = len(local_message_batch)
+        timestamp_map["num_pub_remote"] = len(remote_message_batch)
+
+        # all local messages in a single pipeline
+        if local_message_batch:
+            ack = lqcpub.addMessages(local_message_batch)
+            while not ack:
+                ack = lqcpub.addMessages(local_message_batch)
+
+        # remote messages concurrently
+        if len(remote_message_batch) == 1:
+            self._send_remote_message(*remote_message_batch[0])
+        elif remote_message_batch:
+            with ThreadPoolExecutor(max_workers=min(len(remote_message_batch), 16)) as executor:
+                futures = [executor.submit(self._send_remote_message, *remote_message) for remote_message in remote_message_batch]
+            # all messages have been attempted; raise the first error, as sending them one by one would
+            for future in futures:
+                future.result()
+
+        timestamp_map["t_end_pubflush"] = time.time() * 1000.0
+
     def _send_remote_message(self, remote_address, message_type, action_data):
         # form a http request to send to remote host
         # need to set async=true in request URL, so that the frontend does not have a sync object waiting
+        if self._remote_message_batch is not None:
+            self._remote_message_batch.append((remote_address, message_type, action_data))
+            return
 
         # exponential backoff
         retry = 0.1
@@ -364,7 +492,7 @@ class PublicationUtils():
 
         return (None, None)
 
-    def _generate_trigger_metadata(self, topic_next):
+    def _generate_trigger_metadata(self, topic_next, function_execution_id=None, metadata=None):
         # keep track of the output instances of the next topic
         # e.g., funcA -> funcB with input1 (instance 0) and funcB with input2 (instance 1)
         if topic_next not in self._output_counter_map:
@@ -381,14 +509,20 @@ class PublicationUtils():
             next_function_execution_id = self._metadata["__function_execution_id"] + "_" + str(output_instance_id)+"-M"
         self._output_counter_map[topic_next] += 1
 
+        # the trigger already determined its execution id (e.g., a Map branch started by another branch)
+        if function_execution_id is not None:
+            next_function_execution_id = function_execution_id
+
         trigger_metadata = copy.deepcopy(self._metadata)
         trigger_metadata["__function_execution_id"] = next_function_execution_id
+        if metadata is not None:
+            trigger_metadata.update(metadata)
 
         #self._logger.debug("trigger metadata: " + str(trigger_metadata))
 
         return (next_function_execution_id, trigger_metadata)
 
-    def _publish_output(self, key, trigger, lqcpub, timestamp_map=None):
+    def _publish_output(self, key, trigger, lqcpub, timestamp_map=None, can_fuse=False):
         if timestamp_map is not None:
             timestamp_map['t_pub_output'] = time.time() * 1000.0
         self._logger.debug(f"[_publish_output] key: {key}, trigger: {str(trigger)}")
@@ -428,17 +562,30 @@ class PublicationUtils():
             output = {}
             output["topicNext"] = topic_next
 
-            next_function_execution_id, trigger_metadata = self._generate_trigger_metadata(topic_next)
-
-            output["value"] = self.encapsulate_output(trigger["value"], trigger_metadata)
+            next_function_execution_id, trigger_metadata = self._generate_trigger_metadata(topic_next, trigger.get("function_execution_id"), trigger.get("metadata"))
 
             # check whether next is local or not
-            if topic_next in self._wf_local:
-                # event message directly to the next function's local queue topic
-                if timestamp_map is not None:
-                    timestamp_map['t_pub_localqueue'] = time.time() * 1000.0
-                self._send_local_queue_message(lqcpub, topic_next, key, output["value"])
+            if topic_next in self._wf_local and next != self._wf_exit:
+                encapsulated_fields = self.encapsulate_output_fields(trigger["value"], trigger_metadata)
+                if can_fuse and self._fused_trigger is None and topic_next in self._fused_chain_topics:
+                    # the next function will be executed in this process after we finish publishing
+                    if timestamp_map is not None:
+                        timestamp_map['t_pub_fused'] = time.time() * 1000.0
+                    self._fused_trigger = (topic_next, key, encapsulated_fields)
+                else:
+                    # event message directly to the next function's local queue topic
+                    if timestamp_map is not None:
+                        timestamp_map['t_pub_localqueue'] = time.time() * 1000.0
+                    self._send_local_queue_message(lqcpub, topic_next, key, encapsulated_fields)
+
+                # the backup is logged with the same fields (see _log_backup())
+                if self._should_checkpoint:
+                    output["value"] = encapsulated_fields
+                else:
+                    output["value"] = None
             else:
+                output["value"] = self.encapsulate_output(trigger["value"], trigger_metadata)
+
                 # Three cases:
                 # 1. non-local next: remote message; header: "global-pub"
                 # 2. non-local end: remote message; header: "remote-result"
@@ -499,10 +646,20 @@ class PublicationUtils():
     def _log_trigger_backups(self, input_backup_map, current_function_instance_id, store_next_backup_list=False):
         if self._execution_info_map_name is not None:
             for input_backup_key in input_backup_map:
-                self._logger.info("[__mfn_backup] [%s] [%s] %s", self._execution_info_map_name, input_backup_key, input_backup_map[input_backup_key])
+                self._log_backup(input_backup_key, input_backup_map[input_backup_key])
             if store_next_backup_list:
                 self._logger.info("[__mfn_backup] [%s] [%s] %s", self._execution_info_map_name, "next_" + current_function_instance_id, json.dumps(self._next_backup_list))
 
+    # a JSON envelope (e.g., of a message to the frontend) is logged as it is.
+    # a versioned envelope (see encapsulate_output_fields()) is logged with its fields,
+    # so that the user data is not encoded again:
+    # "[__mfn_backup] [<map name>] [<key>] [<version>] <encoded metadata> <encoded user data>"
+    def _log_backup(self, backup_key, value):
+        if isinstance(value, dict):
+            self._logger.info("[__mfn_backup] [%s] [%s] [%s] %s %s", self._execution_info_map_name, backup_key, value["__mfnversion"], value["__mfnmetadata"], value["__mfnuserdata"])
+        else:
+            self._logger.info("[__mfn_backup] [%s] [%s] %s", self._execution_info_map_name, backup_key, value)
+
     def _send_message_to_recovery_manager(self, key, message_type, topic, func_exec_id, has_error, error_type, lqcpub):
         # TODO
         return
@@ -605,14 +762,13 @@ class PublicationUtils():
             timestamp_map["hasError"] = True
 
         else:
-            # dump the result into the data layer
-            timestamp_map["t_start_encapsulate"] = time.time() * 1000.0
-            encapsulated_value_output = self.encapsulate_output(value_output, self._metadata)
-
             if self._should_checkpoint:
+                # dump the result into the backup log
+                timestamp_map["t_start_encapsulate"] = time.time() * 1000.0
+                encapsulated_fields = self.encapsulate_output_fields(value_output, self._metadata)
                 timestamp_map["t_start_dlcbackup"] = time.time() * 1000.0
                 timestamp_map["t_start_resultmap"] = time.time() * 1000.0
-                self._logger.info("[__mfn_backup] [%s] [%s] %s", self._execution_info_map_name, "result_" + current_function_instance_id, encapsulated_value_output)
+                self._log_backup("result_" + current_function_instance_id, encapsulated_fields)
 
             # get the combined (next, value) tuple list for the output
             # use here the original output:
@@ -661,10 +817,13 @@ class PublicationUtils():
                     starting_next = {}
 
                 timestamp_map["t_start_pubnextlist"] = time.time() * 1000.0
+                timestamp_map["pub_fanout"] = len(converted_function_output)
                 any_next = False
-                # parse the converted_function_output to determine the next and publish directly
+                # parse the converted_function_output to determine the next and publish
+                # the messages are collected and sent together after the loop
+                self._start_message_batches()
                 for function_output in converted_function_output:
-                    next_function_execution_id, output = self._publish_output(key, function_output, lqcpub, timestamp_map)
+                    next_function_execution_id, output = self._publish_output(key, function_output, lqcpub, timestamp_map, can_fuse=self._can_fuse)
                     if self._should_checkpoint:
                         if next_function_execution_id is not None and output is not None:
                             # here, output MUST contain "topicNext" and "value"; otherwise,
@@ -675,6 +834,7 @@ class PublicationUtils():
                             input_backup_map["input_" + next_function_instance_id] = output["value"]
                             self._next_backup_list.append(next_function_instance_id)
                             any_next = True
+                self._flush_message_batches(lqcpub, timestamp_map)
 
                 if self._should_checkpoint:
                     timestamp_map["t_start_backtrigger"] = time.time() * 1000.0
@@ -694,13 +854,35 @@ class PublicationUtils():
         # log the timestamps
         timestamp_map["t_pub_end"] = timestamp_map["t_end_pub"] = timestamp_map["t_end_fork"] = time.time() * 1000.0
         timestamp_map["function_instance_id"] = current_function_instance_id
-        timestamp_map_str = json.dumps(timestamp_map)
+        # connection setups during this execution (0 when re-using the clients of a warm pool instance)
+        timestamp_map["num_queue_connects"] = LocalQueueClient.num_connects
+        timestamp_map["num_datalayer_connects"] = DataLayerClient.num_connects
+        # log records that the asynchronous logging of this process has dropped so far (e.g., over the executions of a warm pool instance)
+        timestamp_map["num_log_records_dropped"] = AsyncLogHandler.get_num_dropped_all()
+        pool_stats = DataLayerClientPool.get_stats()
+        timestamp_map["datalayer_pool_hits"] = pool_stats["hits"]
+        timestamp_map["datalayer_pool_misses"] = pool_stats["misses"]
+        if DataLayerClient.collect_stats:
+            # the data layer requests of this execution so far, per request type and table
+            datalayer_stats = DataLayerClient.get_stats()
+            timestamp_map["datalayer_requests"] = datalayer_stats
+            timestamp_map["t_datalayer"] = sum([entry["ms"] for entry in datalayer_stats.values()])
+        timestamp_map_str = json_codec.dumps(timestamp_map)
         self._logger.info("[__mfn_progress] %s %s", timestamp_map["function_instance_id"], timestamp_map_str)
         size = 0
         if 'exitsize' in timestamp_map and 't_pub_exittopic' in timestamp_map:
             size = timestamp_map['exitsize']
         self._logger.debug("[__mfn_tracing] [ExecutionId] [%s] [Size] [%s] [TimestampMap] [%s] [%s]", key, str(size), timestamp_map_str, timestamp_map["function_instance_id"])
 
+        # replicate the remaining write-behind data before this function instance exits
+        # or the next function of a fused chain reads it
+        if not self._reuse_clients:
+            self._sapi._shutdown_write_behind()
+        elif self._fused_trigger is not None:
+            self._sapi._flush_write_behind(is_publishing=False)
+
         # shut down the local queue client
-        self._shutdown_local_queue_client()
-        self._shutdown_backup_data_layer_client()
+        # unless we are in a warm pool instance, which keeps them for its next execution,
+        # or the next function of a fused chain is going to use them
+        if not self._reuse_clients and self._fused_trigger is None:
+            self.shutdown_clients()
@@ -21,7 +21,7 @@ import random
 
 import json
 
-from DataLayerClient import DataLayerClient
+from DataLayerClientPool import DataLayerClientPool
 from SessionHelperThread import SessionHelperThread
 
 class SessionUtils:
@@ -80,7 +80,7 @@ class SessionUtils:
 
         self._setup_metadata_tablenames()
 
-        self._global_data_layer_client = DataLayerClient(locality=1, sid=self._sandboxid, for_mfn=True, connect=self._datalayer)
+        self._global_data_layer_client = DataLayerClientPool.acquire(locality=1, sid=self._sandboxid, for_mfn=True, connect=self._datalayer)
 
 
     ###########################
@@ -399,7 +399,8 @@ class SessionUtils:
     def cleanup(self):
         self._remove_metadata()
 
-        self._global_data_layer_client.shutdown()
+        DataLayerClientPool.release(self._global_data_layer_client)
+        self._global_data_layer_client = None
 
     # only to be called from the function worker when it is a session function
     def setup_session_function(self, session_function_parameters):
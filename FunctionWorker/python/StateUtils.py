@@ -13,9 +13,10 @@
 #   limitations under the License.
 
 import ast
-import copy
+import asyncio
 from datetime import datetime
 import json
+import re
 import socket
 import time
 import threading
@@ -28,9 +29,11 @@ from thriftpy2.server import TSimpleServer
 from thriftpy2.thrift import TProcessor
 from ujsonpath import parse, tokenize
 
+import json_codec
 import py3utils
 
-from DataLayerClient import DataLayerClient
+from DataLayerClient import BRANCH_OUTPUTS_MAP_PREFIX
+from DataLayerClientPool import DataLayerClientPool
 
 class StateUtils:
 
@@ -46,6 +49,9 @@ class StateUtils:
 
     mapFunctionOutput = {}
 
+    # JSONPath expressions that only select nested fields (e.g., '$' or '$.field.sub')
+    simplePathPattern = re.compile(r"^\$(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
     def __init__(self, worker_params, logger=None):
         self.operators = ['And', 'BooleanEquals', 'Not', 'NumericEquals', 'NumericGreaterThan', 'NumericGreaterThanEquals',\
              'NumericLessThan', 'NumericLessThanEquals', 'Or', 'StringEquals', 'StringGreaterThan',\
@@ -68,6 +74,10 @@ class StateUtils:
         self.output_path_dict = {}
         self.parameters_dict = {}
 
+        # JSONPath expressions of this state, compiled once (see compile_path())
+        self.compiled_paths = {}
+        self.result_path_fields = {}
+
         if "function_state_type" in worker_params:
             self.functionstatetype = worker_params["function_state_type"]
         else:
@@ -106,7 +116,6 @@ class StateUtils:
         self._logger = logger
         self.parse_function_state_info()
         self.function_output_batch_list = []
-        self.tobeProcessedlater = []
         self.outputMapStatebatch = []
         self.mapPartialResult = {}
 
@@ -261,6 +270,13 @@ class StateUtils:
             func = exec_arguments["function"]
             args = exec_arguments["function_input"]
             function_output = func(args, sapi)
+            if asyncio.iscoroutine(function_output):
+                # the handler is an 'async def'
+                loop = asyncio.new_event_loop()
+                try:
+                    function_output = loop.run_until_complete(function_output)
+                finally:
+                    loop.close()
 
         elif runtime == "java":
             # open the API server for this request
@@ -421,105 +437,86 @@ class StateUtils:
 
         counter_name_topic = self.functionstatename + "-" + self.sandboxid
 
-        total_branch_count = len(function_input) # all branches executed concurrently
+        total_branch_count = len(function_input)
+
+        # with MaxConcurrency, only a window of branches runs at a time;
+        # each finishing branch starts the pending item that follows it in its slot of the window (see _finishBranch())
+        window_size = total_branch_count
+        if 0 < maxConcurrency < total_branch_count:
+            window_size = maxConcurrency
 
         klist = [total_branch_count]
 
         self.parsedfunctionstateinfo["BranchCount"] = int(total_branch_count) # overwrite parsed BranchCount with new value
         self._logger.debug("[StateUtils] evaluateMapState, total_branch_count: " + str(total_branch_count))
 
-        # prepare counter metadata
-        counter_metadata = {}
-        counter_metadata["__state_action"] = "post_map_processing"
-        counter_metadata["__async_execution"] = metadata["__async_execution"]
         workflow_instance_metadata_storage_key = name_prefix + "_workflow_metadata"
-        counter_metadata["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
-        counter_metadata["CounterValue"] = 0 # this should be updated by riak hook
-        counter_metadata["Klist"] = klist
-        counter_metadata["TotalBranches"] = total_branch_count
-        counter_metadata["ExecutionId"] = key
-        counter_metadata["FunctionTopic"] = self.functiontopic
-        counter_metadata["Endpoint"] = self._internal_endpoint
-
-        iterator = self.parsedfunctionstateinfo["Iterator"]
-
-        counter_name_trigger_metadata = {"k-list": klist, "total-branches": total_branch_count}
 
-        # dynamic values used for generation of branches
-        counter_name_key = key
-        branch_out_keys = []
-        for i in range(total_branch_count):
-            branch_out_key = key + "-branch-" + str(i+1)
-            branch_out_keys.append(branch_out_key)
-
-        # prepare counter name value metadata
-        counter_name_value_metadata = copy.deepcopy(metadata)
-        counter_name_value_metadata["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
-        counter_name_value_metadata["CounterValue"] = 0 # this should be updated by riak hook
-        counter_name_value_metadata["__state_action"] = "post_map_processing"
-        counter_name_value_metadata["state_counter"] = metadata["state_counter"]
         self._logger.debug("[StateUtils] evaluateMapState, metadata[state_counter]: " + str(metadata["state_counter"]))
         self.mapStateCounter = int(metadata["state_counter"])
 
-        counter_name_value = {"__mfnmetadata": counter_name_value_metadata, "__mfnuserdata": '{}'}
-
-        #CounterName = json.dumps([str(counter_name_topic), str(counter_name_key), counter_name_trigger_metadata, counter_name_value])
+        counter_name_key = key
         CounterName = str(counter_name_topic) + "-" + str(total_branch_count) + "-" + str(counter_name_key)
 
         # prepare mapInfo metadata
-        workflow_instance_outputkeys_set_key = key +"_"+ self.functionstatename + "_outputkeys_set"
+        # mapInfo is carried by every branch, so its size must not depend on the number of branches:
+        # the branch outputs are stored in a map keyed by the branch index
         mapInfo = {}
-        mapInfo["CounterTopicName"] = counter_name_topic
-        mapInfo["CounterNameKey"] = counter_name_key
-        mapInfo["TriggerMetadata"] = counter_name_trigger_metadata
-        mapInfo["CounterNameValueMetadata"] = counter_name_value_metadata
-        mapInfo["BranchOutputKeys"] = branch_out_keys
+        mapInfo["StateName"] = self.functionstatename
+        mapInfo["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
         mapInfo["CounterName"] = CounterName
-        mapInfo["MaxConcurrency"] = maxConcurrency
-        mapInfo["BranchOutputKeysSetKey"] = workflow_instance_outputkeys_set_key
+        mapInfo["DoneCounterName"] = CounterName + "_done"
+        mapInfo["BranchOutputsMapName"] = BRANCH_OUTPUTS_MAP_PREFIX + name_prefix
         mapInfo["Klist"] = klist
+        mapInfo["TotalBranches"] = total_branch_count
+        mapInfo["StartAt"] = str(self.parsedfunctionstateinfo["Iterator"]["StartAt"])
+        mapInfo["FunctionExecutionId"] = metadata["__function_execution_id"]
+        if window_size < total_branch_count:
+            # the pending items are stored by their index;
+            # the branch with index i starts the item with index i + WindowSize
+            mapInfo["PendingItemKeyPrefix"] = name_prefix + "_mapStateItem_"
+            mapInfo["WindowSize"] = window_size
 
         mapInfo_key = self.functionstatename + "_" + key  + "_map_info"
 
         metadata[mapInfo_key] = mapInfo
 
-        # create counter for Map equivalent Parallel state
+        # create the branch outputs map for Map equivalent Parallel state
         assert py3utils.is_string(CounterName)
-        counterName = str(mapInfo["CounterName"])
-        counter_metadata_key_name = counterName + "_metadata"
 
         try:
-            dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
-
-            # create a triggerable counter to start the post-parallel when parallel state finishes
-            dlc.createCounter(CounterName, 0, tableName=dlc.countertriggerstable)
+            dlc = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
 
-            dlc.put(counter_metadata_key_name, json.dumps(counter_metadata), tableName=dlc.countertriggersinfotable)
+            # create the map of the branch outputs; each branch adds its own entry.
+            # the counters of the finished branches and of the branches and post-processings that are done
+            # with the branch state start from 0 with their first increment (see _finishBranch() and _releaseBranchState())
+            dlc.createMap(mapInfo["BranchOutputsMapName"])
 
         except Exception as exc:
-            self._logger.error("Exception in creating counter: " + str(exc))
+            self._logger.error("Exception in creating branch outputs map: " + str(exc))
             self._logger.error(exc)
             raise
         finally:
-            dlc.shutdown()
+            DataLayerClientPool.release(dlc)
 
         assert py3utils.is_string(workflow_instance_metadata_storage_key)
         self._logger.debug("[StateUtils] full_metadata_encoded put key: " + str(workflow_instance_metadata_storage_key))
 
-        sapi.put(workflow_instance_metadata_storage_key, json.dumps(metadata))
+        sapi.put(workflow_instance_metadata_storage_key, json_codec.dumps(metadata))
 
-        # Now provide each branch with its own input
+        if window_size < total_branch_count:
+            pending_items = {}
+            for i in range(window_size, total_branch_count):
+                pending_items[mapInfo["PendingItemKeyPrefix"] + str(i)] = json_codec.dumps(function_input[i])
+            sapi.put_many(pending_items)
 
-        branch = self.parsedfunctionstateinfo["Iterator"] # this is just onee set
-        # launch a branch for each input element
-        startat = str(branch["StartAt"])
+        # Now provide each branch with its own input
+        # launch a branch for each input element in the window
+        startat = mapInfo["StartAt"]
 
-        for i in range(len(function_input)):
+        for i in range(window_size):
             sapi.add_dynamic_next(startat, function_input[i]) # Alias for add_workflow_next(self, next, value)
 
-            sapi.put(name_prefix + "_" + "mapStateInputValue", str(function_input[i]))
-            sapi.put(name_prefix + "_" + "mapStateInputIndex", str(i))
-
             self._logger.debug("\t Map State StartAt:" + startat)
             self._logger.debug("\t Map State input:" + str(function_input[i]))
 
@@ -527,10 +524,8 @@ class StateUtils:
 
     def evaluatePostMap(self, function_input, key, metadata, sapi):
 
-        name_prefix = self.functiontopic + "_" + key
-
-        # function is triggered by post-commit hook with metadata containing information about state results in buckets.
-        # It collects these results and returns metadata and post_map_output_results
+        # function is triggered by the last branch to finish (see _joinBranches()) with the collected branch outputs.
+        # It applies the ResultPath to them and cleans up the branch state
 
         action = metadata["__state_action"]
         assert action == "post_map_processing"
@@ -544,35 +539,17 @@ class StateUtils:
 
         workflow_instance_metadata_storage_key = str(function_input["WorkflowInstanceMetadataStorageKey"])
         assert py3utils.is_string(workflow_instance_metadata_storage_key)
-        full_metadata_encoded = sapi.get(workflow_instance_metadata_storage_key)
+        full_metadata_encoded = sapi.get(workflow_instance_metadata_storage_key, use_cache=False)
         self._logger.debug("[StateUtils] full_metadata_encoded get: " + str(full_metadata_encoded))
 
-        full_metadata = json.loads(full_metadata_encoded)
+        full_metadata = json_codec.loads(full_metadata_encoded)
         full_metadata["state_counter"] = state_counter
 
         mapInfoKey = self.functionstatename + "_" + key  + "_map_info"
         mapInfo = full_metadata[mapInfoKey]
 
-        branchOutputKeysSetKey = str(mapInfo["BranchOutputKeysSetKey"])
-        branchOutputKeysSet = sapi.retrieveSet(branchOutputKeysSetKey)
-        self._logger.debug("\t branchOutputKeysSet: " + str(branchOutputKeysSet))
-
-        if not branchOutputKeysSet:
-            self._logger.error("[StateUtils] branchOutputKeysSet is empty")
-            raise Exception("[StateUtils] branchOutputKeysSet is empty")
-
         klist = mapInfo["Klist"]
 
-        #self._logger.debug("\t action: " + action)
-        #self._logger.debug("\t counterValue:" + str(counterValue))
-        #self._logger.debug("\t WorkflowInstanceMetadataStorageKey:" + metadata["WorkflowInstanceMetadataStorageKey"])
-        #self._logger.debug("\t full_metadata:" + full_metadata_encoded)
-        #self._logger.debug("\t mapInfoKey: " + mapInfoKey)
-        #self._logger.debug("\t mapInfo:" + json.dumps(mapInfo))
-        #self._logger.debug("\t branchOutputKeysSetKey:" + branchOutputKeysSetKey)
-        #self._logger.debug("\t branchOutputKeysSet:" + str(branchOutputKeysSet))
-        #self._logger.debug("\t klist:" + str(klist))
-
         NumBranchesFinished = abs(counterValue)
         self._logger.debug("\t NumBranchesFinished:" + str(NumBranchesFinished))
 
@@ -583,75 +560,15 @@ class StateUtils:
 
         self._logger.debug("\t do_cleanup:" + str(do_cleanup))
 
-        counterName = str(mapInfo["CounterName"])
-        counter_metadata_key_name = counterName + "_metadata"
-        assert py3utils.is_string(counterName)
-
-        if do_cleanup:
-            assert py3utils.is_string(counterName)
-            try:
-                dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
-
-                # done with the triggerable counter
-                dlc.deleteCounter(counterName, tableName=dlc.countertriggerstable)
-
-                dlc.delete(counter_metadata_key_name, tableName=dlc.countertriggersinfotable)
-
-            except Exception as exc:
-                self._logger.error("Exception deleting counter: " + str(exc))
-                self._logger.error(exc)
-                raise
-            finally:
-                dlc.shutdown()
-
-        post_map_output_values = []
-
-        self._logger.debug("\t mapInfo_BranchOutputKeys:" + str(mapInfo["BranchOutputKeys"]))
-
-        self._logger.debug("\t mapInfo_BranchOutputKeys length: " + str(len(mapInfo["BranchOutputKeys"])))
-
-        for outputkey in mapInfo["BranchOutputKeys"]:
-            outputkey = str(outputkey)
-            if outputkey in branchOutputKeysSet: # mapInfo["BranchOutputKeys"]:
-                self._logger.debug("\t BranchOutputKey:" + outputkey)
-                while sapi.get(outputkey) == "":
-                    time.sleep(0.1) # wait until value is available
-
-                branchOutput = sapi.get(outputkey)
-                branchOutput_decoded = json.loads(branchOutput)
-                self._logger.debug("\t branchOutput(type):" + str(type(branchOutput)))
-                self._logger.debug("\t branchOutput:" + branchOutput)
-                self._logger.debug("\t branchOutput_decoded(type):" + str(type(branchOutput_decoded)))
-                self._logger.debug("\t branchOutput_decoded:" + str(branchOutput_decoded))
-                post_map_output_values = post_map_output_values + [branchOutput_decoded]
-                if do_cleanup:
-                    sapi.delete(outputkey) # cleanup the key from data layer
-                    self._logger.debug("\t cleaned output key:" + outputkey)
-            else:
-                post_map_output_values = post_map_output_values + [None]
-                self._logger.debug("\t this_BranchOutputKeys is not contained: " + str(outputkey))
-
+        post_map_output_values = function_input["BranchOutputs"]
         self._logger.debug("\t post_map_output_values:" + str(post_map_output_values))
-        while (sapi.get(name_prefix + "_" + "mapStatePartialResult")) == "":
-            time.sleep(0.1) # wait until value is available
-
-        mapStatePartialResult = ast.literal_eval(sapi.get(name_prefix + "_" + "mapStatePartialResult"))
 
-        mapStatePartialResult += post_map_output_values
-        sapi.put(name_prefix + "_" + "mapStatePartialResult", str(mapStatePartialResult))
+        # done with the stored metadata
+        self._releaseBranchState(mapInfo, sapi)
 
-        # now apply ResultPath and OutputPath
         if do_cleanup:
-
-            sapi.deleteSet(branchOutputKeysSetKey)
-
-        while sapi.get(name_prefix + "_" + "mapStatePartialResult") != str(mapStatePartialResult):
-            time.sleep(0.1)
-
-        if ast.literal_eval(sapi.get(name_prefix + "_" + "mapInputCount")) == len(mapStatePartialResult):
-
             # we are ready to publish  but need to honour ResultPath and OutputPath
-            res_raw = ast.literal_eval(sapi.get(name_prefix + "_" +"mapStatePartialResult"))
+            res_raw = post_map_output_values
 
             # remove unwanted keys from input before publishing
             function_input = {}
@@ -665,11 +582,6 @@ class StateUtils:
             if "End" in self.parsedfunctionstateinfo:
                 if self.parsedfunctionstateinfo["End"]:
                     sapi.add_dynamic_next("end", function_input_post_output)
-            sapi.delete(name_prefix + "_" + "mapInputCount")
-            sapi.delete(name_prefix + "_" + "mapStateInputIndex")
-            sapi.delete(name_prefix + "_" + "mapStateInputValue")
-            sapi.delete(name_prefix + "_" + "mapStatePartialResult")
-            sapi.delete(name_prefix + "_" + "tobeProcessedlater")
             post_map_output_values = function_input_post_output
         return post_map_output_values, full_metadata
 
@@ -696,49 +608,22 @@ class StateUtils:
             klist.append(total_branch_count)
 
         counter_name_topic = self.functionstatename + "-" + self.sandboxid
-        counter_name_trigger_metadata = {"k-list": klist, "total-branches": total_branch_count}
         counter_name_key = key
 
-        # dynamic values
-        branch_out_keys = []
-        for i in range(total_branch_count):
-            branch_out_key = name_prefix + "_branch_" + str(i+1)
-            branch_out_keys.append(branch_out_key)
-
-        # prepare counter metadata
-        counter_metadata = {}
-        counter_metadata["__state_action"] = "post_parallel_processing"
-        counter_metadata["__async_execution"] = metadata["__async_execution"]
         workflow_instance_metadata_storage_key = name_prefix + "_workflow_metadata"
-        counter_metadata["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
-        counter_metadata["CounterValue"] = 0 # this should be updated by riak hook
-        counter_metadata["Klist"] = klist
-        counter_metadata["TotalBranches"] = total_branch_count
-        counter_metadata["ExecutionId"] = key
-        counter_metadata["FunctionTopic"] = self.functiontopic
-        counter_metadata["Endpoint"] = self._internal_endpoint
-
-        # prepare counter name value metadata
-        counter_name_value_metadata = copy.deepcopy(metadata)
-        counter_name_value_metadata["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
-        counter_name_value_metadata["CounterValue"] = 0 # this should be updated by riak hook
-        counter_name_value_metadata["__state_action"] = "post_parallel_processing"
-        counter_name_value_metadata["state_counter"] = metadata["state_counter"]
-
-        counter_name_value = {"__mfnmetadata": counter_name_value_metadata, "__mfnuserdata": '{}'}
-
-        #CounterName = json.dumps([str(counter_name_topic), str(counter_name_key), counter_name_trigger_metadata, counter_name_value])
+
         CounterName = str(counter_name_topic) + "-" + str(total_branch_count) + "-" + str(counter_name_key)
 
         #CounterName = name_prefix + "_counter"
-        counter_metadata_key_name = CounterName + "_metadata"
-        workflow_instance_outputkeys_set_key = name_prefix + "_outputkeys_set"
 
         # prepare parallelInfo metadata
         parallelInfo = {}
+        parallelInfo["StateName"] = self.functionstatename
+        parallelInfo["WorkflowInstanceMetadataStorageKey"] = workflow_instance_metadata_storage_key
+        parallelInfo["FunctionExecutionId"] = metadata["__function_execution_id"]
         parallelInfo["CounterName"] = CounterName
-        parallelInfo["BranchOutputKeys"] = branch_out_keys
-        parallelInfo["BranchOutputKeysSetKey"] = workflow_instance_outputkeys_set_key
+        parallelInfo["DoneCounterName"] = CounterName + "_done"
+        parallelInfo["BranchOutputsMapName"] = BRANCH_OUTPUTS_MAP_PREFIX + name_prefix
         parallelInfo["Klist"] = klist
         parallelInfo["TotalBranches"] = total_branch_count
         parallelInfo["ExecutionId"] = key
@@ -750,21 +635,22 @@ class StateUtils:
 
         assert py3utils.is_string(CounterName)
         try:
-            dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            dlc = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
 
-            # create a triggerable counter to start the post-parallel when parallel state finishes
-            dlc.createCounter(CounterName, 0, tableName=dlc.countertriggerstable)
-            dlc.put(counter_metadata_key_name, json.dumps(counter_metadata), tableName=dlc.countertriggersinfotable)
+            # create the map of the branch outputs; each branch adds its own entry.
+            # the counters of the finished branches and of the branches and post-processings that are done
+            # with the branch state start from 0 with their first increment (see _finishBranch() and _releaseBranchState())
+            dlc.createMap(parallelInfo["BranchOutputsMapName"])
 
         except Exception as exc:
-            self._logger.error("Exception in creating counter: " + str(exc))
+            self._logger.error("Exception in creating branch outputs map: " + str(exc))
             self._logger.error(exc)
             raise
         finally:
-            dlc.shutdown()
+            DataLayerClientPool.release(dlc)
 
         assert py3utils.is_string(workflow_instance_metadata_storage_key)
-        sapi.put(workflow_instance_metadata_storage_key, json.dumps(metadata))
+        sapi.put(workflow_instance_metadata_storage_key, json_codec.dumps(metadata))
 
         branches = self.parsedfunctionstateinfo["Branches"]
         for branch in branches:
@@ -777,6 +663,10 @@ class StateUtils:
     def processBranchTerminalState(self, key, value_output, metadata, sapi):
         if 'End' not in self.parsedfunctionstateinfo:
             return
+        # a Map or Parallel state ends its branch only after its own branches have been joined
+        if self.functionstatetype in (StateUtils.mapStateType, StateUtils.parallelStateType):
+            if "__state_action" not in metadata or metadata["__state_action"] not in ("post_map_processing", "post_parallel_processing"):
+                return
         if self.parsedfunctionstateinfo["End"] and "ParentParallelInfo" in self.parsedfunctionstateinfo:
             parentParallelInfo = self.parsedfunctionstateinfo["ParentParallelInfo"]
             parallelName = parentParallelInfo["Name"]
@@ -796,33 +686,7 @@ class StateUtils:
             if parallelInfoKey in metadata:
                 parallelInfo = metadata[parallelInfoKey]
 
-                counterName = str(parallelInfo["CounterName"])
-                branchOutputKeys = parallelInfo["BranchOutputKeys"]
-                branchOutputKey = str(branchOutputKeys[branchCounter-1])
-
-                branchOutputKeysSetKey = str(parallelInfo["BranchOutputKeysSetKey"])
-
-                #self._logger.debug("\t branchOutputKey:" + branchOutputKey)
-                #self._logger.debug("\t branchOutputKeysSetKey:" + branchOutputKeysSetKey)
-
-                assert py3utils.is_string(branchOutputKey)
-                sapi.put(branchOutputKey, value_output)
-
-                assert py3utils.is_string(branchOutputKeysSetKey)
-                sapi.addSetEntry(branchOutputKeysSetKey, branchOutputKey)
-
-                assert py3utils.is_string(counterName)
-                try:
-                    dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
-
-                    # increment the triggerable counter
-                    dlc.incrementCounter(counterName, 1, tableName=dlc.countertriggerstable)
-                except Exception as exc:
-                    self._logger.error("Exception incrementing counter: " + str(exc))
-                    self._logger.error(exc)
-                    raise
-                finally:
-                    dlc.shutdown()
+                self._finishBranch(parallelInfo, branchCounter-1, value_output, "post_parallel_processing", sapi)
 
             else:
                 self._logger.error("[StateUtils] processBranchTerminalState Unable to find ParallelInfo")
@@ -835,12 +699,9 @@ class StateUtils:
             mapName = parentMapInfo["Name"]
             mapInfoKey = mapName + "_" + key + "_map_info"
 
-            branchCounter = parentMapInfo["BranchCounter"]
-
             #self._logger.debug("[StateUtils] processBranchTerminalState: ")
             #self._logger.debug("\t ParentMapInfo:" + json.dumps(parentMapInfo))
             #self._logger.debug("\t mapName:" + mapName)
-            #self._logger.debug("\t branchCounter: " + str(branchCounter))
             #self._logger.debug("\t key:" + key)
             #self._logger.debug("\t metadata:" + json.dumps(metadata))
             #self._logger.debug("\t value_output(type):" + str(type(value_output)))
@@ -856,105 +717,169 @@ class StateUtils:
                         current_index = int(rest[index].split("-M")[0])
 
                 self._logger.debug("[StateUtils] current_index: " + str(current_index))
-                if mapInfo["MaxConcurrency"] != 0:
-                    current_index = current_index % int(mapInfo["MaxConcurrency"])
 
-                counterName = str(mapInfo["CounterName"])
-                branchOutputKeys = mapInfo["BranchOutputKeys"]
-                branchOutputKey = str(branchOutputKeys[current_index])
+                self._finishBranch(mapInfo, current_index, value_output, "post_map_processing", sapi)
 
-                branchOutputKeysSetKey = str(mapInfo["BranchOutputKeysSetKey"])
+            else:
+                self._logger.error("[StateUtils] processBranchTerminalState Unable to find MapInfo")
+                raise Exception("processBranchTerminalState Unable to find MapInfo")
 
-                self._logger.debug("\t branchOutputKey:" + branchOutputKey)
-                self._logger.debug("\t branchOutputKeysSetKey:" + branchOutputKeysSetKey)
+    def _finishBranch(self, branchInfo, index, value_output, state_action, sapi):
+        # store the branch output under its (0-based) branch index, then count the branch as finished.
+        # the branch that brings the counter to a value in the Klist joins the branches,
+        # so that no function instance has to wait for the other branches.
+        # the counter is kept by the local queue of the sandbox, where all branches of the execution run:
+        # its increments are atomic, so exactly one branch observes each value
+        # (the increments of a data layer counter return the view of a single replica)
+        branchOutputsMapName = str(branchInfo["BranchOutputsMapName"])
+        counterName = str(branchInfo["CounterName"])
 
-                assert py3utils.is_string(branchOutputKey)
-                sapi.put(branchOutputKey, value_output)
+        assert py3utils.is_string(counterName)
+        try:
+            dlc = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
 
-                assert py3utils.is_string(branchOutputKeysSetKey)
-                sapi.addSetEntry(branchOutputKeysSetKey, branchOutputKey)
+            # each branch only adds its own entry, so storing an output does not depend on the number of branches
+            dlc.putMapEntry(branchOutputsMapName, str(index), value_output)
 
-                assert py3utils.is_string(counterName)
-                try:
-                    dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            # this branch frees its slot of the MaxConcurrency window for the next pending item in the slot, if any.
+            # the item is determined by the index, so no two branches can start the same item
+            failed_item = None
+            if "WindowSize" in branchInfo:
+                next_index = index + int(branchInfo["WindowSize"])
+                if next_index < int(branchInfo["TotalBranches"]):
+                    try:
+                        self._startPendingMapItem(branchInfo, next_index, sapi)
+                    except Exception as exc:
+                        # still count this branch as finished; the item is reported below
+                        self._logger.error("[StateUtils] Exception starting the pending Map item " + str(next_index) + ": " + str(exc))
+                        failed_item = (next_index, {"Error": "States.BranchFailed", "Cause": "Unable to start the Map item " + str(next_index) + ": " + str(exc)})
+        except Exception as exc:
+            self._logger.error("Exception storing branch output: " + str(exc))
+            self._logger.error(exc)
+            raise
+        finally:
+            DataLayerClientPool.release(dlc)
+
+        # increment the counter of the finished branches
+        counterValue = sapi._increment_local_counter(counterName)
+        if counterValue is None:
+            self._logger.error("[StateUtils] Unable to count the finished branch: " + str(index))
+            raise Exception("[StateUtils] Unable to count the finished branch: " + str(index))
+
+        if counterValue in branchInfo["Klist"]:
+            self._joinBranches(branchInfo, counterValue, state_action, sapi)
+
+        # also with WaitForNumBranches, the branches that finish after the last join have counted themselves,
+        # so that the counter and the branch outputs map are not removed before (and re-created by) them
+        self._releaseBranchState(branchInfo, sapi)
+
+        # an item that could not be started finishes with the error as its output, so that the Map state
+        # does not wait for it (and the items that would follow it in its slot are started)
+        if failed_item is not None:
+            self._finishBranch(branchInfo, failed_item[0], json_codec.dumps(failed_item[1]), state_action, sapi)
+
+    def _joinBranches(self, branchInfo, counterValue, state_action, sapi):
+        # collect the outputs of the finished branches and start the post-processing of the Map or Parallel state with them.
+        # each branch stores its output before it increments the counter, so all outputs counted so far are available
+        # with a single read of the branch outputs map
+        try:
+            dlc = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            branch_outputs = dlc.retrieveMap(str(branchInfo["BranchOutputsMapName"]))
+        except Exception as exc:
+            self._logger.error("Exception retrieving branch outputs: " + str(exc))
+            self._logger.error(exc)
+            raise
+        finally:
+            DataLayerClientPool.release(dlc)
+
+        # order the outputs by branch index; branches that have not finished yet (e.g., with WaitForNumBranches) have no output
+        branch_output_values = []
+        for i in range(int(branchInfo["TotalBranches"])):
+            branchOutput = branch_outputs.get(str(i))
+            if branchOutput is None:
+                branch_output_values.append(None)
+            else:
+                branch_output_values.append(json_codec.loads(branchOutput))
+
+        post_input = {}
+        post_input["CounterValue"] = counterValue
+        post_input["WorkflowInstanceMetadataStorageKey"] = branchInfo["WorkflowInstanceMetadataStorageKey"]
+        post_input["BranchOutputs"] = branch_output_values
+
+        # there can be one post-processing per value in the Klist
+        post_execution_id = branchInfo["FunctionExecutionId"] + "_post" + str(counterValue)
+        sapi._add_internal_next(branchInfo["StateName"], post_input, post_execution_id, {"__state_action": state_action})
+
+        self._logger.debug("[StateUtils] Joined branches: " + str(counterValue) + " of " + str(branchInfo["TotalBranches"]))
+
+    def _releaseBranchState(self, branchInfo, sapi):
+        # called once by every branch after it has been counted (and has joined the branches, if it was its turn)
+        # and once by every post-processing after it has read the stored metadata.
+        # the last one removes the branch state of the Map or Parallel state;
+        # removing it earlier would let a later branch re-create the counter and the branch outputs map.
+        # like the counter of the finished branches, this counter is atomic (see _finishBranch()),
+        # so exactly one caller observes the last value
+        doneCounterName = str(branchInfo["DoneCounterName"])
+        num_done_expected = int(branchInfo["TotalBranches"]) + len(branchInfo["Klist"])
+        doneValue = sapi._increment_local_counter(doneCounterName)
+        if doneValue is None:
+            self._logger.error("[StateUtils] Unable to release the branch state: " + str(branchInfo["StateName"]))
+            raise Exception("[StateUtils] Unable to release the branch state: " + str(branchInfo["StateName"]))
+
+        if doneValue != num_done_expected:
+            return
 
-                    # increment the triggerable counter
-                    dlc.incrementCounter(counterName, 1, tableName=dlc.countertriggerstable)
-                except Exception as exc:
-                    self._logger.error("Exception incrementing counter: " + str(exc))
-                    self._logger.error(exc)
-                    raise
-                finally:
-                    dlc.shutdown()
+        sapi._delete_local_counters([str(branchInfo["CounterName"]), doneCounterName])
+        try:
+            dlc = DataLayerClientPool.acquire(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            dlc.deleteMap(str(branchInfo["BranchOutputsMapName"]))
+        except Exception as exc:
+            self._logger.error("Exception releasing the branch state: " + str(exc))
+            self._logger.error(exc)
+            raise
+        finally:
+            DataLayerClientPool.release(dlc)
 
-            else:
-                self._logger.error("[StateUtils] processBranchTerminalState Unable to find MapInfo")
-                raise Exception("processBranchTerminalState Unable to find MapInfo")
+        sapi.delete(str(branchInfo["WorkflowInstanceMetadataStorageKey"]))
+        self._logger.debug("[StateUtils] Removed the branch state: " + str(branchInfo["StateName"]))
+
+    def _startPendingMapItem(self, mapInfo, index, sapi):
+        # start the branch of the pending item with the given index;
+        # it gets the same execution id as if the Map state had started it (see PublicationUtils._generate_trigger_metadata)
+        pending_item_key = str(mapInfo["PendingItemKeyPrefix"]) + str(index)
+        pending_item = sapi.get(pending_item_key, use_cache=False)
+        if pending_item == "":
+            self._logger.error("[StateUtils] Unable to find the pending Map item: " + pending_item_key)
+            raise Exception("[StateUtils] Unable to find the pending Map item: " + pending_item_key)
+
+        branch_execution_id = mapInfo["FunctionExecutionId"] + "_" + str(index) + "-M"
+        sapi._add_internal_next(mapInfo["StartAt"], json_codec.loads(pending_item), branch_execution_id)
+
+        # the item has been started; failing to remove its input must not report it as failed
+        try:
+            sapi.delete(pending_item_key)
+        except Exception as exc:
+            self._logger.error("[StateUtils] Unable to remove the pending Map item: " + pending_item_key + ": " + str(exc))
+
+        self._logger.debug("[StateUtils] Started pending Map item: " + str(index))
 
     def evaluatePostParallel(self, function_input, key, metadata, sapi):
         action = metadata["__state_action"]
         assert action == "post_parallel_processing"
-        counterValue = function_input["CounterValue"]
 
         workflow_instance_metadata_storage_key = str(function_input["WorkflowInstanceMetadataStorageKey"])
         assert py3utils.is_string(workflow_instance_metadata_storage_key)
-        full_metadata_encoded = sapi.get(workflow_instance_metadata_storage_key)
+        full_metadata_encoded = sapi.get(workflow_instance_metadata_storage_key, use_cache=False)
 
-        full_metadata = json.loads(full_metadata_encoded)
+        full_metadata = json_codec.loads(full_metadata_encoded)
 
         parallelInfoKey = self.functionstatename + "_" + key +  "_parallel_info"
         parallelInfo = full_metadata[parallelInfoKey]
 
-        branchOutputKeysSetKey = str(parallelInfo["BranchOutputKeysSetKey"])
-        branchOutputKeysSet = sapi.retrieveSet(branchOutputKeysSetKey)
-        if not branchOutputKeysSet:
-            self._logger.error("[StateUtils] branchOutputKeysSet is empty")
-            raise Exception("[StateUtils] branchOutputKeysSet is empty")
+        post_parallel_output_values = function_input["BranchOutputs"]
 
-        klist = parallelInfo["Klist"]
-        NumBranchesFinished = abs(counterValue)
-        do_cleanup = False
-        if klist[-1] == NumBranchesFinished:
-            do_cleanup = True
-
-        counterName = str(parallelInfo["CounterName"])
-        assert py3utils.is_string(counterName)
-        counter_metadata_key_name = counterName + "_metadata"
-
-        if do_cleanup:
-            assert py3utils.is_string(counterName)
-            try:
-                dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
-
-                # done with the triggerable counter
-                dlc.deleteCounter(counterName, tableName=dlc.countertriggerstable)
-
-                dlc.delete(counter_metadata_key_name, tableName=dlc.countertriggersinfotable)
-            except Exception as exc:
-                self._logger.error("Exception deleting counter: " + str(exc))
-                self._logger.error(exc)
-                raise
-            finally:
-                dlc.shutdown()
-            sapi.delete(workflow_instance_metadata_storage_key)
-
-        post_parallel_output_values = []
-        for outputkey in parallelInfo["BranchOutputKeys"]:
-            outputkey = str(outputkey)
-            if outputkey in branchOutputKeysSet:
-                while sapi.get(outputkey) == "":
-                    time.sleep(0.1) # wait until value is available
-
-                branchOutput = sapi.get(outputkey)
-                branchOutput_decoded = json.loads(branchOutput)
-                post_parallel_output_values = post_parallel_output_values + [branchOutput_decoded]
-                if do_cleanup:
-                    sapi.delete(outputkey) # cleanup the key from data layer
-            else:
-                post_parallel_output_values = post_parallel_output_values + [None]
-
-        if do_cleanup:
-            sapi.deleteSet(branchOutputKeysSetKey)
+        # done with the stored metadata
+        self._releaseBranchState(parallelInfo, sapi)
 
         if "Next" in self.parsedfunctionstateinfo:
             sapi.add_dynamic_next(self.parsedfunctionstateinfo["Next"], post_parallel_output_values)
@@ -987,7 +912,7 @@ class StateUtils:
             elif "SecondsPath" in list(json.loads(self.functionstateinfo).keys()):
                 wait_state_secondspath = json.loads(self.functionstateinfo)['SecondsPath']
                 #self._logger.debug("[StateUtils] Wait state secondspath:" + str(wait_state_secondspath))
-                wait_state_secondspath_data = [match.value for match in parse(wait_state_secondspath).find(function_input)]
+                wait_state_secondspath_data = self.find_path(wait_state_secondspath, function_input)
                 if wait_state_secondspath_data == []:
                     #self._logger.exception("[StateUtils] Wait state timestamppath does not match: " + str(wait_state_secondspath))
                     raise Exception("Wait state timestamppath does not match")
@@ -1016,7 +941,7 @@ class StateUtils:
                 wait_state_timestamppath = json.loads(self.functionstateinfo)['TimestampPath']
                 self._logger.debug("[StateUtils] Wait state timestamppath:" + str(wait_state_timestamppath))
                 # need to communicate with datalayer for definition of trigger for hibernating/resuming task
-                wait_state_timestamppath_data = [match.value for match in parse(wait_state_timestamppath).find(function_input)]
+                wait_state_timestamppath_data = self.find_path(wait_state_timestamppath, function_input)
                 if wait_state_timestamppath_data == []:
                     #self._logger.exception("[StateUtils] Wait state timestamp_path does not match: " + str(wait_state_timestamppath))
                     raise Exception("Wait state timestamp_path does not match")
@@ -1080,54 +1005,18 @@ class StateUtils:
                     function_output, metadata = self.evaluatePostParallel(function_input, key, metadata, sapi)
 
         elif self.functionstatetype == StateUtils.mapStateType:
-            name_prefix = self.functiontopic + "_" + key
-
-
             self._logger.debug("[StateUtils] Map state handling function_input: " + str(function_input))
             self._logger.debug("[StateUtils] Map state handling metadata: " + str(metadata))
-
-            if "MaxConcurrency" in self.parsedfunctionstateinfo.keys():
-                maxConcurrency = int(self.parsedfunctionstateinfo["MaxConcurrency"])
-            else:
-                maxConcurrency = 0
-
-            self._logger.debug("[StateUtils] Map state maxConcurrency: " + str(maxConcurrency))
             self._logger.debug("[StateUtils] Map state handling")
 
             if "__state_action" not in metadata or metadata["__state_action"] != "post_map_processing":
-                # here we start the iteration process on a first batch
-                if maxConcurrency != 0:
-                    tobeProcessednow = function_input[:maxConcurrency] # take the first maxConcurrency elements
-                    tobeProcessedlater = function_input[maxConcurrency:] # keep the remaining  elements for later
-                else:
-                    tobeProcessednow = function_input
-                    tobeProcessedlater = []
-                self._logger.debug("[StateUtils] Map state function_input split:" + str(tobeProcessednow) + " " + str(tobeProcessedlater))
-                sapi.put(name_prefix + "_" + "tobeProcessedlater", str(tobeProcessedlater)) # store elements to be processed on DL
-                sapi.put(name_prefix + "_" + "mapStatePartialResult", "[]") # initialise the collector variable
-                sapi.put(name_prefix + "_" + "mapInputCount", str(len(function_input)))
-                #if "__client_origin_frontend" in metadata and metadata["__client_origin_frontend"] != "":
-                #    sapi.put(name_prefix + "_" + "mapInputOriginFE", str(metadata["__client_origin_frontend"]))
-
-                function_output, metadata = self.evaluateMapState(tobeProcessednow, key, metadata, sapi)
+                # start the branches; with MaxConcurrency, the remaining items are started as branches finish
+                function_output, metadata = self.evaluateMapState(function_input, key, metadata, sapi)
 
             elif metadata["__state_action"] == "post_map_processing":
-                tobeProcessedlater = ast.literal_eval(sapi.get(name_prefix + "_" + "tobeProcessedlater")) # get all elements that have not yet been processed
-                self._logger.debug("[StateUtils] Map state post_map processing input:" + str(tobeProcessedlater))
-                # we need to decide at this point if there is a need for more batches. if so:
-
-                if len(tobeProcessedlater) > 0: # we need to start another batch
-                    function_output, metadata = self.evaluatePostMap(function_input, key, metadata, sapi) # take care not to overwrite metadata
-                    metadata["__client_origin_frontend"] =  self._internal_endpoint
-                    time.sleep(5.0) # allow cleanup of previous execution before launching new
-                    #metadata["__client_origin_frontend"] = sapi.get(name_prefix + "_" + "mapInputOriginFE")
-                    self._logger.debug("[StateUtils] Map state metadata between calls: " + str(metadata))
-                    function_output, metadata = self.evaluateMapState(tobeProcessedlater[:maxConcurrency], key, metadata, sapi) # start a new batch
-                    sapi.put(name_prefix + "_" + "tobeProcessedlater", str(tobeProcessedlater[maxConcurrency:])) # store remaining elements to be processed on DL
-
-                else:# no more batches required. we are at the iteration end, publish the final result
-                    self._logger.debug("[StateUtils] Map state input final stage: " + str(function_input))
-                    function_output, metadata = self.evaluatePostMap(function_input, key, metadata, sapi)
+                # all branches have finished. publish the final result
+                self._logger.debug("[StateUtils] Map state input final stage: " + str(function_input))
+                function_output, metadata = self.evaluatePostMap(function_input, key, metadata, sapi)
 
             else:
                 raise Exception("Unknow action type in map state")
@@ -1372,6 +1261,63 @@ class StateUtils:
                 self.parameters_dict['Parameters'] = statedef['Parameters']
                 self._logger.debug("found Parameters: " + json.dumps(self.parameters_dict['Parameters']))
 
+        self.precompile_paths(statedef)
+
+    def precompile_paths(self, statedef):
+        # compile the JSONPath expressions of the state once, so that processing a message does not parse them
+        for path_dict in [self.input_path_dict, self.items_path_dict, self.output_path_dict]:
+            for path in path_dict.values():
+                if py3utils.is_string(path):
+                    self.compile_path(path)
+
+        if py3utils.is_string(self.result_path_dict.get('ResultPath')):
+            self.get_result_path_fields(self.result_path_dict['ResultPath'])
+
+        for path_field in ["SecondsPath", "TimestampPath"]:
+            if py3utils.is_string(statedef.get(path_field)):
+                self.compile_path(statedef[path_field])
+
+        parameters = self.parameters_dict.get('Parameters')
+        if isinstance(parameters, dict):
+            for value in parameters.values():
+                if isinstance(value, dict):
+                    for k in value:
+                        if k.split(".")[-1] == "$" and py3utils.is_string(value[k]):
+                            self.compile_path(value[k])
+
+    def compile_path(self, path):
+        # simple paths are kept as the tuple of their field names and resolved without the JSONPath library
+        compiled = self.compiled_paths.get(path)
+        if compiled is None:
+            if StateUtils.simplePathPattern.match(path):
+                compiled = tuple(path.split(".")[1:])
+            else:
+                compiled = parse(path)
+            self.compiled_paths[path] = compiled
+        return compiled
+
+    def find_path(self, path, state_data):
+        # return the values matching the JSONPath expression in the state data
+        compiled = self.compile_path(path)
+        if isinstance(compiled, tuple):
+            value = state_data
+            for field in compiled:
+                if not isinstance(value, dict) or field not in value:
+                    return []
+                value = value[field]
+            return [value]
+        return [match.value for match in compiled.find(state_data)]
+
+    def get_result_path_fields(self, result_path):
+        fields = self.result_path_fields.get(result_path)
+        if fields is None:
+            compiled = self.compile_path(result_path)
+            if isinstance(compiled, tuple):
+                fields = list(compiled)
+            else:
+                fields = list(tokenize(result_path))[1:]
+            self.result_path_fields[result_path] = fields
+        return fields
 
     def EvaluateNode(self, node):
         """
@@ -1468,7 +1414,7 @@ class StateUtils:
                             ret_value[key][k] = parameters[key][k]
                         else:
                             new_key = k.split(".$")[0] # use the json paths in paramters to match
-                            ret_value[key][new_key] = [match.value for match in parse(parameters[key][k]).find(state_data)][0]
+                            ret_value[key][new_key] = self.find_path(parameters[key][k], state_data)[0]
                     return ret_value
 
                 if isinstance(parameters[key], str): # parameters key refers to string value
@@ -1544,12 +1490,11 @@ class StateUtils:
             ret_value = []
         else: # it contains a filter, get it and return selected list in input
             self._logger.debug("seeing items_path filter: " + str(input_path) + " " + str(state_data))
-            filtered_state_data = [match.value for match in parse(input_path).find(state_data)]
+            filtered_state_data = self.find_path(input_path, state_data)
             if not filtered_state_data:
                 raise Exception("Items Path processing exception: no match with map state item, invalid path!")
             else:
-                filtered_state_data = [match.value for match in parse(input_path).find(state_data)][0]
-                ret_value = filtered_state_data
+                ret_value = filtered_state_data[0]
         return ret_value
 
     def process_input_path(self, path_fields, state_data):
@@ -1566,13 +1511,12 @@ class StateUtils:
             ret_value = {}
         else: # input_path contains a filter, get and apply it
             self._logger.debug("seeing input_path filter: " + str(input_path) + " " + str(state_data))
-            filtered_state_data = [match.value for match in parse(input_path).find(state_data)]
+            filtered_state_data = self.find_path(input_path, state_data)
             self._logger.debug("after seeing input_path filter: " + str(filtered_state_data))
             if not filtered_state_data:
                 raise Exception("Input Path processing exception: no match with state input item, invalid path!")
             else:
-                filtered_state_data = [match.value for match in parse(input_path).find(state_data)][0]
-                ret_value = filtered_state_data
+                ret_value = filtered_state_data[0]
 
         return ret_value
 
@@ -1597,8 +1541,8 @@ class StateUtils:
             ret_value = {}
         else: # result_path is not empty so is there a match?
             self._logger.debug("inside ResultPath processing: " + str(result_path) + " " + str(task_output))
-            keys = list(tokenize(result_path)) # get all keys
-            filtered_state_data = self.nested_dict(keys[1:], task_output)
+            keys = self.get_result_path_fields(result_path) # get all keys
+            filtered_state_data = self.nested_dict(keys, task_output)
             if isinstance(state_data, dict):
                 ret_value = dict(list(filtered_state_data.items()) + list(state_data.items())) # adding key and values to new dict
             else:
@@ -1618,13 +1562,11 @@ class StateUtils:
         elif output_path is None:
             ret_value = {}
         else: # output_path is not empty so is there a match?
-            filtered_state_data = [match.value for match in parse(output_path).find(raw_state_input_midway)]
+            filtered_state_data = self.find_path(output_path, raw_state_input_midway)
             if not filtered_state_data:
                 raise Exception("Exception: no match with state input item, invalid path!")
             else:
-                key = str(parse(output_path).nodes[-1].value[0])
-                filtered_state_data = raw_state_input_midway[key]
-                ret_value = filtered_state_data
+                ret_value = filtered_state_data[0]
 
         return ret_value
 
@@ -1697,9 +1639,7 @@ class StateUtils:
                     elif "." in test: # need to process the json path of this variable name
 
                         test2 = "$." + test.lstrip('(').rstrip(')').split("==")[0] # rebuild the json path for the variable
-                        jsonpath_expr = parse(test2)
-
-                        choice_state_path_data = [match.value for match in jsonpath_expr.find(function_input)]
+                        choice_state_path_data = self.find_path(test2, function_input)
                         new_test = str(choice_state_path_data[0])
 
                     else:
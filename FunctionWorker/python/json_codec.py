@@ -0,0 +1,83 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+CODEC_JSON = "json"
+CODEC_UJSON = "ujson"
+CODEC_ORJSON = "orjson"
+
+def _orjson_dumps(obj):
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        # e.g., integers larger than 64 bits
+        return json.dumps(obj)
+
+def _orjson_loads(text):
+    try:
+        return orjson.loads(text)
+    except ValueError:
+        # e.g., NaN and Infinity, which are accepted by the stdlib
+        return json.loads(text)
+
+def _ujson_dumps(obj):
+    try:
+        return ujson.dumps(obj, escape_forward_slashes=False)
+    except (OverflowError, TypeError):
+        # e.g., integers larger than 64 bits
+        return json.dumps(obj)
+
+_codec = CODEC_JSON
+_dumps = json.dumps
+_loads = json.loads
+
+def set_codec(codec):
+    '''
+    Select the JSON backend for the hot path (i.e., envelopes and state input/output).
+    Falls back to the stdlib json module if the requested backend is not installed.
+
+    Returns:
+        the name of the selected backend
+    '''
+    global _codec, _dumps, _loads
+
+    if codec == CODEC_ORJSON and orjson is not None:
+        _codec, _dumps, _loads = CODEC_ORJSON, _orjson_dumps, _orjson_loads
+    elif codec == CODEC_UJSON and ujson is not None:
+        _codec, _dumps, _loads = CODEC_UJSON, _ujson_dumps, ujson.loads
+    else:
+        _codec, _dumps, _loads = CODEC_JSON, json.dumps, json.loads
+
+    return _codec
+
+def get_codec():
+    return _codec
+
+def dumps(obj):
+    return _dumps(obj)
+
+def loads(text):
+    return _loads(text)
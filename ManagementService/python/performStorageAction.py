@@ -16,7 +16,7 @@ import base64
 
 VALID_STORAGE_DATA_TYPES = set(["kv", "map", "set", "counter"])
 VALID_ACTIONS = {}
-VALID_ACTIONS["kv"] = set(["getdata", "deletedata", "putdata", "listkeys"])
+VALID_ACTIONS["kv"] = set(["getdata", "deletedata", "putdata", "listkeys", "scankeys"])
 VALID_ACTIONS["map"] = set(["createmap", "getmapentry", "putmapentry", "deletemapentry", "retrievemap", "containsmapkey", "getmapkeys", "clearmap", "deletemap", "listmaps"])
 VALID_ACTIONS["set"] = set(["createset", "addsetentry", "removesetentry", "containssetitem", "retrieveset", "clearset", "deleteset", "listsets"])
 VALID_ACTIONS["counter"] = set(["createcounter", "getcounter", "incrementcounter", "decrementcounter", "deletecounter", "listcounters"])
@@ -39,6 +39,11 @@ REQUIRED_PARAMETERS["listkeys"] = {}
 REQUIRED_PARAMETERS["listkeys"]["start"] = "int"
 REQUIRED_PARAMETERS["listkeys"]["count"] = "int"
 
+REQUIRED_PARAMETERS["scankeys"] = {}
+REQUIRED_PARAMETERS["scankeys"]["prefix"] = "str"
+REQUIRED_PARAMETERS["scankeys"]["cursor"] = "str"
+REQUIRED_PARAMETERS["scankeys"]["count"] = "int"
+
 # map operations
 REQUIRED_PARAMETERS["createmap"] = {}
 REQUIRED_PARAMETERS["createmap"]["mapname"] = "str"
@@ -196,7 +201,8 @@ def handle(value, sapi):
             "message": "...",    <always included in response>
             "status": True or False  <boolean, always included in reponse>
             "value": "..."  <string, incase of getdata request>
-            "keylist": []  <list, incase of listkeys request>
+            "keylist": []  <list, incase of listkeys or scankeys request>
+            "cursor": "..."  <string, incase of scankeys request; "" when there are no more keys>
         }
     }
     '''
@@ -235,11 +241,13 @@ def handle_storage_action_kv(parameters, dlc):
     '''
     "parameters": <must come as part of user request> (see handle_storage_action_<data_type>)
     {
-        "action": "getdata",  OR  "deletedata",  OR  "putdata",  OR  "listkeys",  <case insensitive>
+        "action": "getdata",  OR  "deletedata",  OR  "putdata",  OR  "listkeys",  OR  "scankeys",  <case insensitive>
         "key": "keyname",               (for getdata, deletedata, and putdata)
         "value": "stringdata",          (for putdata)
         "start": 1,                     (int, for listkeys)
-        "count": 2000,                  (int, for listkeys)
+        "count": 2000,                  (int, for listkeys and scankeys)
+        "prefix": "keyprefix",          (for scankeys; "" for all keys)
+        "cursor": "",                   (for scankeys; "" for the first page, then the returned cursor)
     }
     '''
     storage_action = parameters['action'].lower()
@@ -247,6 +255,8 @@ def handle_storage_action_kv(parameters, dlc):
 
     if storage_action == "listkeys":
         message = storage_action + ", start: " + str(parameters['start']) + ", count: " + str(parameters['count']) + ", table: " + dlc.tablename + ", keyspace: " + dlc.keyspace
+    elif storage_action == "scankeys":
+        message = storage_action + ", prefix: " + parameters['prefix'] + ", cursor: " + parameters['cursor'] + ", count: " + str(parameters['count']) + ", table: " + dlc.tablename + ", keyspace: " + dlc.keyspace
     else:
         message = storage_action + ", key: " + parameters['key'] + ", table: " + dlc.tablename + ", keyspace: " + dlc.keyspace
     print("[StorageAction] " + message)
@@ -269,6 +279,12 @@ def handle_storage_action_kv(parameters, dlc):
         listkeys_response = dlc.listKeys(parameters['start'], parameters['count'])
         response_data['keylist'] = listkeys_response   # should always be a list. Empty list is a valid response
 
+    elif storage_action == 'scankeys':
+        status = True
+        keylist, cursor = dlc.scanKeys(parameters['prefix'], parameters['cursor'], parameters['count'])
+        response_data['keylist'] = keylist
+        response_data['cursor'] = cursor
+
     if not status:
         message = storage_action + " returned False. " + message
 
@@ -528,6 +544,10 @@ def validate_data(data):
             elif parameters["count"] < 0 or parameters["count"] > 1000000:
                 valid = False
                 message = "'count' should be between 0 and 1000000."
+        elif action == "scankeys":
+            if parameters["count"] < 1 or parameters["count"] > 1000000:
+                valid = False
+                message = "'count' should be between 1 and 1000000."
 
     return valid, message
 
@@ -21,7 +21,7 @@ import threading
 
 import process_utils
 import state_utils
-from workflow import Workflow
+from workflow import Workflow, WorkflowStateType
 
 sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
 
@@ -67,6 +67,9 @@ class Deployment:
         # to be declared later when parsing the deployment info
         self._workflow = None
 
+        # function topic -> worker params files of the states that can follow it in a fused chain
+        self._fused_chain_topics = {}
+
         self._global_data_layer_client = DataLayerClient(locality=1, suid=self._storage_userid, connect=self._datalayer)
 
         self._local_queue_client = None
@@ -142,7 +145,8 @@ class Deployment:
                     process = self._functionworker_process_map[state_name]
                     if pid == process.pid:
                         stopped_process_name = "Function worker (" + state_name + ")"
-                        log_filepath = "/opt/mfn/logs/function_" + state_name + ".log"
+                        # replicas of a function worker share the log file
+                        log_filepath = self._child_process_command_args_map[pid]["log_filename"]
                         del self._functionworker_process_map[state_name]
                         break
 
@@ -163,9 +167,7 @@ class Deployment:
 
         workflow_nodes = self._workflow.getWorkflowNodeMap()
         for function_topic in workflow_nodes:
-            ack = self._local_queue_client.addMessage(function_topic, lqcm_shutdown, True)
-            while not ack:
-                ack = self._local_queue_client.addMessage(function_topic, lqcm_shutdown, True)
+            self._update_function_worker(function_topic, lqcm_shutdown)
 
         self._logger.info("Waiting for function workers to shutdown")
         self._wait_for_child_processes()
@@ -235,7 +237,7 @@ class Deployment:
             except Exception as exc:
                 self._logger.error('[SandboxAgent] wait_for_child_processes: %s', str(exc))
 
-    def _start_python_function_worker(self, worker_params, env_var_list):
+    def _start_python_function_worker(self, worker_params, env_var_list, replica_index=0):
         error = None
         function_name = worker_params["function_name"]
         state_name = worker_params["function_state_name"]
@@ -266,6 +268,7 @@ class Deployment:
             cmd = "python "
         cmd = cmd + "/opt/mfn/FunctionWorker/python/FunctionWorker.py"
         cmd = cmd + " " + '\"/opt/mfn/workflow/states/%s/worker_params.json\"' % state_name # state_name can contain whitespace
+        cmd = cmd + " " + str(replica_index)
 
         filename = '/opt/mfn/logs/function_' + state_name + '.log'
         log_handle = open(filename, 'a')
@@ -279,22 +282,40 @@ class Deployment:
         #self._logger.info("Starting function worker: " + state_name + "  with stdout/stderr redirected to: " + filename)
         error, process = process_utils.run_command(cmd, self._logger, custom_env=custom_env, process_log_handle=log_handle)
         if error is None:
-            self._functionworker_process_map[state_name] = process
+            process_name = state_name
+            if replica_index > 0:
+                process_name = state_name + " (replica " + str(replica_index) + ")"
+            self._functionworker_process_map[process_name] = process
             self._child_process_command_args_map[process.pid] = command_args_map
-            self._logger.info("Started function worker: %s, pid: %s, with stdout/stderr redirected to: %s", state_name, str(process.pid), filename)
+            self._logger.info("Started function worker: %s, pid: %s, with stdout/stderr redirected to: %s", process_name, str(process.pid), filename)
+        return error
+
+    def _start_python_function_worker_replicas(self, worker_params, env_var_list):
+        error = None
+        for replica_index in range(worker_params["num_replicas"]):
+            error = self._start_python_function_worker(worker_params, env_var_list, replica_index)
+            if error is not None:
+                break
         return error
 
+    def _get_function_worker_topics(self, function_topic):
+        # with a consumer group, each replica receives its update and stop messages on its own topic
+        num_replicas = self._workflow.get_function_worker_replicas()
+        if num_replicas == 1:
+            return [function_topic]
+        return [function_topic + "_control_" + str(replica_index) for replica_index in range(num_replicas)]
+
     def _start_function_worker(self, worker_params, runtime, env_var_list):
         error = None
 
         if runtime.find("python") != -1:
-            error = self._start_python_function_worker(worker_params, env_var_list)
+            error = self._start_python_function_worker_replicas(worker_params, env_var_list)
         elif runtime.find("java") != -1:
             # TODO: environment/JVM variables need to be utilized by the java request handler, not by the function worker
 
             if SINGLE_JVM_FOR_FUNCTIONS:
                 # _XXX_: we'll launch the single JVM handling all java functions later
-                error = self._start_python_function_worker(worker_params, env_var_list)
+                error = self._start_python_function_worker_replicas(worker_params, env_var_list)
             else:
                 # if jar, the contents have already been extracted as if it was a zip archive
                 # start the java request handler if self._function_runtime == "java"
@@ -309,7 +330,7 @@ class Deployment:
                     self._logger.error(error)
                 else:
                     self._javarequesthandler_process_list.append(process)
-                    error = self._start_python_function_worker(worker_params, env_var_list)
+                    error = self._start_python_function_worker_replicas(worker_params, env_var_list)
         else:
             error = "Unsupported function runtime: " + runtime
 
@@ -326,9 +347,10 @@ class Deployment:
         return lqcm_update
 
     def _update_function_worker(self, topic, lqcm_update):
-        ack = self._local_queue_client.addMessage(topic, lqcm_update, True)
-        while not ack:
-            ack = self._local_queue_client.addMessage(topic, lqcm_update, True)
+        for worker_topic in self._get_function_worker_topics(topic):
+            ack = self._local_queue_client.addMessage(worker_topic, lqcm_update, True)
+            while not ack:
+                ack = self._local_queue_client.addMessage(worker_topic, lqcm_update, True)
 
     def _update_remaining_function_workers(self, excluded_function_topic, lqcm_update=None):
         local_functions = self._workflow.getWorkflowLocalFunctions()
@@ -449,9 +471,11 @@ class Deployment:
         ind = zipref.find("num_chunks_")
         gid = zipref[ind+11:]
         pref = zipref[0:ind] + gid + "_chunk_"
-        for i in range(num_chunks):
-            chunkref = pref + str(i)
-            chunk = self._global_data_layer_client.get(chunkref)
+        chunkrefs = [pref + str(i) for i in range(num_chunks)]
+        # retrieve all chunks with a single request
+        chunks = self._global_data_layer_client.getMultiple(chunkrefs)
+        for chunkref in chunkrefs:
+            chunk = chunks.get(chunkref)
             if chunk is None:
                 error = "Empty zip chunk."
                 return (error, None)
@@ -599,6 +623,60 @@ class Deployment:
 
         return threads
 
+    def _get_fused_chain_topics(self, workflow_nodes, resource_map):
+        # only python task states without their own environment variables and helper modules can be executed
+        # in the process of another function worker
+        candidate_topics = {}
+        for function_topic in workflow_nodes:
+            wf_node = workflow_nodes[function_topic]
+            if wf_node.getGWFType() != WorkflowStateType.SAND_TASK_STATE_TYPE and wf_node.getGWFType() != WorkflowStateType.TASK_STATE_TYPE:
+                continue
+            if wf_node.is_session_function():
+                continue
+            resource_name = wf_node.get_resource_name()
+            if resource_name == "" or resource_name not in resource_map:
+                continue
+            resource = resource_map[resource_name]
+            if resource["runtime"].find("python") == -1:
+                continue
+            if [env_var for env_var in resource["env_var_list"] if env_var.find("=") != -1]:
+                continue
+            if self._has_importable_helpers(resource):
+                continue
+            candidate_topics[function_topic] = "/opt/mfn/workflow/states/" + wf_node.getGWFStateName() + "/worker_params.json"
+
+        self._logger.info("States that can be part of a fused chain: %s", str(list(candidate_topics.keys())))
+
+        # each state only sets up the states that can follow it in a fused chain (i.e., within the maximum chain length)
+        max_length = self._workflow.get_fused_chain_max_length()
+        fused_chain_topics = {}
+        for function_topic in candidate_topics:
+            chain_topics = {}
+            topics = [function_topic]
+            for _ in range(max_length):
+                next_topics = []
+                for topic in topics:
+                    wf_node = workflow_nodes[topic]
+                    for next in list(wf_node.getNextMap().keys()) + list(wf_node.getPotentialNextMap().keys()):
+                        topic_next = self._workflow.topicPrefix + next
+                        if topic_next in candidate_topics and topic_next not in chain_topics:
+                            chain_topics[topic_next] = candidate_topics[topic_next]
+                            next_topics.append(topic_next)
+                topics = next_topics
+            fused_chain_topics[function_topic] = chain_topics
+
+        return fused_chain_topics
+
+    def _has_importable_helpers(self, resource):
+        # the states of a fused chain share sys.modules,
+        # so a helper module with the same name in the folders of two states would be loaded only for the first one
+        for entry in os.listdir(resource["dirpath"]):
+            if entry == resource["name"] + ".py" or entry == "__pycache__":
+                continue
+            if os.path.isdir(resource["dirpath"] + entry) or entry.endswith((".py", ".pyc", ".so")):
+                return True
+        return False
+
     def _populate_worker_params(self, function_topic, wf_node, state):
         worker_params = {}
         worker_params["userid"] = self._userid
@@ -636,6 +714,31 @@ class Deployment:
 
         worker_params["should_checkpoint"] = self._workflow.are_checkpoints_enabled()
 
+        worker_params["warm_pool_size"] = self._workflow.get_warm_pool_size()
+        worker_params["warm_pool_max_executions"] = self._workflow.get_warm_pool_max_executions()
+
+        worker_params["json_codec"] = self._workflow.get_json_codec()
+
+        worker_params["fused_chain_topics"] = self._fused_chain_topics.get(function_topic, {})
+        worker_params["fused_chain_max_length"] = self._workflow.get_fused_chain_max_length()
+
+        worker_params["async_logging"] = self._workflow.is_async_logging_enabled()
+
+        worker_params["num_replicas"] = self._workflow.get_function_worker_replicas()
+        worker_params["pending_reclaim_idle_ms"] = self._workflow.get_pending_reclaim_idle_ms()
+
+        worker_params["max_function_instances"] = self._workflow.get_max_function_instances()
+
+        worker_params["data_layer_read_cache"] = self._workflow.is_data_layer_read_cache_enabled()
+        worker_params["data_layer_read_cache_ttl"] = self._workflow.get_data_layer_read_cache_ttl()
+
+        worker_params["data_layer_write_behind"] = self._workflow.is_data_layer_write_behind_enabled()
+        worker_params["data_layer_write_behind_flush_interval_ms"] = self._workflow.get_data_layer_write_behind_flush_interval_ms()
+        worker_params["data_layer_write_behind_flush_on_publish"] = self._workflow.is_data_layer_write_behind_flushed_on_publish()
+
+        worker_params["data_layer_stats"] = self._workflow.is_data_layer_stats_enabled()
+        worker_params["data_layer_stats_interval"] = self._workflow.get_data_layer_stats_interval()
+
         return worker_params
 
     def _compile_java_resources_if_necessary(self, resource, mvndeps):
@@ -888,6 +991,9 @@ class Deployment:
 
         self._local_queue_client.addTopic(self._workflow.getWorkflowExitTopic())
 
+        if self._workflow.are_fused_chains_enabled() and not self._workflow.is_session_workflow():
+            self._fused_chain_topics = self._get_fused_chain_topics(workflow_nodes, resource_map)
+
         t_start_launch = time.time()
         # accummulate all java worker params into one
         # later, we'll launch a single JVM to handle all java functions
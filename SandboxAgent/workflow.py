@@ -113,6 +113,46 @@ class Workflow:
         self._enable_checkpoints = True
         self._allow_immediate_messages = False
 
+        # number of pre-forked function instances per function worker (0: fork per message)
+        self._warm_pool_size = 0
+        self._warm_pool_max_executions = 1000
+
+        # JSON backend of the function workers (empty: use the sandbox-wide setting)
+        self._json_codec = ""
+
+        # whether co-located python task states can be executed in the process of their predecessor
+        self._enable_fused_chains = False
+        self._fused_chain_max_length = 10
+
+        # whether the function workers write their logs in batches from a background thread
+        self._enable_async_logging = False
+
+        # number of function worker processes sharing each function topic via a consumer group (1: no consumer group)
+        self._function_worker_replicas = 1
+        # idle time (ms) after which a message retrieved, but not acknowledged by a replica is handed to another one
+        self._pending_reclaim_idle_ms = 60000
+
+        # maximum number of concurrently running function instances per function worker (0: unlimited)
+        self._max_function_instances = 0
+
+        # memoize the data layer reads of a function within an execution
+        self._enable_data_layer_read_cache = False
+        # seconds to keep the cached reads for the next executions in the same warm pool instance (0: only within an execution)
+        # (without a warm pool, each execution runs in its own forked process, so the reads are only cached within an execution)
+        self._data_layer_read_cache_ttl = 0
+
+        # write the (key, value) data of the functions to the local data layer and replicate it to the global data layer in the background
+        self._enable_data_layer_write_behind = False
+        # milliseconds between the background replications (0: only when flushed)
+        self._data_layer_write_behind_flush_interval_ms = 100
+        # replicate the writes of a function before publishing its output (i.e., the next functions see them globally)
+        self._data_layer_write_behind_flush_on_publish = True
+
+        # record count, latency, payload sizes and reconnects of the data layer requests per request type and table
+        self._enable_data_layer_stats = False
+        # seconds between the summaries of the data layer requests of a function worker
+        self._data_layer_stats_interval = 60
+
         self._has_error = False
 
         # construct from JSON
@@ -129,6 +169,22 @@ class Workflow:
                 "entry": "entryFunction",
                 "enable_checkpoints": False,
                 "allow_immediate_messages": True,
+                "warm_pool_size": 0,
+                "warm_pool_max_executions": 1000,
+                "json_codec": "orjson",
+                "enable_fused_chains": False,
+                "fused_chain_max_length": 10,
+                "enable_async_logging": False,
+                "function_worker_replicas": 1,
+                "pending_reclaim_idle_ms": 60000,
+                "max_function_instances": 0,
+                "enable_data_layer_read_cache": False,
+                "data_layer_read_cache_ttl": 0,
+                "enable_data_layer_write_behind": False,
+                "data_layer_write_behind_flush_interval_ms": 100,
+                "data_layer_write_behind_flush_on_publish": True,
+                "enable_data_layer_stats": False,
+                "data_layer_stats_interval": 60,
                 "exit": "exitName",
                 "functions": [
                     {
@@ -164,6 +220,54 @@ class Workflow:
         if "allow_immediate_messages" in wfobj.keys():
             self._allow_immediate_messages = wfobj["allow_immediate_messages"]
 
+        if "warm_pool_size" in wfobj.keys():
+            self._warm_pool_size = wfobj["warm_pool_size"]
+
+        if "warm_pool_max_executions" in wfobj.keys():
+            self._warm_pool_max_executions = wfobj["warm_pool_max_executions"]
+
+        if "json_codec" in wfobj.keys():
+            self._json_codec = wfobj["json_codec"]
+
+        if "enable_fused_chains" in wfobj.keys():
+            self._enable_fused_chains = wfobj["enable_fused_chains"]
+
+        if "fused_chain_max_length" in wfobj.keys():
+            self._fused_chain_max_length = wfobj["fused_chain_max_length"]
+
+        if "enable_async_logging" in wfobj.keys():
+            self._enable_async_logging = wfobj["enable_async_logging"]
+
+        if "function_worker_replicas" in wfobj.keys():
+            self._function_worker_replicas = wfobj["function_worker_replicas"]
+
+        if "pending_reclaim_idle_ms" in wfobj.keys():
+            self._pending_reclaim_idle_ms = wfobj["pending_reclaim_idle_ms"]
+
+        if "max_function_instances" in wfobj.keys():
+            self._max_function_instances = wfobj["max_function_instances"]
+
+        if "enable_data_layer_read_cache" in wfobj.keys():
+            self._enable_data_layer_read_cache = wfobj["enable_data_layer_read_cache"]
+
+        if "data_layer_read_cache_ttl" in wfobj.keys():
+            self._data_layer_read_cache_ttl = wfobj["data_layer_read_cache_ttl"]
+
+        if "enable_data_layer_write_behind" in wfobj.keys():
+            self._enable_data_layer_write_behind = wfobj["enable_data_layer_write_behind"]
+
+        if "data_layer_write_behind_flush_interval_ms" in wfobj.keys():
+            self._data_layer_write_behind_flush_interval_ms = wfobj["data_layer_write_behind_flush_interval_ms"]
+
+        if "data_layer_write_behind_flush_on_publish" in wfobj.keys():
+            self._data_layer_write_behind_flush_on_publish = wfobj["data_layer_write_behind_flush_on_publish"]
+
+        if "enable_data_layer_stats" in wfobj.keys():
+            self._enable_data_layer_stats = wfobj["enable_data_layer_stats"]
+
+        if "data_layer_stats_interval" in wfobj.keys():
+            self._data_layer_stats_interval = wfobj["data_layer_stats_interval"]
+
         if self._allow_immediate_messages:
             # also include the exit as a potential destination for sending immediate trigger messages
             self.workflowFunctionMap[self.workflowExitPoint] = True
@@ -261,6 +365,54 @@ class Workflow:
         if "AllowImmediateMessages" in wfobj.keys():
             self._allow_immediate_messages = wfobj["AllowImmediateMessages"]
 
+        if "WarmPoolSize" in wfobj.keys():
+            self._warm_pool_size = wfobj["WarmPoolSize"]
+
+        if "WarmPoolMaxExecutions" in wfobj.keys():
+            self._warm_pool_max_executions = wfobj["WarmPoolMaxExecutions"]
+
+        if "JSONCodec" in wfobj.keys():
+            self._json_codec = wfobj["JSONCodec"]
+
+        if "EnableFusedChains" in wfobj.keys():
+            self._enable_fused_chains = wfobj["EnableFusedChains"]
+
+        if "FusedChainMaxLength" in wfobj.keys():
+            self._fused_chain_max_length = wfobj["FusedChainMaxLength"]
+
+        if "EnableAsyncLogging" in wfobj.keys():
+            self._enable_async_logging = wfobj["EnableAsyncLogging"]
+
+        if "FunctionWorkerReplicas" in wfobj.keys():
+            self._function_worker_replicas = wfobj["FunctionWorkerReplicas"]
+
+        if "PendingReclaimIdleMs" in wfobj.keys():
+            self._pending_reclaim_idle_ms = wfobj["PendingReclaimIdleMs"]
+
+        if "MaxFunctionInstances" in wfobj.keys():
+            self._max_function_instances = wfobj["MaxFunctionInstances"]
+
+        if "EnableDataLayerReadCache" in wfobj.keys():
+            self._enable_data_layer_read_cache = wfobj["EnableDataLayerReadCache"]
+
+        if "DataLayerReadCacheTTL" in wfobj.keys():
+            self._data_layer_read_cache_ttl = wfobj["DataLayerReadCacheTTL"]
+
+        if "EnableDataLayerWriteBehind" in wfobj.keys():
+            self._enable_data_layer_write_behind = wfobj["EnableDataLayerWriteBehind"]
+
+        if "DataLayerWriteBehindFlushIntervalMs" in wfobj.keys():
+            self._data_layer_write_behind_flush_interval_ms = wfobj["DataLayerWriteBehindFlushIntervalMs"]
+
+        if "DataLayerWriteBehindFlushOnPublish" in wfobj.keys():
+            self._data_layer_write_behind_flush_on_publish = wfobj["DataLayerWriteBehindFlushOnPublish"]
+
+        if "EnableDataLayerStats" in wfobj.keys():
+            self._enable_data_layer_stats = wfobj["EnableDataLayerStats"]
+
+        if "DataLayerStatsInterval" in wfobj.keys():
+            self._data_layer_stats_interval = wfobj["DataLayerStatsInterval"]
+
         if self._allow_immediate_messages:
             # also include the exit as a potential destination for sending immediate trigger messages
             self.workflowFunctionMap[self.workflowExitPoint] = True
@@ -730,3 +882,51 @@ class Workflow:
 
     def are_checkpoints_enabled(self):
         return self._enable_checkpoints
+
+    def get_warm_pool_size(self):
+        return self._warm_pool_size
+
+    def get_warm_pool_max_executions(self):
+        return self._warm_pool_max_executions
+
+    def get_json_codec(self):
+        return self._json_codec
+
+    def are_fused_chains_enabled(self):
+        return self._enable_fused_chains
+
+    def get_fused_chain_max_length(self):
+        return self._fused_chain_max_length
+
+    def is_async_logging_enabled(self):
+        return self._enable_async_logging
+
+    def get_function_worker_replicas(self):
+        return max(int(self._function_worker_replicas), 1)
+
+    def get_pending_reclaim_idle_ms(self):
+        return self._pending_reclaim_idle_ms
+
+    def get_max_function_instances(self):
+        return self._max_function_instances
+
+    def is_data_layer_read_cache_enabled(self):
+        return self._enable_data_layer_read_cache
+
+    def get_data_layer_read_cache_ttl(self):
+        return self._data_layer_read_cache_ttl
+
+    def is_data_layer_write_behind_enabled(self):
+        return self._enable_data_layer_write_behind
+
+    def get_data_layer_write_behind_flush_interval_ms(self):
+        return self._data_layer_write_behind_flush_interval_ms
+
+    def is_data_layer_write_behind_flushed_on_publish(self):
+        return self._data_layer_write_behind_flush_on_publish
+
+    def is_data_layer_stats_enabled(self):
+        return self._enable_data_layer_stats
+
+    def get_data_layer_stats_interval(self):
+        return self._data_layer_stats_interval
@@ -569,8 +569,17 @@ class MfnClient(object):
     def list_keys(self, start=0, count=2000, wid=None):
         return self._storage.list_keys(start, count, wid)
 
-    def keys(self, wid=None):
-        self._list_stepwise("keys", wid)
+    def scan_keys(self, prefix="", cursor="", count=1000, wid=None):
+        return self._storage.scan_keys(prefix, cursor, count, wid)
+
+    def keys(self, wid=None, prefix=""):
+        cursor = ""
+        while True:
+            resultlist, cursor = self.scan_keys(prefix, cursor, 1000, wid)
+            for result in resultlist:
+                yield result
+            if cursor == "":
+                break
 
     # map operations
     def create_map(self, mapname, wid=None):
@@ -604,7 +613,7 @@ class MfnClient(object):
         return self._storage.list_maps(start, count, wid)
 
     def maps(self, wid=None):
-        self._list_stepwise("maps", wid)
+        return self._list_stepwise("maps", wid)
 
     # set operations
     def create_set(self, setname, wid=None):
@@ -632,7 +641,7 @@ class MfnClient(object):
         return self._storage.list_sets(start, count, wid)
 
     def sets(self, wid=None):
-        self._list_stepwise("sets", wid)
+        return self._list_stepwise("sets", wid)
 
     # counter operations
     def create_counter(self, countername, countervalue, wid=None):
@@ -654,7 +663,7 @@ class MfnClient(object):
         return self._storage.list_counters(start, count, wid)
 
     def counters(self, wid=None):
-        self._list_stepwise("counters", wid)
+        return self._list_stepwise("counters", wid)
 
     ### Triggers
     @property
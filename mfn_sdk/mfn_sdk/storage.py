@@ -117,6 +117,24 @@ class Storage(object):
 
         return r.json()["data"]["keylist"]
 
+    def scan_keys(self, prefix="", cursor="", count=1000, wid=None):
+        data_to_send = self._init_common_parameters()
+
+        parameters = {}
+        parameters["action"] = "scankeys"
+        parameters["prefix"] = prefix
+        parameters["cursor"] = cursor
+        parameters["count"] = count
+
+        data_to_send["data"]["storage"] = self._fill_storage_parameters("kv", parameters, wid)
+
+        r = self._session.post(self._mgmturl, params={}, json=data_to_send)
+        r.raise_for_status()
+        if r.json()["status"] != "success":
+            raise Exception("SCANKEYS failed: " + r.json()["data"]["message"])
+
+        return r.json()["data"]["keylist"], r.json()["data"]["cursor"]
+
     # map operations
     def create_map(self, mapname, wid=None):
         data_to_send = self._init_common_parameters()
@@ -63,6 +63,27 @@ class ASL_ParallelTest(unittest.TestCase):
         test = MFNTest(test_name="Parallel", workflow_filename="wf_asl_parallel_waitfornumbranches.json")
         test.exec_tests(testtuplelist, async_=True)
 
+    def test_parallel_waitfornumbranches_fewer_than_branches(self):
+        """ a branch that finishes after the last join must not join the branches again """
+        test = MFNTest(test_name="Parallel Partial Wait", workflow_filename="wf_asl_parallel_waitfornumbranches_partial.json")
+
+        event = 'a'
+        expectedResponse = [None, 'a Branch2Task.py', 'a Branch3Task.py']
+
+        test.clear_workflow_logs()
+        test.exec_tests([(json.dumps(event), json.dumps(expectedResponse))], should_undeploy=False)
+        # let the slow branch (see Branch1Task) finish after the join
+        time.sleep(15)
+
+        log = test.get_workflow_logs(num_lines=1000)["log"]
+
+        test.undeploy_workflow()
+        test.cleanup()
+
+        # the slow branch has finished, but the state after the Parallel state has only been executed once
+        self.assertEqual(log.count("Hello from Branch1Terminal.py"), 1)
+        self.assertEqual(log.count("Hello from LambdaAfter.py"), 1)
+
 
 class ASL_SessionSupportTest(unittest.TestCase):
 
@@ -0,0 +1,4 @@
+import time
+def handle(event, context):
+    time.sleep(event["sleep"])
+    return event["sleep"]
@@ -79,3 +79,41 @@ class MapStateTest(unittest.TestCase):
             et = time.time()
 
             print ("test duration (s): %s" % str(et-st))
+
+    def test_map_state_join_without_polling(self):
+        """ the data layer requests of a Map execution must not depend on how long its branches run """
+
+        test = MFNTest(test_name="Map State Join Test", workflow_filename="workflow_map_state_join_test.json", timeout=120)
+
+        requests_per_run = []
+        for sleep in [0, 20]:
+            event = [{"sleep": 0}, {"sleep": sleep}, {"sleep": 0}, {"sleep": 0}]
+            expectedResponse = [0, sleep, 0, 0]
+
+            test.clear_workflow_logs()
+            test.exec_tests([(json.dumps(event), json.dumps(expectedResponse))], should_undeploy=False)
+            # allow the progress logs to be indexed
+            time.sleep(10)
+
+            requests_per_run.append(self._get_data_layer_request_count(test.get_workflow_logs(num_lines=1000)))
+
+        test.undeploy_workflow()
+        test.cleanup()
+
+        print("data layer requests with short and long branches: " + str(requests_per_run))
+        self.assertTrue(requests_per_run[0] > 0)
+        # a branch that runs 20 seconds longer must not cause any additional (i.e., polling) requests
+        self.assertEqual(requests_per_run[0], requests_per_run[1])
+
+    def _get_data_layer_request_count(self, logs):
+        # sum up the data layer requests of all function instances
+        # (see "datalayer_requests" in the [__mfn_progress] log entries)
+        count = 0
+        for line in logs["progress"].split("\n"):
+            ind = line.find("[__mfn_progress]")
+            if ind == -1:
+                continue
+            timestamp_map = json.loads(line[ind:].split(" ", 2)[2])
+            for entry in timestamp_map["datalayer_requests"].values():
+                count += entry["count"]
+        return count
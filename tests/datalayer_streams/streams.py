@@ -0,0 +1,59 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import hashlib
+import json
+
+# manifest and chunk keys of the values stored with put_stream() (see DataLayerClient)
+STREAM_MANIFEST_KEY_PREFIX = "__mfn_stream_manifest_"
+STREAM_CHUNK_KEY_PREFIX = "__mfn_stream_chunk_"
+
+def generate(size, part_size):
+    # deterministic data that is not a repetition of the chunk size
+    offset = 0
+    while offset < size:
+        n = min(part_size, size - offset)
+        yield hashlib.sha256(str(offset).encode()).digest() * (n // 32) + b"x" * (n % 32)
+        offset += n
+
+def read_all(context, key):
+    chunks = context.get_stream(key)
+    if chunks is None:
+        return None
+    return b"".join(chunks)
+
+def handle(event, context):
+    key = event["key"]
+    size = event["size"]
+    result = {}
+
+    context.put_stream(key, generate(size, 100000))
+    value = read_all(context, key)
+    result["roundtrip"] = value == b"".join(generate(size, 100000))
+    result["size"] = len(value)
+    result["listed"] = key in context.getKeys(prefix=key)
+
+    # replace the first chunk with different data: the generator must not return the value
+    manifest = json.loads(context.get(STREAM_MANIFEST_KEY_PREFIX + key))
+    context.put(STREAM_CHUNK_KEY_PREFIX + manifest["__mfn_stream"] + "_0", "corrupted")
+    try:
+        read_all(context, key)
+        result["corruption_detected"] = False
+    except IOError:
+        result["corruption_detected"] = True
+
+    context.delete_stream(key)
+    result["deleted"] = context.get_stream(key) is None
+
+    return result
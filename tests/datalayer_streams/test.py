@@ -0,0 +1,34 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import unittest
+import sys
+
+sys.path.append("../")
+from mfn_test_utils import MFNTest
+
+class DataLayerStreamsTest(unittest.TestCase):
+
+    #@unittest.skip("")
+    def test_streams(self):
+        test_tuple_list = []
+        # several chunks (1MB each) and batches, and a value smaller than a chunk
+        for key, size in [("stream_large", 20 * 1024 * 1024 + 12345), ("stream_small", 1000)]:
+            inp = {"key": key, "size": size}
+            res = {"roundtrip": True, "size": size, "listed": False, "corruption_detected": True, "deleted": True}
+            test_tuple_list.append((json.dumps(inp), json.dumps(res)))
+
+        test = MFNTest(test_name='datalayer_streams', workflow_filename='datalayer_streams.json')
+        test.exec_tests(test_tuple_list)
@@ -82,6 +82,40 @@ class StorageActionsTest(unittest.TestCase):
         else:
             self._report("test_delete_key", False, None, val3)
 
+    #@unittest.skip("")
+    def test_scan_keys(self):
+        ts = str(time.time() * 1000.0)
+        prefix = "my_scan_prefix_" + ts + "_"
+        keys = sorted([prefix + str(i) for i in range(7)])
+        # keys without the prefix right before and after the ones with the prefix
+        other_keys = ["my_scan_prefix_" + ts, "my_scan_prefix_" + ts + "~"]
+        for key in keys + other_keys:
+            self._client.put(key, ts)
+
+        # pages of 3 keys: the cursor of each page continues the listing
+        pages = []
+        cursor = ""
+        while len(pages) < 10:
+            page, cursor = self._client.scan_keys(prefix, cursor, 3)
+            pages.append(page)
+            if cursor == "":
+                break
+
+        scanned = [key for page in pages for key in page]
+        if scanned == keys and all([len(page) <= 3 for page in pages]) and len(pages) >= 3:
+            self._report("test_scan_keys", True)
+        else:
+            self._report("test_scan_keys", False, keys, pages)
+
+        generated = list(self._client.keys(prefix=prefix))
+        if generated == keys:
+            self._report("test_keys_generator", True)
+        else:
+            self._report("test_keys_generator", False, keys, generated)
+
+        for key in keys + other_keys:
+            self._client.delete(key)
+
     # map operations
     def test_map_operations(self):
         map_list = self._client.list_maps()